@@ -0,0 +1,88 @@
+"""Benchmark: Judge0 request throughput with and without connection pooling.
+
+Runs submissions against a local fake Judge0 (tests/fake_judge0.py) with
+the pooled Judge0Client and with a client that, like earlier versions,
+builds a fresh HTTP client and connection for every request, and reports
+HTTP requests per second and median milliseconds per submission.
+
+Usage:
+    python benchmarks/judge0_pool.py [--submissions 500] [--concurrency 8] [--polls 2]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyshala.services.judge0_client import Judge0Client  # noqa: E402
+from pyshala.services.runtime_stats import percentile  # noqa: E402
+from tests.fake_judge0 import FakeJudge0  # noqa: E402
+
+
+class UnpooledJudge0Client(Judge0Client):
+    """Opens a new HTTP client, and so a new connection, per request."""
+
+    def _http(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_keepalive_connections=0),
+        )
+
+
+async def run(
+    client: Judge0Client, submissions: int, concurrency: int
+) -> list[float]:
+    """Return seconds per submission."""
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def submit(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await client.execute_and_wait(
+                "print(input())", str(i), poll_interval=0.0
+            )
+            timings.append(time.perf_counter() - start)
+            assert result.stdout == str(i)
+
+    await asyncio.gather(*(submit(i) for i in range(submissions)))
+    return timings
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--polls", type=int, default=2,
+                        help="polls that still report a submission as processing")
+    args = parser.parse_args()
+
+    print(
+        f"{args.submissions} submissions, concurrency {args.concurrency}, "
+        f"{args.polls + 2} requests each"
+    )
+    print(f"{'client':<10} {'req/s':>8} {'p50 ms':>8} {'conns':>6}")
+    for name, cls in (("fresh", UnpooledJudge0Client), ("pooled", Judge0Client)):
+        async with FakeJudge0(processing_polls=args.polls) as judge0:
+            client = cls(base_url=judge0.url)
+            start = time.perf_counter()
+            try:
+                timings = await run(client, args.submissions, args.concurrency)
+            finally:
+                await client.close()
+            elapsed = time.perf_counter() - start
+        print(
+            f"{name:<10} {len(judge0.requests) / elapsed:>8.0f} "
+            f"{percentile(timings, 0.5) * 1000:>8.2f} {judge0.connections:>6}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
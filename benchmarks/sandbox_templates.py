@@ -0,0 +1,84 @@
+"""Benchmark: data file I/O per submission with and without templates.
+
+Prepares the working directories for one submission (one per test case)
+the way LocalExecutor does, once by writing every data file and once by
+linking from a SandboxTemplates store, and reports wall time and bytes
+handed to write(2) (``wchar`` from /proc/self/io) per submission, along
+with the method data files were actually placed with. Hardlinks need
+executions to run as another user, e.g. ``EXECUTION_USER=nobody``.
+
+Usage:
+    python benchmarks/sandbox_templates.py [--size-mb 8] [--tests 8] [--rounds 20]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyshala.models.lesson import DataFile  # noqa: E402
+from pyshala.services.local_executor import LocalExecutor  # noqa: E402
+from pyshala.services.sandbox import SandboxTemplates  # noqa: E402
+
+
+def written_bytes() -> int:
+    """Bytes this process has passed to write-like syscalls so far."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def run(executor: LocalExecutor, data_files: list[DataFile], tests: int, rounds: int) -> tuple[float, float]:
+    """Return (seconds, bytes written) per submission."""
+    # Warm up so template construction is not counted
+    with tempfile.TemporaryDirectory() as workdir:
+        executor._prepare_workdir(workdir, "print(1)", data_files)
+
+    start_bytes = written_bytes()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _ in range(tests):
+            with tempfile.TemporaryDirectory() as workdir:
+                executor._prepare_workdir(workdir, "print(1)", data_files)
+    elapsed = time.perf_counter() - start
+    return elapsed / rounds, (written_bytes() - start_bytes) / rounds
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=8.0)
+    parser.add_argument("--tests", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    content = os.urandom(int(args.size_mb * 1024 * 1024))
+    data_files = [DataFile(name="sales.csv", path="sales.csv", content=content)]
+
+    print(f"{args.tests} tests per submission, {args.size_mb:g} MB of data files")
+    print(f"{'mode':<10} {'used':<10} {'ms/submission':>14} {'MB written/submission':>22}")
+    for mode in ("write", "hardlink", "reflink", "copy"):
+        if mode == "write":
+            executor = LocalExecutor()
+        else:
+            executor = LocalExecutor(templates=SandboxTemplates(link_mode=mode))
+        try:
+            seconds, nbytes = run(executor, data_files, args.tests, args.rounds)
+        except OSError as e:
+            print(f"{mode:<10} unsupported here ({e.strerror})")
+            continue
+        used = executor.templates.link_method if executor.templates else "write"
+        print(f"{mode:<10} {used:<10} {seconds * 1000:>14.2f} {nbytes / 1024 / 1024:>22.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Benchmark: per-test latency by scratch directory and script delivery.
+
+Runs the same small test case repeatedly through LocalExecutor with
+working directories in the system temp directory and in /dev/shm, and
+with the script written to script.py or handed over in a memfd, and
+reports median and 95th percentile milliseconds per test.
+
+Usage:
+    python benchmarks/scratch_dirs.py [--tests 200] [--size-kb 256] [--zygote] [--batch]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyshala.models.lesson import DataFile  # noqa: E402
+from pyshala.services.local_executor import LocalExecutor  # noqa: E402
+from pyshala.services.result_cache import ResultCache  # noqa: E402
+from pyshala.services.runtime_stats import percentile  # noqa: E402
+from pyshala.services.sandbox import resolve_scratch_dir  # noqa: E402
+from pyshala.services.scheduler import ExecutionScheduler  # noqa: E402
+
+SOURCE = "n = int(input())\nprint(n * n)\n"
+
+
+async def run(executor: LocalExecutor, data_files: list[DataFile], tests: int) -> list[float]:
+    """Return seconds per test."""
+    test_cases = [{"stdin": "7", "expected_output": "49"}]
+    # Warm up the interpreter, zygote and page cache
+    await executor.run_tests(SOURCE, test_cases, data_files=data_files)
+
+    timings = []
+    if executor.batch_tests:
+        batch = 10
+        test_cases = test_cases * batch
+        for _ in range(max(1, tests // batch)):
+            start = time.perf_counter()
+            results = await executor.run_tests(SOURCE, test_cases, data_files=data_files)
+            timings.append((time.perf_counter() - start) / batch)
+            assert results.all_passed
+        return timings
+
+    for _ in range(tests):
+        start = time.perf_counter()
+        results = await executor.run_tests(SOURCE, test_cases, data_files=data_files)
+        timings.append(time.perf_counter() - start)
+        assert results.all_passed
+    return timings
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tests", type=int, default=200)
+    parser.add_argument("--size-kb", type=float, default=256.0)
+    parser.add_argument("--zygote", action="store_true")
+    parser.add_argument("--batch", action="store_true")
+    args = parser.parse_args()
+
+    data_files = []
+    if args.size_kb:
+        content = os.urandom(int(args.size_kb * 1024))
+        data_files = [DataFile(name="data.bin", path="data.bin", content=content)]
+
+    scratch_dirs = {"tmp": tempfile.gettempdir()}
+    shm = resolve_scratch_dir("auto")
+    if shm:
+        scratch_dirs["shm"] = shm
+    else:
+        print("/dev/shm is unavailable or too small; only the temp dir is measured")
+
+    print(
+        f"{args.tests} tests, {args.size_kb:g} KB of data files, "
+        f"zygote={'on' if args.zygote else 'off'}, batch={'on' if args.batch else 'off'}"
+    )
+    print(f"{'scratch':<8} {'delivery':<9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, scratch_dir in scratch_dirs.items():
+        for delivery in ("file", "memory"):
+            executor = LocalExecutor(
+                use_zygote=args.zygote,
+                batch_tests=args.batch,
+                scheduler=ExecutionScheduler(max_concurrent=1),
+                cache=ResultCache(max_entries=0),
+                static_checks=False,
+                scratch_dir=scratch_dir,
+                script_delivery=delivery,
+            )
+            if executor.script_delivery != delivery:
+                print(f"{name:<8} {delivery:<9} unsupported here")
+                continue
+            try:
+                timings = await run(executor, data_files, args.tests)
+            finally:
+                await executor.close()
+            print(
+                f"{name:<8} {delivery:<9} {percentile(timings, 0.5) * 1000:>8.2f} "
+                f"{percentile(timings, 0.95) * 1000:>8.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
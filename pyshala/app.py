@@ -30,6 +30,8 @@ class PyShala:
         loglevel: str = "info",
         app_name: str = "Learn Python",
         app_description: str = "Interactive lessons with hands-on coding exercises and instant feedback",
+        runtime_stats_path: Optional[str] = None,
+        execution_cpus: Optional[str] = None,
     ):
         """Initialize the PyShala application.
 
@@ -44,6 +46,12 @@ class PyShala:
             loglevel: Logging level (debug, info, warning, error).
             app_name: Application name displayed in the UI.
             app_description: Application description displayed on the home page.
+            runtime_stats_path: File to log test case runtimes to, for
+                               ``pyshala --runtime-report``.
+            execution_cpus: CPUs code executions are pinned to, e.g. "2-7",
+                           or "auto" for all but the first CPU, so the web
+                           server keeps cores of its own. The number of
+                           concurrent executions defaults to its size.
         """
         self.lessons_path = str(Path(lessons_path).resolve())
         self.host = host
@@ -54,11 +62,20 @@ class PyShala:
         self.loglevel = loglevel
         self.app_name = app_name
         self.app_description = app_description
+        self.runtime_stats_path = (
+            str(Path(runtime_stats_path).resolve()) if runtime_stats_path else None
+        )
+        self.execution_cpus = execution_cpus
 
         # Validate lessons path
         if not Path(self.lessons_path).exists():
             raise ValueError(f"Lessons path does not exist: {self.lessons_path}")
 
+        # Validate the CPU list before the server starts
+        if self.execution_cpus and self.execution_cpus != "auto":
+            from .services.affinity import parse_cpu_list
+            parse_cpu_list(self.execution_cpus)
+
     def _setup_environment(self) -> dict:
         """Set up environment variables for the app."""
         env = os.environ.copy()
@@ -67,6 +84,10 @@ class PyShala:
         env["PYTHON_PATH"] = self.python_path
         env["APP_NAME"] = self.app_name
         env["APP_DESCRIPTION"] = self.app_description
+        if self.runtime_stats_path:
+            env["RUNTIME_STATS_PATH"] = self.runtime_stats_path
+        if self.execution_cpus:
+            env["EXECUTION_CPUS"] = self.execution_cpus
         return env
 
     def _get_pyshala_dir(self) -> Path:
@@ -1,6 +1,7 @@
 """PyShala command-line interface."""
 
 import argparse
+import os
 import sys
 
 from .app import PyShala
@@ -79,6 +80,38 @@ def main() -> int:
         help="Environment mode (default: dev)",
     )
 
+    parser.add_argument(
+        "--runtime-stats",
+        default=os.getenv("RUNTIME_STATS_PATH"),
+        help="File to log test case runtimes to (default: $RUNTIME_STATS_PATH)",
+    )
+
+    parser.add_argument(
+        "--execution-cpus",
+        default=os.getenv("EXECUTION_CPUS"),
+        help='CPUs to pin code executions to, e.g. "2-7", or "auto" for all but '
+             "the first CPU (default: $EXECUTION_CPUS, no pinning)",
+    )
+
+    parser.add_argument(
+        "--runtime-report",
+        action="store_true",
+        help="List lessons whose logged runtimes are close to their time limit and exit",
+    )
+
+    parser.add_argument(
+        "--near-limit",
+        type=float,
+        default=0.8,
+        help="Fraction of the time limit the p95 runtime must reach to be reported (default: 0.8)",
+    )
+
+    parser.add_argument(
+        "--all-lessons",
+        action="store_true",
+        help="With --runtime-report, list the p50/p95 runtimes of every lesson",
+    )
+
     parser.add_argument(
         "--version", "-v",
         action="store_true",
@@ -92,6 +125,9 @@ def main() -> int:
         print(f"pyshala {__version__}")
         return 0
 
+    if args.runtime_report:
+        return runtime_report(args.runtime_stats, args.near_limit, args.all_lessons)
+
     try:
         app = PyShala(
             lessons_path=args.lessons_path,
@@ -103,6 +139,8 @@ def main() -> int:
             loglevel=args.loglevel,
             app_name=args.app_name,
             app_description=args.app_description,
+            runtime_stats_path=args.runtime_stats,
+            execution_cpus=args.execution_cpus,
         )
         app.run(env=args.env)
         return 0
@@ -114,5 +152,34 @@ def main() -> int:
         return 0
 
 
+def runtime_report(stats_path: str, threshold: float, all_lessons: bool = False) -> int:
+    """Print lessons whose logged runtimes are close to their time limit.
+
+    Args:
+        stats_path: Runtime log written by the server.
+        threshold: Fraction of the time limit the p95 runtime must reach.
+        all_lessons: Print every lesson, slowest median first, instead.
+
+    Returns:
+        Exit code.
+    """
+    from .services.runtime_stats import RuntimeStats, format_report, format_table
+
+    if not stats_path:
+        print("Error: --runtime-stats or RUNTIME_STATS_PATH is required", file=sys.stderr)
+        return 1
+    try:
+        stats = RuntimeStats.load(stats_path)
+    except OSError as e:
+        print(f"Error: cannot read runtime log: {e}", file=sys.stderr)
+        return 1
+    if all_lessons:
+        entries = sorted(stats.lessons(), key=lambda entry: entry.runtime(0.5), reverse=True)
+        print(format_table(entries))
+    else:
+        print(format_report(stats.near_limit(threshold), threshold))
+    return 0
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -1,5 +1,7 @@
 """Code editor component using Monaco editor."""
 
+from typing import Optional
+
 import reflex as rx
 from reflex_monaco import monaco
 
@@ -44,17 +46,37 @@ def editor_toolbar(
     on_run: rx.EventHandler,
     on_reset: rx.EventHandler,
     is_running: rx.Var[bool],
+    on_cancel: Optional[rx.EventHandler] = None,
 ) -> rx.Component:
-    """Create the editor toolbar with run and reset buttons.
+    """Create the editor toolbar with run, cancel and reset buttons.
 
     Args:
         on_run: Event handler for run button.
         on_reset: Event handler for reset button.
         is_running: Whether code is currently being executed.
+        on_cancel: Event handler for the cancel button, shown while
+                   code is running. No cancel button if omitted.
 
     Returns:
         Toolbar component.
     """
+    cancel_button = rx.fragment()
+    if on_cancel is not None:
+        cancel_button = rx.cond(
+            is_running,
+            rx.button(
+                rx.hstack(
+                    rx.icon("square", size=14),
+                    rx.text("Cancel", font_size="0.8rem"),
+                    spacing="1",
+                ),
+                on_click=on_cancel,
+                variant="outline",
+                color_scheme="red",
+                size="1",
+            ),
+        )
+
     return rx.hstack(
         rx.button(
             rx.cond(
@@ -76,6 +98,7 @@ def editor_toolbar(
             size="1",
             cursor=rx.cond(is_running, "not-allowed", "pointer"),
         ),
+        cancel_button,
         rx.button(
             rx.hstack(
                 rx.icon("rotate-ccw", size=14),
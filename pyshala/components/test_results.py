@@ -21,7 +21,11 @@ def test_result_item(result: TestResultInfo) -> rx.Component:
                 rx.cond(
                     result.passed,
                     rx.icon("circle-check", size=16, color="#10b981"),
-                    rx.icon("circle-x", size=16, color="#ef4444"),
+                    rx.cond(
+                        result.skipped,
+                        rx.icon("circle-minus", size=16, color="#9ca3af"),
+                        rx.icon("circle-x", size=16, color="#ef4444"),
+                    ),
                 ),
                 rx.text(
                     result.description,
@@ -34,9 +38,26 @@ def test_result_item(result: TestResultInfo) -> rx.Component:
                     ),
                 ),
                 rx.spacer(),
+                rx.cond(
+                    result.resource_usage != "",
+                    rx.text(
+                        result.resource_usage,
+                        font_size="0.7rem",
+                        color=rx.cond(AppState.dark_mode, "#9ca3af", "#6b7280"),
+                    ),
+                    rx.fragment(),
+                ),
                 rx.badge(
-                    rx.cond(result.passed, "PASSED", "FAILED"),
-                    color_scheme=rx.cond(result.passed, "green", "red"),
+                    rx.cond(
+                        result.passed,
+                        "PASSED",
+                        rx.cond(result.skipped, "NOT RUN", "FAILED"),
+                    ),
+                    color_scheme=rx.cond(
+                        result.passed,
+                        "green",
+                        rx.cond(result.skipped, "gray", "red"),
+                    ),
                     size="1",
                 ),
                 width="100%",
@@ -46,6 +67,29 @@ def test_result_item(result: TestResultInfo) -> rx.Component:
             rx.cond(
                 ~result.passed,
                 rx.vstack(
+                    # Call made by a function-call test case
+                    rx.cond(
+                        result.call != "",
+                        rx.box(
+                            rx.text(
+                                "Call:",
+                                font_size="0.7rem",
+                                color=rx.cond(AppState.dark_mode, "#9ca3af", "#6b7280"),
+                                margin_bottom="0.125rem",
+                            ),
+                            rx.code(
+                                result.call,
+                                display="block",
+                                white_space="pre-wrap",
+                                padding="0.375rem",
+                                border_radius="0.25rem",
+                                font_size="0.7rem",
+                                width="100%",
+                            ),
+                            width="100%",
+                        ),
+                        rx.fragment(),
+                    ),
                     # Expected output
                     rx.cond(
                         result.expected_output != "",
@@ -76,7 +120,7 @@ def test_result_item(result: TestResultInfo) -> rx.Component:
                         result.actual_output != "",
                         rx.box(
                             rx.text(
-                                "Your output:",
+                                rx.cond(result.call != "", "Returned:", "Your output:"),
                                 font_size="0.7rem",
                                 color=rx.cond(AppState.dark_mode, "#9ca3af", "#6b7280"),
                                 margin_bottom="0.125rem",
@@ -92,6 +136,39 @@ def test_result_item(result: TestResultInfo) -> rx.Component:
                                 color=rx.cond(AppState.dark_mode, "#fecaca", "#991b1b"),
                                 width="100%",
                             ),
+                            rx.cond(
+                                result.output_truncated,
+                                rx.text(
+                                    "Output truncated",
+                                    font_size="0.7rem",
+                                    font_style="italic",
+                                    color=rx.cond(AppState.dark_mode, "#9ca3af", "#6b7280"),
+                                ),
+                                rx.fragment(),
+                            ),
+                            width="100%",
+                        ),
+                        rx.fragment(),
+                    ),
+                    # First line where the output differs
+                    rx.cond(
+                        result.difference != "",
+                        rx.box(
+                            rx.text(
+                                "First difference:",
+                                font_size="0.7rem",
+                                color=rx.cond(AppState.dark_mode, "#9ca3af", "#6b7280"),
+                                margin_bottom="0.125rem",
+                            ),
+                            rx.code(
+                                result.difference,
+                                display="block",
+                                white_space="pre-wrap",
+                                padding="0.375rem",
+                                border_radius="0.25rem",
+                                font_size="0.7rem",
+                                width="100%",
+                            ),
                             width="100%",
                         ),
                         rx.fragment(),
@@ -181,7 +258,7 @@ def test_results(
                     rx.hstack(
                         rx.spinner(size="1"),
                         rx.text(
-                            "Running...",
+                            AppState.run_status_text,
                             color=rx.cond(AppState.dark_mode, "#9ca3af", "#6b7280"),
                             font_size="0.75rem",
                         ),
@@ -219,6 +296,22 @@ def test_results(
                 rx.cond(
                     total_count > 0,
                     rx.vstack(
+                        # One report for a syntax error that fails every test
+                        rx.cond(
+                            AppState.static_error != "",
+                            rx.code(
+                                AppState.static_error,
+                                display="block",
+                                white_space="pre-wrap",
+                                padding="0.375rem",
+                                background=rx.cond(AppState.dark_mode, "#7f1d1d", "#fef2f2"),
+                                border_radius="0.25rem",
+                                font_size="0.7rem",
+                                color=rx.cond(AppState.dark_mode, "#fca5a5", "#991b1b"),
+                                width="100%",
+                            ),
+                            rx.fragment(),
+                        ),
                         rx.foreach(
                             results,
                             test_result_item,
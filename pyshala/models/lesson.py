@@ -1,7 +1,25 @@
 """Lesson and TestCase data models."""
 
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Any, Optional
+
+
+def parse_timeout(value: object) -> Optional[float]:
+    """Read a ``timeout`` field from lesson YAML.
+
+    Args:
+        value: The raw field value.
+
+    Returns:
+        Time limit in seconds, or None if unset or not a positive number.
+    """
+    if isinstance(value, bool):
+        return None
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        return None
+    return timeout if timeout > 0 else None
 
 
 @dataclass
@@ -59,21 +77,51 @@ class Question:
 
 @dataclass
 class TestCase:
-    """A single test case for a lesson."""
+    """A single test case for a lesson.
+
+    A test case either feeds ``stdin`` to the program and compares its
+    output with ``expected_output``, or, if ``function`` is set, calls
+    that function with ``args`` and ``kwargs`` and compares its return
+    value with ``expected_return``. ``compare`` selects how output is
+    matched: "exact", "whitespace", "float", "unordered" or "regex".
+    """
 
     stdin: str = ""
     expected_output: str = ""
     description: str = ""
     hidden: bool = False
+    timeout: Optional[float] = None  # None uses the lesson's time limit
+    function: str = ""
+    args: list = field(default_factory=list)
+    kwargs: dict = field(default_factory=dict)
+    expected_return: Any = None
+    compare: str = "exact"
+    tolerance: Optional[float] = None  # For "float"; None uses the default
+
+    @property
+    def is_function_call(self) -> bool:
+        """Check if this test case calls a function."""
+        return bool(self.function)
 
     def to_dict(self) -> dict:
         """Convert to dictionary for serialization."""
-        return {
+        data = {
             "stdin": self.stdin,
             "expected_output": self.expected_output,
             "description": self.description,
             "hidden": self.hidden,
+            "timeout": self.timeout,
         }
+        if self.is_function_call:
+            data.update(
+                function=self.function,
+                args=self.args,
+                kwargs=self.kwargs,
+                expected_return=self.expected_return,
+            )
+        if self.compare != "exact":
+            data.update(compare=self.compare, tolerance=self.tolerance)
+        return data
 
     @classmethod
     def from_dict(cls, data: dict) -> "TestCase":
@@ -83,6 +131,13 @@ class TestCase:
             expected_output=data.get("expected_output", ""),
             description=data.get("description", ""),
             hidden=data.get("hidden", False),
+            timeout=parse_timeout(data.get("timeout")),
+            function=data.get("function", ""),
+            args=list(data.get("args", [])),
+            kwargs=dict(data.get("kwargs", {})),
+            expected_return=data.get("expected_return"),
+            compare=data.get("compare") or "exact",
+            tolerance=data.get("tolerance"),
         )
 
 
@@ -125,6 +180,8 @@ class Lesson:
     test_cases: list[TestCase] = field(default_factory=list)
     data_files: list[DataFile] = field(default_factory=list)
     questions: list[Question] = field(default_factory=list)  # For quiz lessons
+    fail_fast: Optional[bool] = None  # None uses the executor default
+    timeout: Optional[float] = None  # Seconds; None uses the executor default
 
     def to_dict(self) -> dict:
         """Convert to dictionary for serialization."""
@@ -140,6 +197,8 @@ class Lesson:
             "test_cases": [tc.to_dict() for tc in self.test_cases],
             "data_files": [df.to_dict() for df in self.data_files],
             "questions": [q.to_dict() for q in self.questions],
+            "fail_fast": self.fail_fast,
+            "timeout": self.timeout,
         }
 
     @classmethod
@@ -167,4 +226,6 @@ class Lesson:
             test_cases=test_cases,
             data_files=data_files,
             questions=questions,
+            fail_fast=data.get("fail_fast"),
+            timeout=parse_timeout(data.get("timeout")),
         )
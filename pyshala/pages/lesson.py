@@ -132,6 +132,7 @@ def lesson_page() -> rx.Component:
                                     on_run=AppState.run_code,
                                     on_reset=AppState.reset_code,
                                     is_running=AppState.is_running,
+                                    on_cancel=AppState.cancel_run,
                                 ),
                                 code_editor(
                                     code=AppState.current_code,
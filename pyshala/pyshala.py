@@ -6,6 +6,9 @@ import reflex as rx
 
 from .pages.index import index
 from .pages.lesson import lesson_page
+from .services.judge0_callbacks import judge0_callback_app
+from .services.judge0_client import judge0_lifespan
+from .services.service_stats import stats_app
 from .state.app_state import AppState
 
 
@@ -28,8 +31,14 @@ app = rx.App(
         gray_color="slate",
         radius="medium",
     ),
+    # Endpoint Judge0 sends results to when JUDGE0_CALLBACK_URL is set,
+    # and the execution services' counters for operators
+    api_transformer=[judge0_callback_app, stats_app],
 )
 
+# Close pooled connections to Judge0 on shutdown
+app.register_lifespan_task(judge0_lifespan)
+
 # Add routes
 # Using on_load instead of on_mount ensures data reloads on every navigation
 app.add_page(index, route="/", title=f"{APP_NAME} - Learn Python")
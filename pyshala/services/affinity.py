@@ -0,0 +1,108 @@
+"""CPU sets that code executions are pinned to."""
+
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> set[int]:
+    """Get the CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return set(os.sched_getaffinity(0))
+    return set(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(spec: str) -> set[int]:
+    """Parse a CPU list such as "2-5,7" (the format of ``taskset -c``).
+
+    Args:
+        spec: Comma-separated CPU numbers and inclusive ranges.
+
+    Returns:
+        The CPU numbers.
+
+    Raises:
+        ValueError: If the list is malformed.
+    """
+    cpus: set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        try:
+            start, end = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"Invalid CPU list: {spec!r}") from None
+        if start < 0 or end < start:
+            raise ValueError(f"Invalid CPU range: {part}")
+        cpus.update(range(start, end + 1))
+    if not cpus:
+        raise ValueError(f"Empty CPU list: {spec!r}")
+    return cpus
+
+
+def resolve_cpu_set(setting: Optional[str] = None) -> Optional[frozenset[int]]:
+    """Get the CPUs code executions are pinned to.
+
+    Args:
+        setting: A CPU list such as "2-5,7", "auto" for every available
+                CPU but the first (kept for the web server), or empty to
+                not pin executions. Defaults to the EXECUTION_CPUS env var.
+
+    Returns:
+        The CPU set, or None if executions are not pinned. CPUs this
+        process may not use are dropped; if none are left, executions are
+        not pinned.
+
+    Raises:
+        ValueError: If the CPU list is malformed.
+    """
+    if setting is None:
+        setting = os.getenv("EXECUTION_CPUS", "")
+    setting = setting.strip()
+    if not setting or not hasattr(os, "sched_setaffinity"):
+        return None
+    available = available_cpus()
+    if setting == "auto":
+        if len(available) < 2:
+            return None
+        return frozenset(sorted(available)[1:])
+    cpus = parse_cpu_list(setting) & available
+    if not cpus:
+        logger.warning(
+            "None of the execution CPUs %s are available; not pinning executions",
+            setting,
+        )
+        return None
+    return frozenset(cpus)
+
+
+def execution_cpu_count(cpus: Optional[frozenset[int]] = None) -> int:
+    """Get how many executions can run in parallel without sharing a core.
+
+    Args:
+        cpus: CPU set executions are pinned to. Defaults to the
+             EXECUTION_CPUS env var; without one, every available CPU.
+
+    Returns:
+        Number of CPUs, at least 1.
+    """
+    if cpus is None:
+        cpus = resolve_cpu_set()
+    return max(1, len(cpus if cpus else available_cpus()))
+
+
+def pin(cpus: frozenset[int], pid: int = 0) -> None:
+    """Restrict a process to a CPU set, ignoring failures.
+
+    Args:
+        cpus: CPUs the process may run on.
+        pid: Process to pin. Defaults to the calling process.
+    """
+    try:
+        os.sched_setaffinity(pid, cpus)
+    except (AttributeError, ValueError, OSError):
+        pass
@@ -0,0 +1,724 @@
+"""Single-process test harness used by the local executor's batch mode.
+
+This file is executed as a standalone script by the interpreter configured
+for code execution, so it must only depend on the standard library and
+must never import pyshala itself.
+
+Usage: ``python batch_harness.py SCRIPT_PATH`` with the working directory
+set to the sandbox. The harness reads a JSON list of test cases
+(``{"stdin": ..., "timeout": ..., "max_output": ..., "monitor": ...}``)
+as the first line of stdin, or an object ``{"source": ..., "cases": [...]}``
+that also carries the script's source so the script file need not exist,
+then compiles the script once and runs it once per case, each time in a
+child process forked from the harness. The child gets fresh
+``sys.stdin``/``sys.stdout``/``sys.stderr`` objects (binary-backed, so
+``.buffer`` works), a fresh ``__main__`` namespace and its own time limit,
+and finishes like an interpreter exiting (waiting for non-daemon threads,
+then running ``atexit`` callbacks), so nothing a case does to modules,
+builtins or threads reaches the next one. One JSON line per case is
+written back on the original stdout as soon as the case finishes,
+including the wall-clock and CPU time and the peak memory of its child.
+
+Expected outputs never reach the harness, since the student's code runs
+in a copy of this process and could read them. Instead, a case with
+``monitor`` set streams its stdout as it is written (``{"index": ...,
+"chunk": ...}`` lines, bytes as Latin-1), and the executor compares it. To
+stop a case whose output can no longer match, the executor writes the
+case's index as a line on stdin, which stays open, and sends ``SIGUSR1``.
+
+Results must match running each case in a process of its own, so the
+harness stops early, leaving the remaining cases to be run that way, when
+it cannot reproduce that:
+
+- a case used the standard file descriptors (``os.write(1, ...)``,
+  ``sys.stdout.fileno()``, a child process, ...) or its child exited
+  without reporting a result (``os._exit``, a crash); its result is not
+  reported;
+- a case changed or removed a file that was in the working directory
+  before the first case. Files a case creates are removed after it, so
+  every case starts from the same directory.
+
+A case with a ``call`` (``{"function": ..., "args": [...], "kwargs": {...}}``)
+calls a function instead of running the script. The script is imported as
+a module once, on the first such case and within its time limit, and every
+call case reuses that module, in the harness process itself. The result
+line then also has the ``repr``
+of the return value and, if the value is plain JSON data (tuples count as
+lists), its JSON encoding. Expected values are never sent to the harness:
+the student's code runs in this process and could read them, so the
+executor compares return values itself.
+"""
+
+import atexit
+import io
+import json
+import math
+import os
+import select
+import signal
+import sys
+import tempfile
+import time
+import types
+from typing import Callable, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+class CaseTimeout(BaseException):
+    """Raised inside student code when a case exceeds its time limit.
+
+    Derives from BaseException so ``except Exception`` in student code
+    does not swallow it.
+    """
+
+
+class OutputLimitExceeded(BaseException):
+    """Raised inside student code when a case writes too much output."""
+
+
+class OutputMismatch(BaseException):
+    """Raised inside student code once the executor stops its case."""
+
+
+class NeedsProcess(BaseException):
+    """Raised when a case does something only its own process reproduces."""
+
+
+# Stdout of a monitored case is sent on once this much is pending, or
+# when the case's timer next ticks
+STREAM_CHUNK = 16 * 1024
+STREAM_INTERVAL = 0.05
+
+# Signals that raise inside student code
+_CASE_SIGNALS = {signal.SIGALRM, signal.SIGUSR1}
+
+
+class CappedBuffer(io.BytesIO):
+    """Binary buffer that stops a case once it holds ``limit`` bytes.
+
+    If ``stream`` is given, what is kept is also passed to it, in chunks
+    of up to ``STREAM_CHUNK`` bytes (see ``flush_stream``).
+    """
+
+    def __init__(
+        self,
+        limit: int = 0,
+        stream: Optional[Callable[[bytes], None]] = None,
+        isolated: bool = False,
+    ):
+        super().__init__()
+        self.limit = limit
+        self.stream = stream
+        self.isolated = isolated
+        self.truncated = False
+        self.rejected = False
+        self._pending = bytearray()
+
+    def write(self, b) -> int:
+        b = bytes(b)
+        if self.truncated or self.rejected:
+            # Already stopped; drop whatever cleanup code still prints
+            return len(b)
+        if self.limit and self.tell() + len(b) > self.limit:
+            kept = b[: max(0, self.limit - self.tell())]
+            super().write(kept)
+            self._stream(kept)
+            self.truncated = True
+            raise OutputLimitExceeded()
+        written = super().write(b)
+        self._stream(b)
+        return written
+
+    def _stream(self, b: bytes) -> None:
+        if self.stream is not None:
+            self._pending += b
+            if len(self._pending) >= STREAM_CHUNK:
+                self.flush_stream()
+
+    def flush_stream(self) -> None:
+        """Pass on what is pending; also called from the timer's handler."""
+        # A signal must neither send the same bytes twice nor cut a
+        # message in half
+        mask = signal.pthread_sigmask(signal.SIG_BLOCK, _CASE_SIGNALS)
+        try:
+            chunk = bytes(self._pending)
+            self._pending.clear()
+            if chunk:
+                self.stream(chunk)
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+
+    def fileno(self) -> int:
+        if self.isolated:
+            raise NeedsProcess()
+        return super().fileno()
+
+    def text(self) -> str:
+        """Get the output decoded like the executor decodes a process's."""
+        return self.getvalue().decode("utf-8", errors="replace")
+
+
+def _text_stream(buffer: io.BytesIO) -> io.TextIOWrapper:
+    """Wrap a buffer like the standard streams of a Python process."""
+    return io.TextIOWrapper(buffer, encoding="utf-8", write_through=True)
+
+
+class CaseInput(io.BytesIO):
+    """Standard input of a case."""
+
+    def __init__(self, data: bytes, isolated: bool = False):
+        super().__init__(data)
+        self.isolated = isolated
+
+    def fileno(self) -> int:
+        if self.isolated:
+            raise NeedsProcess()
+        return super().fileno()
+
+
+# Seconds a case's child may run past its time limit before it is killed,
+# for when the time limit cannot interrupt it (e.g. inside C code)
+CHILD_GRACE = 0.5
+
+# Where stop requests arrive, the cases named so far, the running case's
+# index and stdout and its time limit (a time.monotonic() value), and the
+# index and pid of the child running a case
+_control_fd = -1
+_control_data = b""
+_stop_requests: set[int] = set()
+_running: Optional[tuple[int, CappedBuffer]] = None
+_deadline = 0.0
+_child: Optional[tuple[int, int]] = None
+
+
+def _arm_timer() -> None:
+    """Fire SIGALRM at the deadline, or at the next stream tick before it."""
+    remaining = max(_deadline - time.monotonic(), 1e-6)
+    running = _running
+    if running is not None and running[1].stream is not None:
+        remaining = min(remaining, STREAM_INTERVAL)
+    signal.setitimer(signal.ITIMER_REAL, remaining)
+
+
+def _on_alarm(signum, frame):
+    if time.monotonic() >= _deadline:
+        raise CaseTimeout()
+    running = _running
+    if running is not None:
+        running[1].flush_stream()
+    _arm_timer()
+
+
+def _on_stop(signum, frame):
+    global _control_data
+    try:
+        while True:
+            data = os.read(_control_fd, 4096)
+            if not data:
+                break
+            _control_data += data
+    except BlockingIOError:
+        pass
+    *lines, _control_data = _control_data.split(b"\n")
+    _stop_requests.update(int(line) for line in lines if line.strip())
+    child = _child
+    if child is not None:
+        if child[0] in _stop_requests:
+            try:
+                os.kill(child[1], signal.SIGUSR1)
+            except ProcessLookupError:
+                pass
+        return
+    running = _running
+    if running is not None and running[0] in _stop_requests:
+        running[1].rejected = True
+        raise OutputMismatch()
+
+
+def _on_stop_in_child(signum, frame):
+    running = _running
+    if running is not None:
+        running[1].rejected = True
+        raise OutputMismatch()
+
+
+def _chunk_sender(results: io.TextIOBase, index: int) -> Callable[[bytes], None]:
+    """Get a function streaming a case's stdout chunks to the executor."""
+
+    def send(chunk: bytes) -> None:
+        results.write(
+            json.dumps({"index": index, "chunk": chunk.decode("latin-1")}) + "\n"
+        )
+
+    return send
+
+
+def _exit_code(code: object, stderr: io.TextIOBase) -> int:
+    """Translate a SystemExit code into a process exit status."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xFF
+    print(code, file=stderr)
+    return 1
+
+
+def _usage() -> tuple[float, float, int]:
+    """Get (user time, system time, peak RSS in KB) of this process."""
+    if resource is None:
+        return 0.0, 0.0, 0
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    max_rss = usage.ru_maxrss
+    if sys.platform == "darwin":
+        max_rss //= 1024
+    return usage.ru_utime, usage.ru_stime, max_rss
+
+
+def _is_json_data(value: object) -> bool:
+    """Check if a value survives a JSON round trip unchanged (up to tuples)."""
+    if value is None or isinstance(value, (str, bool, int)):
+        return True
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, (list, tuple)):
+        return all(_is_json_data(item) for item in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(key, str) and _is_json_data(item) for key, item in value.items()
+        )
+    return False
+
+
+class StudentModule:
+    """The student script imported as a module, for call cases."""
+
+    def __init__(self, script_path: str, code, syntax_error):
+        self.script_path = script_path
+        self.code = code
+        self.syntax_error = syntax_error
+        self.module: Optional[types.ModuleType] = None
+        # The exception the import raised, re-reported by every call case
+        self.error: Optional[BaseException] = None
+        self.error_tb = None
+
+    def load(self) -> types.ModuleType:
+        """Import the module on first use and return it."""
+        if self.syntax_error is not None:
+            raise self.syntax_error
+        if self.error is not None:
+            raise self.error.with_traceback(self.error_tb)
+        if self.module is None:
+            name = os.path.splitext(os.path.basename(self.script_path))[0]
+            module = types.ModuleType(name)
+            module.__file__ = self.script_path
+            module.__builtins__ = __builtins__
+            sys.modules[name] = module
+            try:
+                exec(self.code, module.__dict__)
+            except (CaseTimeout, OutputLimitExceeded):
+                del sys.modules[name]
+                raise
+            except BaseException as e:
+                self.error, self.error_tb = e, e.__traceback__
+                raise
+            self.module = module
+        return self.module
+
+
+def _shut_down() -> None:
+    """Finish like the interpreter does on exit.
+
+    It waits for non-daemon threads, then runs ``atexit`` callbacks.
+    """
+    threading = sys.modules.get("threading")
+    if threading is not None:
+        threading._shutdown()
+    atexit._run_exitfuncs()
+
+
+def run_case(
+    script_path: str,
+    code,
+    syntax_error,
+    stdin: str,
+    timeout: float,
+    max_output: int = 0,
+    stream: Optional[Callable[[bytes], None]] = None,
+    call: Optional[dict] = None,
+    student: Optional[StudentModule] = None,
+    index: int = -1,
+) -> Optional[dict]:
+    """Run the compiled script against one test case.
+
+    Args:
+        script_path: Path of the student script (used for __file__).
+        code: Compiled code object, or None if compilation failed.
+        syntax_error: The SyntaxError raised by compile, if any.
+        stdin: Standard input for this case.
+        timeout: Time limit for this case in seconds.
+        max_output: Maximum bytes kept from stdout and from stderr;
+                   the case is stopped once either exceeds it. 0 means
+                   unlimited.
+        stream: Called with every chunk of stdout as it is written.
+        call: Function to call instead of running the script, with its
+             args and kwargs.
+        student: The script imported as a module, for ``call``.
+        index: Position of the case, as named by stop requests.
+
+    A script case also waits for the threads it started and runs its
+    ``atexit`` callbacks, so it must run in a process of its own (see
+    ``fork_case``).
+
+    Returns:
+        Dictionary with stdout, stderr, return_code, timed_out, truncated,
+        rejected, wall_time, user_time, system_time and memory, plus
+        return_value (a repr) and return_json for a call; None if a script case
+        used the standard streams' file descriptors, so only a process of
+        its own gives its true result.
+    """
+    cwd = os.path.dirname(script_path)
+    os.chdir(cwd)
+    # Calls always share a process, so there is nothing to fall back to
+    isolated = call is None
+    stdout = CappedBuffer(max_output, stream, isolated)
+    stderr = CappedBuffer(max_output, isolated=isolated)
+    sys.stdin = _text_stream(CaseInput(stdin.encode("utf-8"), isolated))
+    sys.stdout = _text_stream(stdout)
+    sys.stderr = _text_stream(stderr)
+    sys.argv = [script_path]
+
+    main_module = types.ModuleType("__main__")
+    main_module.__file__ = script_path
+    main_module.__builtins__ = __builtins__
+    sys.modules["__main__"] = main_module
+
+    return_code = 0
+    timed_out = False
+    needs_process = False
+    return_value = None
+    return_json = None
+    user_before, system_before, _ = _usage()
+    started = time.monotonic()
+    global _running, _deadline
+    _running = (index, stdout)
+    _deadline = started + timeout
+    _arm_timer()
+    try:
+        try:
+            if index in _stop_requests:
+                raise OutputMismatch()
+            if call is not None:
+                function = getattr(student.load(), call["function"], None)
+                if not callable(function):
+                    raise NameError(f"function {call['function']!r} is not defined")
+                value = function(*call.get("args", []), **call.get("kwargs", {}))
+                return_value = repr(value)
+                if max_output and len(return_value) > max_output:
+                    return_value = return_value[:max_output] + "..."
+                if _is_json_data(value):
+                    return_json = json.dumps(value)
+            elif syntax_error is not None:
+                sys.excepthook(type(syntax_error), syntax_error, None)
+                return_code = 1
+            else:
+                exec(code, main_module.__dict__)
+        except CaseTimeout:
+            timed_out = True
+        except NeedsProcess:
+            needs_process = True
+        except (OutputLimitExceeded, OutputMismatch):
+            return_code = -signal.SIGKILL
+        except SystemExit as e:
+            try:
+                return_code = _exit_code(e.code, stderr)
+            except (OutputLimitExceeded, OutputMismatch):
+                return_code = -signal.SIGKILL
+        except BaseException as e:
+            # Drop the harness's frames so the traceback starts at the
+            # student's script
+            tb = e.__traceback__
+            while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+                tb = tb.tb_next
+            return_code = 1
+            try:
+                sys.excepthook(type(e), e.with_traceback(tb), tb)
+            except (OutputLimitExceeded, OutputMismatch):
+                return_code = -signal.SIGKILL
+            except NeedsProcess:
+                needs_process = True
+        if call is None and not (timed_out or needs_process):
+            try:
+                _shut_down()
+            except CaseTimeout:
+                timed_out = True
+            except NeedsProcess:
+                needs_process = True
+            except (OutputLimitExceeded, OutputMismatch):
+                return_code = -signal.SIGKILL
+    finally:
+        _running = None
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+    if needs_process:
+        return None
+
+    user_after, system_after, max_rss = _usage()
+    usage = {
+        "wall_time": time.monotonic() - started,
+        "user_time": user_after - user_before,
+        "system_time": system_after - system_before,
+        "memory": max_rss,
+    }
+    if timed_out:
+        return _timed_out(usage)
+    return {
+        "stdout": stdout.text(),
+        "stderr": stderr.text(),
+        "return_code": return_code,
+        "timed_out": False,
+        "truncated": stdout.truncated or stderr.truncated,
+        "rejected": stdout.rejected,
+        "return_value": return_value,
+        "return_json": return_json,
+        **usage,
+    }
+
+
+def _timed_out(usage: dict) -> dict:
+    return {
+        "stdout": "",
+        "stderr": "",
+        "return_code": -1,
+        "timed_out": True,
+        "truncated": False,
+        "rejected": False,
+        "return_value": None,
+        "return_json": None,
+        **usage,
+    }
+
+
+def _read_until(fd: int, deadline: float) -> Optional[bytes]:
+    """Read ``fd`` to its end, or return None once ``deadline`` passes."""
+    data = bytearray()
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if ready:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return bytes(data)
+            data += chunk
+
+
+def fork_case(run: Callable[[], Optional[dict]], index: int, timeout: float) -> Optional[dict]:
+    """Run a script case in a child process.
+
+    Args:
+        run: Runs the case and returns its result (see ``run_case``).
+        index: Position of the case; stop requests for it are passed on
+            to the child.
+        timeout: The case's time limit in seconds.
+
+    Returns:
+        The case's result, or None if it needs a process of its own or
+        its child exited without reporting one.
+    """
+    global _child
+    read_fd, write_fd = os.pipe()
+    # Stop requests are held back until the harness knows the child's pid
+    mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGUSR1})
+    started = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            # Only the case's own exit handlers run when it finishes
+            atexit._clear()
+            signal.signal(signal.SIGUSR1, _on_stop_in_child)
+            signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+            result = run()
+            if result is None:
+                result = {"needs_process": True}
+            data = memoryview(json.dumps(result).encode())
+            while data:
+                data = data[os.write(write_fd, data) :]
+            status = 0
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    _child = (index, pid)
+    signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+    try:
+        data = _read_until(read_fd, started + timeout + CHILD_GRACE)
+    finally:
+        _child = None
+        os.close(read_fd)
+    if data is None:
+        os.kill(pid, signal.SIGKILL)
+    _, status, usage = os.wait4(pid, 0)
+    if data is None:
+        return _timed_out(
+            {
+                "wall_time": time.monotonic() - started,
+                "user_time": usage.ru_utime,
+                "system_time": usage.ru_stime,
+                "memory": usage.ru_maxrss,
+            }
+        )
+    if status != 0 or not data:
+        return None
+    result = json.loads(data)
+    return None if result.get("needs_process") else result
+
+
+def _tree(root: str) -> dict[str, Optional[tuple[int, int, int, int]]]:
+    """Get the state of every file and directory below ``root``.
+
+    Files map to what changes when they are written, even if their mtime
+    is set back afterwards; directories map to None.
+    """
+    tree: dict[str, Optional[tuple[int, int, int, int]]] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames:
+            tree[os.path.relpath(os.path.join(dirpath, name), root)] = None
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            tree[os.path.relpath(path, root)] = (
+                st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns
+            )
+    return tree
+
+
+def _restore_tree(root: str, baseline: dict) -> bool:
+    """Remove what a case added below ``root``.
+
+    Returns:
+        False if the case changed or removed something that was there
+        before, which cannot be undone.
+    """
+    current = _tree(root)
+    if any(current.get(rel, 0) != state for rel, state in baseline.items()):
+        return False
+    # Deepest first, so directories are empty when they are removed
+    for rel in sorted(set(current) - set(baseline), key=len, reverse=True):
+        path = os.path.join(root, rel)
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                os.rmdir(path)
+            else:
+                os.unlink(path)
+        except OSError:
+            return False
+    return True
+
+
+def _fds_used(spill: int, spill_size: int) -> bool:
+    """Check whether the last case read fd 0 or wrote to fds 1 and 2."""
+    return os.lseek(0, 0, os.SEEK_CUR) != 0 or os.fstat(spill).st_size != spill_size
+
+
+def _read_payload() -> object:
+    """Read the first line of stdin, leaving the rest for stop requests."""
+    global _control_data
+    data = b""
+    while b"\n" not in data:
+        chunk = os.read(0, 65536)
+        if not chunk:
+            break
+        data += chunk
+    line, _, _control_data = data.partition(b"\n")
+    return json.loads(line)
+
+
+def main(argv: list[str]) -> int:
+    """Run every test case and stream results back."""
+    global _control_fd
+    script_path = os.path.abspath(argv[1])
+    payload = _read_payload()
+    source = None
+    if isinstance(payload, dict):
+        source = payload.get("source")
+        payload = payload["cases"]
+    cases = payload
+
+    # Results go out on a private copy of stdout. The standard file
+    # descriptors point at scratch files instead, so a case reading or
+    # writing them directly is noticed
+    results = os.fdopen(os.dup(1), "w", buffering=1)
+    _control_fd = os.dup(0)
+    os.set_blocking(_control_fd, False)
+    feed = tempfile.TemporaryFile()
+    feed.write(b"\n")
+    feed.flush()
+    spill = tempfile.TemporaryFile()
+    os.dup2(feed.fileno(), 0)
+    os.dup2(spill.fileno(), 1)
+    os.dup2(spill.fileno(), 2)
+    cwd = os.path.dirname(script_path)
+    baseline = _tree(cwd)
+    sys.path[0] = cwd
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.signal(signal.SIGUSR1, _on_stop)
+
+    code = None
+    syntax_error = None
+    try:
+        if source is None:
+            with open(script_path, "rb") as f:
+                source = f.read()
+        code = compile(source, script_path, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        syntax_error = e
+    student = StudentModule(script_path, code, syntax_error)
+
+    for index, case in enumerate(cases):
+        os.lseek(0, 0, os.SEEK_SET)
+        spill_size = os.fstat(1).st_size
+        timeout = float(case["timeout"])
+
+        def run(index=index, case=case, timeout=timeout):
+            return run_case(
+                script_path,
+                code,
+                syntax_error,
+                case.get("stdin", ""),
+                timeout,
+                int(case.get("max_output", 0)),
+                _chunk_sender(results, index) if case.get("monitor") else None,
+                case.get("call"),
+                student,
+                index,
+            )
+
+        if case.get("call") is None:
+            result = fork_case(run, index, timeout)
+            # The remaining cases are run in processes of their own
+            if result is None or _fds_used(1, spill_size):
+                break
+            result["index"] = index
+            results.write(json.dumps(result) + "\n")
+            if not _restore_tree(cwd, baseline):
+                break
+        else:
+            result = run()
+            result["index"] = index
+            results.write(json.dumps(result) + "\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,73 @@
+"""Concurrent test case runs shared by the execution backends."""
+
+import asyncio
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Error message of test cases skipped by fail-fast mode
+NOT_RUN_MESSAGE = "Not run: an earlier test failed"
+
+
+def describe_call(tc: dict) -> str:
+    """Format a function-call test case as Python code, e.g. ``add(2, 3)``.
+
+    Args:
+        tc: Test case dictionary with function, args and kwargs.
+
+    Returns:
+        The call expression.
+    """
+    arguments = [repr(arg) for arg in tc.get("args", [])]
+    arguments += [f"{name}={value!r}" for name, value in tc.get("kwargs", {}).items()]
+    return f"{tc['function']}({', '.join(arguments)})"
+
+
+async def run_cases(
+    count: int,
+    run_case: Callable[[int], Awaitable[T]],
+    max_parallel: int,
+    failed: Callable[[T], bool],
+    fail_fast: bool = False,
+) -> list[Optional[T]]:
+    """Run test cases concurrently and return their results in order.
+
+    Args:
+        count: Number of test cases.
+        run_case: Runs the test case with the given index.
+        max_parallel: Maximum number of test cases running at once.
+        failed: Tells whether a result is a failure.
+        fail_fast: Stop at the first failing test case. Cases after it
+                  are cancelled (or never started) and returned as None,
+                  even if they had already finished, so the outcome does
+                  not depend on timing.
+
+    Returns:
+        One result per test case, None for cases that were not run.
+    """
+    semaphore = asyncio.Semaphore(max_parallel)
+    first_failure = count
+    tasks: list[asyncio.Task] = []
+
+    async def run_one(index: int) -> T:
+        nonlocal first_failure
+        async with semaphore:
+            result = await run_case(index)
+        if fail_fast and index < first_failure and failed(result):
+            first_failure = index
+            for task in tasks[index + 1:]:
+                task.cancel()
+        return result
+
+    tasks = [asyncio.create_task(run_one(index)) for index in range(count)]
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+    results: list[Optional[T]] = []
+    for index, outcome in enumerate(outcomes):
+        if index > first_failure:
+            results.append(None)
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            results.append(outcome)
+    return results
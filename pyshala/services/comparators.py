@@ -0,0 +1,421 @@
+"""Streaming comparison of program output against expected output."""
+
+import ast
+import codecs
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, Union
+
+# How a test case's output is compared with the expected output:
+# - exact: equal after trailing whitespace at the end is stripped
+# - whitespace: equal line by line ignoring spacing and blank lines
+# - float: like whitespace, but numbers may differ by ``tolerance``
+# - unordered: the same lines in any order, ignoring blank lines
+# - regex: every expected line is a pattern the output line must match
+COMPARE_MODES = ("exact", "whitespace", "float", "unordered", "regex")
+
+# Absolute and relative tolerance of the "float" mode
+DEFAULT_TOLERANCE = 1e-6
+
+# Characters of a line shown in a difference report
+REPORT_WIDTH = 60
+
+# Chunk size compare_output feeds a complete output in
+FEED_CHUNK = 64 * 1024
+
+
+@dataclass
+class Comparison:
+    """Outcome of comparing output with the expected output."""
+
+    passed: bool
+    # Where the output first differs, e.g. "Line 3: expected '6', got '5'"
+    difference: str = ""
+
+
+def _show(text: str) -> str:
+    """Quote a line for a report, shortening long ones."""
+    if len(text) > REPORT_WIDTH:
+        text = text[: REPORT_WIDTH - 3] + "..."
+    return repr(text)
+
+
+def _is_blank(line: str) -> bool:
+    return not line or line.isspace()
+
+
+def _numbers_close(actual: str, expected: str, tolerance: float) -> bool:
+    """Compare two tokens as numbers if both are, else as text."""
+    if actual == expected:
+        return True
+    try:
+        a, e = float(actual), float(expected)
+    except ValueError:
+        return False
+    return math.isclose(a, e, rel_tol=tolerance, abs_tol=tolerance)
+
+
+class LineComparator:
+    """Compare output with the expected output line by line as it streams in.
+
+    The comparator is fed raw stdout chunks and keeps only the line being
+    received, so memory stays bounded however much is printed. ``feed``
+    returns False as soon as no continuation of the output could pass,
+    which lets the executor stop the program early; ``finish`` then gives
+    the verdict and a report of the first difference.
+    """
+
+    def __init__(
+        self,
+        expected_output: str,
+        mode: str = "exact",
+        tolerance: Optional[float] = None,
+        slack_bytes: Optional[int] = None,
+        max_line_chars: int = 64 * 1024,
+    ):
+        """Initialize the comparator.
+
+        Args:
+            expected_output: The test case's expected output.
+            mode: One of COMPARE_MODES.
+            tolerance: Tolerance of the "float" mode. Defaults to
+                      DEFAULT_TOLERANCE.
+            slack_bytes: In "exact" mode, reject output that grows beyond
+                        twice the expected length plus this many bytes,
+                        even if it is only whitespace so far. None never
+                        rejects output for its length.
+            max_line_chars: Characters kept of the line being received;
+                           longer lines cannot match and are rejected.
+
+        Raises:
+            ValueError: If the mode is unknown or a pattern is invalid.
+        """
+        if mode not in COMPARE_MODES:
+            raise ValueError(f"Unknown compare mode: {mode}")
+        self.mode = mode
+        self.tolerance = DEFAULT_TOLERANCE if tolerance is None else tolerance
+
+        expected = expected_output.rstrip()
+        lines = expected.split("\n") if expected else []
+        self.max_line_chars = max(
+            max_line_chars, 2 * max((len(line) for line in lines), default=0) + 1
+        )
+        self.max_bytes = (
+            2 * len(expected.encode("utf-8")) + slack_bytes
+            if slack_bytes is not None and mode == "exact"
+            else None
+        )
+        if mode in ("whitespace", "float"):
+            lines = [line for line in lines if not _is_blank(line)]
+            self._tokens = [line.split() for line in lines]
+        elif mode == "unordered":
+            self._remaining = Counter(
+                line.rstrip() for line in lines if not _is_blank(line)
+            )
+        elif mode == "regex":
+            try:
+                self._patterns = [re.compile(line) for line in lines]
+            except re.error as e:
+                raise ValueError(f"Invalid pattern in expected output: {e}") from None
+        self.expected_lines = lines
+
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+        # Characters of the partial line already checked against its target
+        self._checked = 0
+        self._overflow = False
+        self.line_number = 0  # Lines received, including blank ones
+        self._position = 0  # Next expected line to compare with
+        self.received = 0
+        self.mismatch = False
+        self.difference = ""
+
+    def feed(self, chunk: Union[bytes, str]) -> bool:
+        """Check the next chunk of output.
+
+        Args:
+            chunk: Bytes read from the program's stdout, or text.
+
+        Returns:
+            False once the output provably cannot match.
+        """
+        if self.mismatch:
+            return False
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        self.received += len(chunk)
+        text = self._decoder.decode(chunk)
+
+        *complete, rest = text.split("\n")
+        for piece in complete:
+            if not self._add_to_line(piece):
+                return False
+            line, self._partial, self._checked = self._partial, "", 0
+            overflow, self._overflow = self._overflow, False
+            self.line_number += 1
+            if not self._check_line(line, overflow):
+                return False
+        if not self._add_to_line(rest) or not self._check_partial():
+            return False
+
+        if self.max_bytes is not None and self.received > self.max_bytes:
+            return self._fail("Output is much longer than expected")
+        return True
+
+    def finish(self) -> Comparison:
+        """Compare whatever remains and give the verdict.
+
+        Returns:
+            Comparison with the first difference if the output failed.
+        """
+        if not self.mismatch:
+            self._add_to_line(self._decoder.decode(b"", final=True))
+        if not self.mismatch and (self._partial or self._overflow):
+            self.line_number += 1
+            self._check_line(self._partial, self._overflow)
+            self._partial = ""
+        if not self.mismatch:
+            self._check_end()
+        return Comparison(passed=not self.mismatch, difference=self.difference)
+
+    def _fail(self, difference: str) -> bool:
+        self.mismatch = True
+        self.difference = difference
+        return False
+
+    def _add_to_line(self, text: str) -> bool:
+        """Append to the line being received, within the line limit."""
+        if self._overflow:
+            return True
+        room = self.max_line_chars - len(self._partial)
+        if len(text) > room:
+            self._partial += text[:room]
+            self._overflow = True
+            if self.mode != "regex":
+                return self._fail(
+                    f"Line {self.line_number + 1}: longer than "
+                    f"{self.max_line_chars} characters"
+                )
+            return True
+        self._partial += text
+        return True
+
+    def _expected_at(self, index: int) -> Optional[str]:
+        if index < len(self.expected_lines):
+            return self.expected_lines[index]
+        return None
+
+    def _check_partial(self) -> bool:
+        """In "exact" mode, reject a line that already went wrong."""
+        partial = self._partial
+        if self.mode != "exact" or self._checked >= len(partial):
+            return True
+        index = self.line_number
+        expected = self._expected_at(index)
+        start, self._checked = self._checked, len(partial)
+        if expected is None:
+            # Past the expected output only whitespace may follow
+            if partial[start:].isspace():
+                return True
+            return self._fail(
+                f"Line {index + 1}: expected end of output, got {_show(partial.strip())}"
+            )
+        overlap = partial[start : len(expected)]
+        if overlap != expected[start : start + len(overlap)]:
+            return self._fail(
+                f"Line {index + 1}: expected {_show(expected)}, got {_show(partial)}"
+            )
+        tail = partial[max(start, len(expected)):]
+        if not tail:
+            return True
+        if index == len(self.expected_lines) - 1 and tail.isspace():
+            return True
+        return self._fail(
+            f"Line {index + 1}: expected {_show(expected)}, got {_show(partial)}"
+        )
+
+    def _check_line(self, line: str, overflow: bool = False) -> bool:
+        """Check a complete line."""
+        number = self.line_number
+        if self.mode == "unordered":
+            if _is_blank(line):
+                return True
+            line = line.rstrip()
+            if self._remaining[line] <= 0:
+                return self._fail(f"Line {number}: unexpected line {_show(line)}")
+            self._remaining[line] -= 1
+            return True
+
+        if self.mode in ("whitespace", "float"):
+            if _is_blank(line):
+                return True
+            index = self._position
+            self._position += 1
+            if index >= len(self._tokens):
+                return self._fail(
+                    f"Line {number}: expected end of output, got {_show(line.strip())}"
+                )
+            tokens, expected = line.split(), self._tokens[index]
+            if self.mode == "whitespace":
+                same = tokens == expected
+            else:
+                same = len(tokens) == len(expected) and all(
+                    _numbers_close(a, e, self.tolerance)
+                    for a, e in zip(tokens, expected)
+                )
+            if same:
+                return True
+            return self._fail(
+                f"Line {number}: expected {_show(' '.join(expected))}, "
+                f"got {_show(' '.join(tokens))}"
+            )
+
+        # "exact" and "regex" compare lines by position
+        index = number - 1
+        expected = self._expected_at(index)
+        if expected is None:
+            if _is_blank(line):
+                return True
+            return self._fail(
+                f"Line {number}: expected end of output, got {_show(line.strip())}"
+            )
+        if self.mode == "regex":
+            same = not overflow and self._patterns[index].fullmatch(line.rstrip()) is not None
+        elif index == len(self.expected_lines) - 1:
+            same = line.rstrip() == expected
+        else:
+            same = line == expected
+        if same:
+            return True
+        return self._fail(f"Line {number}: expected {_show(expected)}, got {_show(line)}")
+
+    def _check_end(self) -> None:
+        """Check that no expected line is missing once output ended."""
+        if self.mode == "unordered":
+            missing = list(self._remaining.elements())
+            if missing:
+                more = f" and {len(missing) - 1} more" if len(missing) > 1 else ""
+                self._fail(f"Missing line {_show(missing[0])}{more}")
+            return
+        if self.mode in ("whitespace", "float"):
+            if self._position < len(self._tokens):
+                expected = " ".join(self._tokens[self._position])
+                self._fail(
+                    f"Line {self.line_number + 1}: expected {_show(expected)}, "
+                    "got end of output"
+                )
+            return
+        if self.line_number < len(self.expected_lines):
+            expected = self.expected_lines[self.line_number]
+            self._fail(
+                f"Line {self.line_number + 1}: expected {_show(expected)}, "
+                "got end of output"
+            )
+
+
+class StreamingMatcher(LineComparator):
+    """Detect, while output is still arriving, that it can no longer pass.
+
+    Output passes when ``output.rstrip() == expected.rstrip()``. The
+    matcher is fed raw stdout chunks and reports a mismatch only once no
+    continuation of the output could pass: a character differs from the
+    expected output, or something other than whitespace follows it.
+    Output that keeps growing far beyond the expected length is rejected
+    too, even if it is only whitespace so far.
+    """
+
+    def __init__(self, expected_output: str, slack_bytes: int = 1024):
+        """Initialize the matcher.
+
+        Args:
+            expected_output: The test case's expected output.
+            slack_bytes: Extra output tolerated past the expected length,
+                        on top of the expected length itself.
+        """
+        super().__init__(expected_output, "exact", slack_bytes=slack_bytes)
+
+
+def compare_output(
+    actual: str,
+    expected: str,
+    mode: str = "exact",
+    tolerance: Optional[float] = None,
+) -> Comparison:
+    """Compare a complete output with the expected output.
+
+    Args:
+        actual: The program's stdout.
+        expected: The test case's expected output.
+        mode: One of COMPARE_MODES.
+        tolerance: Tolerance of the "float" mode.
+
+    Returns:
+        Comparison with the first difference if the output failed.
+    """
+    comparator = LineComparator(expected, mode or "exact", tolerance)
+    for start in range(0, len(actual), FEED_CHUNK):
+        if not comparator.feed(actual[start : start + FEED_CHUNK]):
+            break
+    return comparator.finish()
+
+
+def _normalize(value: object) -> object:
+    """Turn tuples into lists, so return values compare equal to JSON."""
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    return value
+
+
+def values_equal(actual: object, expected: object) -> bool:
+    """Compare a return value with the expected value of a call case.
+
+    Tuples equal lists with the same items, and floats are compared with a
+    tolerance of 1e-9.
+    """
+    actual, expected = _normalize(actual), _normalize(expected)
+    if isinstance(actual, list) and isinstance(expected, list):
+        return len(actual) == len(expected) and all(
+            values_equal(a, e) for a, e in zip(actual, expected)
+        )
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        return actual.keys() == expected.keys() and all(
+            values_equal(actual[key], expected[key]) for key in actual
+        )
+    numbers = (int, float)
+    if (
+        isinstance(actual, numbers) and isinstance(expected, numbers)
+        and not isinstance(actual, bool) and not isinstance(expected, bool)
+        and (isinstance(actual, float) or isinstance(expected, float))
+    ):
+        return math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9)
+    return type(actual) is type(expected) and actual == expected
+
+
+def return_value_matches(
+    return_json: Optional[str], return_value: Optional[str], expected: object
+) -> bool:
+    """Check a call case's return value, as reported by the harness.
+
+    Args:
+        return_json: JSON encoding of the value, if it is plain data.
+        return_value: ``repr`` of the value, read back as a Python
+                     literal when there is no JSON encoding (e.g. for
+                     sets or dictionaries with non-string keys).
+        expected: The test case's expected return value.
+
+    Returns:
+        True if the value equals ``expected`` (see values_equal).
+    """
+    if return_json is not None:
+        actual = json.loads(return_json)
+    else:
+        try:
+            actual = ast.literal_eval(return_value or "")
+        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+            return False
+    return values_equal(actual, expected)
@@ -0,0 +1,66 @@
+"""Content hashes of data files, memoized by content object identity."""
+
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+from ..models.lesson import DataFile
+
+
+def content_key(data_files: list[DataFile]) -> str:
+    """Hash the names and contents of a set of data files."""
+    digest = hashlib.sha256()
+    for df in sorted(data_files, key=lambda d: d.name):
+        if df.content:
+            digest.update(df.name.encode("utf-8") + b"\0")
+            digest.update(len(df.content).to_bytes(8, "big"))
+            digest.update(df.content)
+    return digest.hexdigest()
+
+
+def content_identity(data_files: list[DataFile]) -> tuple:
+    """Identify a set of data files by their content objects, not values.
+
+    An identity only stays valid while the contents are alive, so whoever
+    keeps one must also hold on to the contents: otherwise their ids can
+    be reused by other objects.
+    """
+    return tuple((df.name, id(df.content)) for df in data_files)
+
+
+class ContentKeys:
+    """LRU memo of content_key by content_identity.
+
+    Hashing multi-MB contents on every run would cost about as much as
+    the copying or compressing a key lets callers skip. Each entry holds
+    the contents its identity refers to.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._keys: OrderedDict[tuple, tuple[str, list]] = OrderedDict()
+
+    def lookup(self, data_files: list[DataFile]) -> Optional[str]:
+        """Get the memoized key of a set of data files, if any."""
+        identity = content_identity(data_files)
+        entry = self._keys.get(identity)
+        if entry is None:
+            return None
+        self._keys.move_to_end(identity)
+        return entry[0]
+
+    def remember(self, data_files: list[DataFile], key: str) -> None:
+        """Memoize the content_key of a set of data files."""
+        identity = content_identity(data_files)
+        self._keys[identity] = (key, [df.content for df in data_files])
+        self._keys.move_to_end(identity)
+        while len(self._keys) > self.max_entries:
+            self._keys.popitem(last=False)
+
+    def get(self, data_files: list[DataFile]) -> str:
+        """Get content_key, hashing only sets of contents not seen before."""
+        key = self.lookup(data_files)
+        if key is None:
+            key = content_key(data_files)
+            self.remember(data_files, key)
+        return key
@@ -0,0 +1,176 @@
+"""Receive Judge0 results through callbacks instead of polling for them."""
+
+import asyncio
+import hmac
+import logging
+import os
+import secrets
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+# Path of the backend endpoint Judge0 sends finished submissions to
+CALLBACK_PATH = "/_judge0/callback"
+
+ASGIApp = Callable[[dict, Callable, Callable], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+class Judge0Callbacks:
+    """Hand submissions Judge0 called back about to whoever waits for them.
+
+    A waiter registers a future per token; the callback endpoint resolves
+    it with the submission's fields. Callbacks can arrive before the
+    submitting request has even returned the token, so unclaimed ones are
+    kept (up to ``max_unclaimed``) for a waiter that registers later.
+    """
+
+    def __init__(self, secret: Optional[str] = None, max_unclaimed: int = 1024):
+        """Initialize the registry.
+
+        Args:
+            secret: Key callbacks must carry, so no one else can report
+                   results. Defaults to the JUDGE0_CALLBACK_SECRET env var,
+                   or a random key per process.
+            max_unclaimed: Callbacks without a waiter kept for later.
+        """
+        self.secret = (
+            secret or os.getenv("JUDGE0_CALLBACK_SECRET") or secrets.token_urlsafe(16)
+        )
+        self.max_unclaimed = max_unclaimed
+        self._waiters: dict[str, asyncio.Future] = {}
+        self._unclaimed: OrderedDict[str, dict] = OrderedDict()
+        self.received = 0
+
+    def url(self, base_url: str) -> str:
+        """Get the callback URL to submit with.
+
+        Args:
+            base_url: Address Judge0 can reach this backend at.
+
+        Returns:
+            URL of the callback endpoint, including the key.
+        """
+        return f"{base_url.rstrip('/')}{CALLBACK_PATH}?key={self.secret}"
+
+    def expect(self, token: str) -> asyncio.Future:
+        """Register interest in a submission's callback.
+
+        Args:
+            token: Submission token.
+
+        Returns:
+            Future resolved with the submission's fields.
+        """
+        future = asyncio.get_running_loop().create_future()
+        data = self._unclaimed.pop(token, None)
+        if data is not None:
+            future.set_result(data)
+        else:
+            self._waiters[token] = future
+        return future
+
+    def discard(self, token: str) -> None:
+        """Stop waiting for a submission's callback."""
+        future = self._waiters.pop(token, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    def deliver(self, data: dict) -> bool:
+        """Pass on the fields of a finished submission.
+
+        Args:
+            data: Body of the callback, with the submission's token.
+
+        Returns:
+            True if someone was waiting for it.
+        """
+        self.received += 1
+        token = data["token"]
+        future = self._waiters.pop(token, None)
+        if future is None:
+            self._unclaimed[token] = data
+            while len(self._unclaimed) > self.max_unclaimed:
+                self._unclaimed.popitem(last=False)
+            return False
+
+        def resolve() -> None:
+            if not future.done():
+                future.set_result(data)
+
+        future.get_loop().call_soon_threadsafe(resolve)
+        return True
+
+
+# Global instance
+_callbacks: Optional[Judge0Callbacks] = None
+
+
+def get_judge0_callbacks() -> Judge0Callbacks:
+    """Get the global Judge0 callback registry."""
+    global _callbacks
+    if _callbacks is None:
+        _callbacks = Judge0Callbacks()
+    return _callbacks
+
+
+def check_callback_setup() -> bool:
+    """Warn if Judge0 callbacks are on without a key shared by all workers.
+
+    Without JUDGE0_CALLBACK_SECRET every backend process picks its own
+    random key, so with several workers most callbacks are rejected.
+
+    Returns:
+        False if a warning was logged.
+    """
+    if os.getenv("JUDGE0_CALLBACK_URL") and not os.getenv("JUDGE0_CALLBACK_SECRET"):
+        logger.warning(
+            "JUDGE0_CALLBACK_URL is set without JUDGE0_CALLBACK_SECRET; "
+            "callbacks only work with a single backend worker"
+        )
+        return False
+    return True
+
+
+def judge0_callback_app(app: ASGIApp) -> ASGIApp:
+    """Serve the Judge0 callback endpoint in front of the backend.
+
+    Used as an API transformer of the Reflex app. Judge0 sends finished
+    submissions with PUT; POST is accepted as well.
+
+    Args:
+        app: The backend ASGI app, which gets every other request.
+
+    Returns:
+        ASGI app answering ``CALLBACK_PATH``.
+    """
+
+    async def asgi(scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["path"] != CALLBACK_PATH:
+            await app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        callbacks = get_judge0_callbacks()
+        if request.method not in ("PUT", "POST"):
+            response = JSONResponse({"error": "Method not allowed"}, status_code=405)
+        elif not hmac.compare_digest(
+            request.query_params.get("key", ""), callbacks.secret
+        ):
+            response = JSONResponse({"error": "Forbidden"}, status_code=403)
+        else:
+            try:
+                data = await request.json()
+            except ValueError:
+                data = None
+            if isinstance(data, dict) and isinstance(data.get("token"), str):
+                callbacks.deliver(data)
+                response = JSONResponse({"ok": True})
+            else:
+                response = JSONResponse({"error": "Bad callback"}, status_code=400)
+        await response(scope, receive, send)
+
+    return asgi
@@ -2,16 +2,45 @@
 
 import asyncio
 import base64
+import importlib.util
 import io
+import logging
 import os
+import time
+import weakref
 import zipfile
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from enum import IntEnum
-from typing import Optional
+from typing import AsyncIterator, Iterator, Optional, Union
 
 import httpx
 
 from ..models.lesson import DataFile
+from .case_runner import NOT_RUN_MESSAGE, describe_call, run_cases
+from .comparators import compare_output
+from .content_keys import ContentKeys, content_key
+from .judge0_callbacks import (
+    Judge0Callbacks,
+    check_callback_setup,
+    get_judge0_callbacks,
+)
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Error of function-call test cases, which need the local executor
+FUNCTION_CALLS_UNSUPPORTED = "Function-call test cases need the local executor"
+
+# Share of a submission's CPU limit that polling backs off to at most,
+# so short jobs are never polled less often than a few times per limit
+POLL_CAP_FRACTION = 0.25
+
+# Submission fields requested when polling in batches
+SUBMISSION_FIELDS = "token,stdout,stderr,compile_output,message,status,time,memory"
 
 
 class SubmissionStatus(IntEnum):
@@ -45,6 +74,10 @@ class ExecutionResult:
     message: str = ""
     time: Optional[float] = None
     memory: Optional[int] = None
+    # Status requests made for the submission, and seconds from submitting
+    # it to having its result
+    polls: int = 0
+    latency: Optional[float] = None
 
     @property
     def is_accepted(self) -> bool:
@@ -92,6 +125,12 @@ class TestResult:
     execution_time: Optional[float] = None
     memory_used: Optional[int] = None
     hidden: bool = False
+    # Skipped because an earlier test failed in fail-fast mode
+    skipped: bool = False
+    timeout: Optional[float] = None  # CPU time limit the test case ran under
+    call: str = ""  # The call made by a function-call test case
+    # Where the output first differs from the expected output
+    difference: str = ""
 
 
 @dataclass
@@ -102,6 +141,7 @@ class TestRunResults:
     all_passed: bool = False
     total_tests: int = 0
     passed_count: int = 0
+    skipped_count: int = 0
 
     def to_dict(self) -> dict:
         """Convert to dictionary for serialization."""
@@ -119,15 +159,45 @@ class TestRunResults:
                     "error_message": tr.error_message,
                     "execution_time": tr.execution_time,
                     "memory_used": tr.memory_used,
+                    "skipped": tr.skipped,
                 }
                 for tr in self.test_results
             ],
             "all_passed": self.all_passed,
             "total_tests": self.total_tests,
             "passed_count": self.passed_count,
+            "skipped_count": self.skipped_count,
         }
 
 
+@dataclass
+class PollStats:
+    """Running totals of how long submissions took to come back."""
+
+    submissions: int = 0
+    polls: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    def record(self, result: "ExecutionResult") -> None:
+        """Add a finished submission."""
+        self.submissions += 1
+        self.polls += result.polls
+        if result.latency is not None:
+            self.total_latency += result.latency
+            self.max_latency = max(self.max_latency, result.latency)
+
+    @property
+    def mean_polls(self) -> float:
+        """Average status requests per submission."""
+        return self.polls / self.submissions if self.submissions else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        """Average seconds from submit to result."""
+        return self.total_latency / self.submissions if self.submissions else 0.0
+
+
 class Judge0Client:
     """Client for Judge0 code execution API."""
 
@@ -140,6 +210,23 @@ class Judge0Client:
         timeout: float = 30.0,
         max_execution_time: float = 10.0,
         max_memory_kb: int = 128000,
+        max_parallel_tests: int = 4,
+        fail_fast: Optional[bool] = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: Optional[bool] = None,
+        batch_submissions: Optional[bool] = None,
+        batch_size: int = 20,
+        poll_initial: float = 0.05,
+        poll_max: float = 2.0,
+        wait: Optional[bool] = None,
+        wait_max_cpu: float = 2.0,
+        zip_cache_mb: int = 64,
+        callback_url: Optional[str] = None,
+        callback_grace: float = 10.0,
+        callbacks: Optional[Judge0Callbacks] = None,
+        result_grace: float = 30.0,
     ):
         """Initialize the Judge0 client.
 
@@ -148,7 +235,60 @@ class Judge0Client:
                      Defaults to JUDGE0_URL env var or http://localhost:2358
             timeout: HTTP request timeout in seconds.
             max_execution_time: Maximum code execution time in seconds.
+                               Lessons and test cases can set their own.
             max_memory_kb: Maximum memory allocation in kilobytes.
+            max_parallel_tests: Maximum number of test cases of one
+                               submission in flight at the same time.
+            fail_fast: Stop a test run at the first failing test case.
+                      Defaults to the FAIL_FAST env var.
+            max_connections: Connections to Judge0 open at once. Defaults
+                            to the JUDGE0_MAX_CONNECTIONS env var.
+            max_keepalive_connections: Idle connections kept open for
+                                      reuse. Defaults to the
+                                      JUDGE0_MAX_KEEPALIVE env var.
+            keepalive_expiry: Seconds an idle connection is kept open.
+                             Defaults to the JUDGE0_KEEPALIVE_EXPIRY env var.
+            http2: Talk HTTP/2 to Judge0. Defaults to the JUDGE0_HTTP2 env
+                  var, or on if the h2 package is installed; ignored
+                  without it.
+            batch_submissions: Submit and poll all test cases of a run
+                              through Judge0's batch endpoints instead of
+                              one request per case. Defaults to the
+                              JUDGE0_BATCH env var (on unless set to 0).
+            batch_size: Submissions per batch request; Judge0 rejects
+                       batches above its MAX_SUBMISSION_BATCH_SIZE (20 by
+                       default). Defaults to the JUDGE0_BATCH_SIZE env var.
+            poll_initial: Seconds before the second status request; the
+                         delay then doubles after every request.
+                         Defaults to the JUDGE0_POLL_INITIAL env var.
+            poll_max: Longest delay between status requests, further
+                     capped at a quarter of the submission's CPU limit.
+                     Defaults to the JUDGE0_POLL_MAX env var.
+            wait: Submit jobs with ``wait=true`` so Judge0 answers with the
+                 result instead of a token to poll. Defaults to the
+                 JUDGE0_WAIT env var. Turned off if Judge0 refuses it.
+            wait_max_cpu: Only jobs with at most this CPU limit (seconds)
+                         use ``wait=true``, as each holds a connection
+                         and a Judge0 web worker while it runs. Defaults
+                         to the JUDGE0_WAIT_MAX_CPU env var.
+            zip_cache_mb: Memory for the encoded data-file ZIPs of recent
+                         lessons, which are built once per content and
+                         reused for every submission (0 disables).
+                         Defaults to the JUDGE0_ZIP_CACHE_MB env var.
+            callback_url: Address Judge0 can reach this backend at. If
+                         set, Judge0 sends every finished submission to
+                         the backend's callback endpoint instead of being
+                         polled for it. Defaults to the JUDGE0_CALLBACK_URL
+                         env var.
+            callback_grace: Seconds past a submission's CPU limit to wait
+                           for its callback before polling for it instead.
+                           Defaults to the JUDGE0_CALLBACK_GRACE env var.
+            callbacks: Registry the callbacks are delivered to. Defaults
+                      to the global one the endpoint uses.
+            result_grace: Seconds past a submission's time limit to wait
+                         for its result (it may queue behind others in
+                         Judge0) before reporting it as timed out.
+                         Defaults to the JUDGE0_RESULT_GRACE env var.
         """
         self.base_url = (
             base_url
@@ -161,6 +301,87 @@ class Judge0Client:
         self.max_memory_kb = int(
             os.getenv("MAX_MEMORY_KB", str(max_memory_kb))
         )
+        self.max_parallel_tests = max(
+            1, int(os.getenv("MAX_PARALLEL_TESTS", str(max_parallel_tests)))
+        )
+        if fail_fast is None:
+            fail_fast = os.getenv("FAIL_FAST", "").lower() in ("1", "true", "yes")
+        self.fail_fast = fail_fast
+        self.limits = httpx.Limits(
+            max_connections=int(
+                os.getenv("JUDGE0_MAX_CONNECTIONS", str(max_connections))
+            ),
+            max_keepalive_connections=int(
+                os.getenv("JUDGE0_MAX_KEEPALIVE", str(max_keepalive_connections))
+            ),
+            keepalive_expiry=float(
+                os.getenv("JUDGE0_KEEPALIVE_EXPIRY", str(keepalive_expiry))
+            ),
+        )
+        if http2 is None:
+            setting = os.getenv("JUDGE0_HTTP2", "")
+            http2 = setting.lower() in ("1", "true", "yes") if setting else True
+        self.http2 = http2 and HTTP2_AVAILABLE
+        if batch_submissions is None:
+            batch_submissions = os.getenv("JUDGE0_BATCH", "1").lower() in ("1", "true", "yes")
+        self.batch_submissions = batch_submissions
+        self.batch_size = max(1, int(os.getenv("JUDGE0_BATCH_SIZE", str(batch_size))))
+        self.poll_initial = float(os.getenv("JUDGE0_POLL_INITIAL", str(poll_initial)))
+        self.poll_max = max(
+            self.poll_initial, float(os.getenv("JUDGE0_POLL_MAX", str(poll_max)))
+        )
+        if wait is None:
+            wait = os.getenv("JUDGE0_WAIT", "").lower() in ("1", "true", "yes")
+        self.wait = wait
+        self.wait_max_cpu = float(os.getenv("JUDGE0_WAIT_MAX_CPU", str(wait_max_cpu)))
+        self.poll_stats = PollStats()
+        self.zip_cache_bytes = (
+            int(os.getenv("JUDGE0_ZIP_CACHE_MB", str(zip_cache_mb))) * 1024 * 1024
+        )
+        self._zips: OrderedDict[str, str] = OrderedDict()
+        self._zip_bytes = 0
+        self._zip_keys = ContentKeys()
+        self._zip_builds: dict[str, asyncio.Future] = {}
+        self.zips_built = 0
+        self.callback_url = callback_url or os.getenv("JUDGE0_CALLBACK_URL") or None
+        self.callback_grace = float(
+            os.getenv("JUDGE0_CALLBACK_GRACE", str(callback_grace))
+        )
+        self.callbacks = callbacks or get_judge0_callbacks()
+        self.result_grace = float(
+            os.getenv("JUDGE0_RESULT_GRACE", str(result_grace))
+        )
+        # One pooled HTTP client per event loop, since connections cannot
+        # be shared across loops
+        self._clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, httpx.AsyncClient
+        ] = weakref.WeakKeyDictionary()
+
+    def _http(self) -> httpx.AsyncClient:
+        """Get the running event loop's HTTP client, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+            )
+            self._clients[loop] = client
+        return client
+
+    async def close(self) -> None:
+        """Close the running event loop's HTTP client and its connections."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def __aenter__(self) -> "Judge0Client":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
 
     def _create_additional_files_zip(
         self, data_files: list[DataFile]
@@ -187,11 +408,105 @@ class Judge0Client:
         zip_buffer.seek(0)
         return base64.b64encode(zip_buffer.read()).decode("utf-8")
 
+    async def _zip_key(self, data_files: list[DataFile]) -> str:
+        """Get the content hash of data files, hashing in a worker thread."""
+        key = self._zip_keys.lookup(data_files)
+        if key is None:
+            key = await asyncio.to_thread(content_key, data_files)
+            self._zip_keys.remember(data_files, key)
+        return key
+
+    async def additional_files_zip(
+        self, data_files: Optional[list[DataFile]]
+    ) -> Optional[str]:
+        """Get the base64-encoded ZIP of data files, building it at most once.
+
+        ZIPs are cached by content hash within ``zip_cache_bytes``, least
+        recently used first out. Hashing and compressing run in a worker
+        thread, and concurrent requests for the same files share one build.
+
+        Args:
+            data_files: List of DataFile objects.
+
+        Returns:
+            Base64-encoded ZIP content or None if no files.
+        """
+        if not data_files or not any(df.content for df in data_files):
+            return None
+
+        key = await self._zip_key(data_files)
+        encoded = self._zips.get(key)
+        if encoded is not None:
+            self._zips.move_to_end(key)
+            return encoded
+
+        loop = asyncio.get_running_loop()
+        build = self._zip_builds.get(key)
+        if build is None or build.get_loop() is not loop:
+            build = loop.create_task(
+                asyncio.to_thread(self._create_additional_files_zip, data_files)
+            )
+            self._zip_builds[key] = build
+            self.zips_built += 1
+            build.add_done_callback(
+                lambda done: self._zip_builds.pop(key, None)
+                if self._zip_builds.get(key) is done
+                else None
+            )
+        # One waiter being cancelled must not cancel the build for the rest
+        encoded = await asyncio.shield(build)
+        self._remember_zip(key, encoded)
+        return encoded
+
+    def _remember_zip(self, key: str, encoded: str) -> None:
+        """Cache an encoded ZIP, evicting the least recently used ones."""
+        if key in self._zips or len(encoded) > self.zip_cache_bytes:
+            return
+        self._zips[key] = encoded
+        self._zip_bytes += len(encoded)
+        while self._zip_bytes > self.zip_cache_bytes:
+            _, evicted = self._zips.popitem(last=False)
+            self._zip_bytes -= len(evicted)
+
+    def _submission_payload(
+        self,
+        source_code: str,
+        stdin: str = "",
+        additional_files: Optional[str] = None,
+        cpu_time_limit: Optional[float] = None,
+    ) -> dict:
+        """Build the JSON body of a base64-encoded submission.
+
+        Args:
+            source_code: Python source code to execute.
+            stdin: Standard input for the program.
+            additional_files: Encoded data files, see
+                             ``additional_files_zip``.
+            cpu_time_limit: Time limit in seconds. Defaults to
+                           ``max_execution_time``.
+        """
+        payload = {
+            "source_code": base64.b64encode(
+                source_code.encode("utf-8")
+            ).decode("utf-8"),
+            "language_id": self.PYTHON3_LANGUAGE_ID,
+            "stdin": base64.b64encode(stdin.encode("utf-8")).decode("utf-8"),
+            "cpu_time_limit": cpu_time_limit or self.max_execution_time,
+            "memory_limit": self.max_memory_kb,
+        }
+
+        if additional_files:
+            payload["additional_files"] = additional_files
+        if self.callback_url:
+            payload["callback_url"] = self.callbacks.url(self.callback_url)
+        return payload
+
     async def submit_code(
         self,
         source_code: str,
         stdin: str = "",
         data_files: Optional[list[DataFile]] = None,
+        cpu_time_limit: Optional[float] = None,
     ) -> str:
         """Submit code for execution and return the submission token.
 
@@ -199,6 +514,8 @@ class Judge0Client:
             source_code: Python source code to execute.
             stdin: Standard input for the program.
             data_files: Additional files to include.
+            cpu_time_limit: Time limit in seconds. Defaults to
+                           ``max_execution_time``.
 
         Returns:
             Submission token string.
@@ -206,30 +523,44 @@ class Judge0Client:
         Raises:
             httpx.HTTPError: If the API request fails.
         """
-        payload = {
-            "source_code": base64.b64encode(
-                source_code.encode("utf-8")
-            ).decode("utf-8"),
-            "language_id": self.PYTHON3_LANGUAGE_ID,
-            "stdin": base64.b64encode(stdin.encode("utf-8")).decode("utf-8"),
-            "cpu_time_limit": self.max_execution_time,
-            "memory_limit": self.max_memory_kb,
-        }
+        payload = self._submission_payload(
+            source_code,
+            stdin,
+            await self.additional_files_zip(data_files),
+            cpu_time_limit,
+        )
+        response = await self._http().post(
+            "/submissions",
+            json=payload,
+            params={"base64_encoded": "true"},
+        )
+        response.raise_for_status()
+        return response.json()["token"]
 
-        # Add additional files if present
-        if data_files:
-            additional_files = self._create_additional_files_zip(data_files)
-            if additional_files:
-                payload["additional_files"] = additional_files
+    async def submit_batch(self, payloads: list[dict]) -> list[Union[str, dict]]:
+        """Create many submissions with as few requests as possible.
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/submissions",
-                json=payload,
+        Args:
+            payloads: Submission bodies, see ``_submission_payload``.
+
+        Returns:
+            For each payload its token, or the errors Judge0 rejected it
+            with.
+
+        Raises:
+            httpx.HTTPError: If an API request fails.
+        """
+        tokens: list[Union[str, dict]] = []
+        for start in range(0, len(payloads), self.batch_size):
+            response = await self._http().post(
+                "/submissions/batch",
+                json={"submissions": payloads[start : start + self.batch_size]},
                 params={"base64_encoded": "true"},
             )
             response.raise_for_status()
-            return response.json()["token"]
+            for item in response.json():
+                tokens.append(item["token"] if "token" in item else item)
+        return tokens
 
     async def get_submission(self, token: str) -> ExecutionResult:
         """Get the result of a submission.
@@ -243,13 +574,44 @@ class Judge0Client:
         Raises:
             httpx.HTTPError: If the API request fails.
         """
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(
-                f"{self.base_url}/submissions/{token}",
-                params={"base64_encoded": "true"},
+        response = await self._http().get(
+            f"/submissions/{token}",
+            params={"base64_encoded": "true"},
+        )
+        response.raise_for_status()
+        return self._parse_submission(response.json())
+
+    async def get_submissions(self, tokens: list[str]) -> dict[str, ExecutionResult]:
+        """Get the results of many submissions in batched requests.
+
+        Args:
+            tokens: Submission tokens.
+
+        Returns:
+            ExecutionResult of each token Judge0 knows.
+
+        Raises:
+            httpx.HTTPError: If an API request fails.
+        """
+        results: dict[str, ExecutionResult] = {}
+        for start in range(0, len(tokens), self.batch_size):
+            response = await self._http().get(
+                "/submissions/batch",
+                params={
+                    "tokens": ",".join(tokens[start : start + self.batch_size]),
+                    "base64_encoded": "true",
+                    "fields": SUBMISSION_FIELDS,
+                },
             )
             response.raise_for_status()
-            data = response.json()
+            for data in response.json().get("submissions", []):
+                if data and data.get("token"):
+                    results[data["token"]] = self._parse_submission(data)
+        return results
+
+    @staticmethod
+    def _parse_submission(data: dict) -> ExecutionResult:
+        """Build an ExecutionResult from a base64-encoded submission."""
 
         # Decode base64 fields
         def decode_field(value: Optional[str]) -> str:
@@ -273,111 +635,497 @@ class Judge0Client:
             memory=int(data["memory"]) if data.get("memory") else None,
         )
 
+    def poll_delays(self, cpu_time_limit: Optional[float] = None) -> Iterator[float]:
+        """Get the delays between a submission's status requests.
+
+        They start at ``poll_initial`` and double up to a cap of
+        ``poll_max`` or a quarter of the CPU limit, whichever is lower.
+
+        Args:
+            cpu_time_limit: The submission's time limit in seconds.
+                           Defaults to ``max_execution_time``.
+
+        Yields:
+            Seconds to sleep before each further status request.
+        """
+        limit = cpu_time_limit or self.max_execution_time
+        cap = max(self.poll_initial, min(self.poll_max, limit * POLL_CAP_FRACTION))
+        delay = self.poll_initial
+        while True:
+            yield delay
+            delay = min(cap, delay * 2)
+
+    def _timed_out(self) -> ExecutionResult:
+        return ExecutionResult(
+            status_id=SubmissionStatus.TIME_LIMIT_EXCEEDED,
+            status_description="Execution timed out waiting for results",
+        )
+
+    def _finish(
+        self, result: ExecutionResult, polls: int, started: float
+    ) -> ExecutionResult:
+        """Record how long a submission took to come back."""
+        result.polls = polls
+        result.latency = time.monotonic() - started
+        self.poll_stats.record(result)
+        logger.debug(
+            "Judge0 submission done after %d polls in %.3fs", polls, result.latency
+        )
+        return result
+
+    async def _submit_and_wait(self, payload: dict) -> Union[ExecutionResult, str]:
+        """Submit with ``wait=true``.
+
+        Returns:
+            The result, or the token to poll if Judge0 answered before the
+            job finished. Falls back to a normal submission (and stops
+            using ``wait=true``) if Judge0 refuses it.
+
+        Raises:
+            httpx.HTTPError: If the API request fails.
+        """
+        response = await self._http().post(
+            "/submissions",
+            json=payload,
+            params={"base64_encoded": "true", "wait": "true"},
+            # The request lasts as long as the job
+            timeout=self.timeout + 2 * payload["cpu_time_limit"],
+        )
+        if response.status_code == 400:
+            logger.warning("Judge0 refused wait=true; polling for results instead")
+            self.wait = False
+            response = await self._http().post(
+                "/submissions",
+                json=payload,
+                params={"base64_encoded": "true"},
+            )
+            response.raise_for_status()
+            return response.json()["token"]
+        response.raise_for_status()
+        data = response.json()
+        result = self._parse_submission(data)
+        if result.is_pending or not data.get("status"):
+            return data["token"]
+        return result
+
     async def execute_and_wait(
         self,
         source_code: str,
         stdin: str = "",
         data_files: Optional[list[DataFile]] = None,
-        poll_interval: float = 0.5,
-        max_wait: float = 60.0,
+        poll_interval: Optional[float] = None,
+        max_wait: Optional[float] = None,
+        cpu_time_limit: Optional[float] = None,
     ) -> ExecutionResult:
         """Submit code and wait for the result.
 
+        In callback mode the result is taken from Judge0's callback.
+        Otherwise short jobs are submitted with ``wait=true`` if enabled.
+        Submissions without a result by then are polled with the delays
+        of ``poll_delays``.
+
         Args:
             source_code: Python source code to execute.
             stdin: Standard input for the program.
             data_files: Additional files to include.
-            poll_interval: Time between status checks in seconds.
+            poll_interval: Fixed time between status checks in seconds.
+                          Defaults to backing off adaptively.
             max_wait: Maximum time to wait for completion in seconds.
+                     Defaults to the time limit plus ``result_grace``.
+            cpu_time_limit: Time limit in seconds. Defaults to
+                           ``max_execution_time``.
 
         Returns:
-            ExecutionResult object.
+            ExecutionResult object, with the number of status requests
+            made and the latency.
         """
-        token = await self.submit_code(source_code, stdin, data_files)
+        started = time.monotonic()
+        cpu_time_limit = cpu_time_limit or self.max_execution_time
+        # A wait=true request returns before a callback could help
+        use_wait = self.wait and not self.callback_url
+        if use_wait and cpu_time_limit <= self.wait_max_cpu:
+            outcome = await self._submit_and_wait(
+                self._submission_payload(
+                    source_code,
+                    stdin,
+                    await self.additional_files_zip(data_files),
+                    cpu_time_limit,
+                )
+            )
+            if isinstance(outcome, ExecutionResult):
+                return self._finish(outcome, 0, started)
+            token = outcome
+        else:
+            token = await self.submit_code(
+                source_code, stdin, data_files, cpu_time_limit
+            )
 
-        elapsed = 0.0
-        while elapsed < max_wait:
+        if max_wait is None:
+            max_wait = cpu_time_limit + self.result_grace
+        deadline = started + max_wait
+        if self.callback_url:
+            called_back = await self._await_callbacks(
+                [token], min(deadline, started + cpu_time_limit + self.callback_grace)
+            )
+            if token in called_back:
+                return self._finish(called_back[token], 0, started)
+
+        delays = self.poll_delays(cpu_time_limit)
+        polls = 0
+        while True:
             result = await self.get_submission(token)
+            polls += 1
             if not result.is_pending:
-                return result
-            await asyncio.sleep(poll_interval)
-            elapsed += poll_interval
+                return self._finish(result, polls, started)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return self._finish(self._timed_out(), polls, started)
+            delay = poll_interval if poll_interval is not None else next(delays)
+            await asyncio.sleep(min(delay, remaining))
+
+    async def _await_callbacks(
+        self, tokens: list[str], deadline: float
+    ) -> dict[str, ExecutionResult]:
+        """Wait for Judge0 to call back about submissions.
+
+        Args:
+            tokens: Submission tokens.
+            deadline: ``time.monotonic()`` value to stop waiting at.
+
+        Returns:
+            Finished results by token; submissions not called back about
+            by the deadline are left out, to be polled for.
+        """
+        futures = {token: self.callbacks.expect(token) for token in tokens}
+        try:
+            await asyncio.wait(
+                futures.values(), timeout=max(0.0, deadline - time.monotonic())
+            )
+        finally:
+            for token, future in futures.items():
+                if not future.done():
+                    self.callbacks.discard(token)
+
+        results = {}
+        for token, future in futures.items():
+            if future.done() and not future.cancelled():
+                data = future.result()
+                result = self._parse_submission(data)
+                if data.get("status") and not result.is_pending:
+                    results[token] = result
+        if len(results) < len(tokens):
+            logger.debug(
+                "No Judge0 callback for %d submissions; polling for them",
+                len(tokens) - len(results),
+            )
+        return results
+
+    async def execute_batch_and_wait(
+        self,
+        payloads: list[dict],
+        poll_interval: Optional[float] = None,
+        max_wait: Optional[float] = None,
+    ) -> list[ExecutionResult]:
+        """Submit many executions at once and wait for all their results.
+
+        Args:
+            payloads: Submission bodies, see ``_submission_payload``.
+            poll_interval: Fixed time between status checks in seconds.
+                          Defaults to backing off adaptively, capped by the
+                          shortest CPU limit of the batch.
+            max_wait: Maximum time to wait for completion in seconds.
+                     Defaults to the longest time limit of the batch plus
+                     ``result_grace``.
+
+        Returns:
+            One ExecutionResult per payload, in order, each with the
+            number of status requests that included it and its latency.
+
+        Raises:
+            httpx.HTTPError: If an API request fails.
+        """
+        started = time.monotonic()
+        tokens = await self.submit_batch(payloads)
+        results: dict[int, ExecutionResult] = {}
+        pending: dict[str, int] = {}
+        for index, token in enumerate(tokens):
+            if isinstance(token, str):
+                pending[token] = index
+            else:
+                results[index] = ExecutionResult(
+                    status_id=SubmissionStatus.INTERNAL_ERROR,
+                    status_description="Internal Error",
+                    message=f"Submission rejected: {token}",
+                )
+
+        longest = max((p["cpu_time_limit"] for p in payloads), default=0.0)
+        if max_wait is None:
+            max_wait = longest + self.result_grace
+        deadline = started + max_wait
+        if self.callback_url and pending:
+            called_back = await self._await_callbacks(
+                list(pending), min(deadline, started + longest + self.callback_grace)
+            )
+            for token, result in called_back.items():
+                results[pending.pop(token)] = self._finish(result, 0, started)
+
+        delays = self.poll_delays(
+            min((p["cpu_time_limit"] for p in payloads), default=None)
+        )
+        polls = 0
+        while pending:
+            polled = await self.get_submissions(list(pending))
+            polls += 1
+            for token, result in polled.items():
+                if token in pending and not result.is_pending:
+                    results[pending.pop(token)] = self._finish(result, polls, started)
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            delay = poll_interval if poll_interval is not None else next(delays)
+            await asyncio.sleep(min(delay, remaining))
 
         # Timeout
-        return ExecutionResult(
-            status_id=SubmissionStatus.TIME_LIMIT_EXCEEDED,
-            status_description="Execution timed out waiting for results",
+        for index in pending.values():
+            results[index] = self._finish(self._timed_out(), polls, started)
+        return [results[index] for index in range(len(payloads))]
+
+    def _make_test_result(
+        self,
+        index: int,
+        tc: dict,
+        exec_result: ExecutionResult,
+        timeout: float,
+    ) -> TestResult:
+        """Grade one execution against its test case.
+
+        Args:
+            index: Position of the test case.
+            tc: Test case dictionary.
+            exec_result: Result of running the code with the case's stdin.
+            timeout: Time limit the execution ran under.
+
+        Returns:
+            TestResult object.
+        """
+        expected = tc.get("expected_output", "")
+        comparison = compare_output(
+            exec_result.stdout,
+            expected,
+            tc.get("compare", "exact"),
+            tc.get("tolerance"),
+        )
+        passed = exec_result.is_accepted and comparison.passed
+
+        return TestResult(
+            test_index=index,
+            description=tc.get("description", f"Test {index + 1}"),
+            passed=passed,
+            stdin=tc.get("stdin", ""),
+            expected_output=expected,
+            actual_output=exec_result.stdout,
+            error_message=exec_result.error_message if not passed else "",
+            execution_time=exec_result.time,
+            memory_used=exec_result.memory,
+            hidden=tc.get("hidden", False),
+            timeout=timeout,
+            difference=(
+                comparison.difference
+                if exec_result.is_accepted and not comparison.passed
+                else ""
+            ),
         )
 
+    def _error_result(self, index: int, tc: dict, error: str) -> TestResult:
+        """Build the result of a test case that could not be run."""
+        return TestResult(
+            test_index=index,
+            description=tc.get("description", f"Test {index + 1}"),
+            passed=False,
+            stdin=tc.get("stdin", ""),
+            expected_output=(
+                repr(tc.get("expected_return"))
+                if tc.get("function")
+                else tc.get("expected_output", "")
+            ),
+            actual_output="",
+            error_message=error,
+            hidden=tc.get("hidden", False),
+            call=describe_call(tc) if tc.get("function") else "",
+        )
+
+    async def _run_test_case(
+        self,
+        index: int,
+        tc: dict,
+        source_code: str,
+        data_files: Optional[list[DataFile]],
+        timeout: Optional[float] = None,
+    ) -> TestResult:
+        """Run code against a single test case.
+
+        Args:
+            index: Position of the test case.
+            tc: Test case dictionary.
+            source_code: Python source code to execute.
+            data_files: Additional files to include.
+            timeout: Time limit of the test case in seconds.
+
+        Returns:
+            TestResult object.
+        """
+        timeout = timeout or self.max_execution_time
+
+        if tc.get("function"):
+            return self._error_result(index, tc, FUNCTION_CALLS_UNSUPPORTED)
+
+        try:
+            exec_result = await self.execute_and_wait(
+                source_code=source_code,
+                stdin=tc.get("stdin", ""),
+                data_files=data_files,
+                cpu_time_limit=timeout,
+            )
+            return self._make_test_result(index, tc, exec_result, timeout)
+
+        except Exception as e:
+            return self._error_result(index, tc, f"Execution failed: {str(e)}")
+
+    async def _run_batched(
+        self,
+        source_code: str,
+        test_cases: list[dict],
+        data_files: Optional[list[DataFile]],
+        timeouts: list[float],
+        fail_fast: bool,
+    ) -> list[Optional[TestResult]]:
+        """Run test cases through batch submissions and batched polls.
+
+        Without fail-fast every case is submitted at once. With it, cases
+        are submitted ``max_parallel_tests`` at a time and nothing more is
+        submitted after a chunk with a failure, so Judge0 does not spend
+        time on cases that will be reported as not run.
+
+        Returns:
+            One result per test case, None for cases not run because of
+            fail-fast mode.
+        """
+        test_results: list[Optional[TestResult]] = [None] * len(test_cases)
+        chunk_size = self.max_parallel_tests if fail_fast else len(test_cases)
+        additional_files = None
+        for start in range(0, len(test_cases), max(1, chunk_size)):
+            chunk = range(start, min(start + chunk_size, len(test_cases)))
+            # Function calls cannot run on Judge0
+            runnable = [i for i in chunk if not test_cases[i].get("function")]
+            for i in chunk:
+                if i not in runnable:
+                    test_results[i] = self._error_result(
+                        i, test_cases[i], FUNCTION_CALLS_UNSUPPORTED
+                    )
+            if runnable:
+                try:
+                    if additional_files is None:
+                        additional_files = await self.additional_files_zip(data_files)
+                    payloads = [
+                        self._submission_payload(
+                            source_code,
+                            test_cases[i].get("stdin", ""),
+                            additional_files,
+                            timeouts[i],
+                        )
+                        for i in runnable
+                    ]
+                    exec_results = await self.execute_batch_and_wait(payloads)
+                except Exception as e:
+                    for i in runnable:
+                        test_results[i] = self._error_result(
+                            i, test_cases[i], f"Execution failed: {str(e)}"
+                        )
+                else:
+                    for i, exec_result in zip(runnable, exec_results):
+                        test_results[i] = self._make_test_result(
+                            i, test_cases[i], exec_result, timeouts[i]
+                        )
+            if fail_fast and any(not test_results[i].passed for i in chunk):
+                break
+
+        if fail_fast:
+            # Report cases after the first failure as not run, as the
+            # one-request-per-case path does
+            for i, test_result in enumerate(test_results):
+                if test_result is not None and not test_result.passed:
+                    test_results[i + 1:] = [None] * (len(test_results) - i - 1)
+                    break
+        return test_results
+
     async def run_tests(
         self,
         source_code: str,
         test_cases: list[dict],
         data_files: Optional[list[DataFile]] = None,
+        fail_fast: Optional[bool] = None,
+        timeout: Optional[float] = None,
     ) -> TestRunResults:
         """Run code against multiple test cases.
 
+        With batch submissions every test case is created in one request
+        and all of them are polled together; otherwise each case is
+        submitted and polled on its own.
+
         Args:
             source_code: Python source code to execute.
             test_cases: List of test case dictionaries with stdin,
-                       expected_output, description, and hidden.
+                       expected_output, description, hidden and an
+                       optional timeout.
             data_files: Additional files to include.
+            fail_fast: Stop at the first failing test case and report the
+                      rest as not run. Defaults to the client setting.
+            timeout: Time limit of test cases without their own, e.g. the
+                    lesson's. Defaults to ``max_execution_time``.
 
         Returns:
             TestRunResults object.
         """
+        if fail_fast is None:
+            fail_fast = self.fail_fast
         results = TestRunResults(total_tests=len(test_cases))
-
-        for i, tc in enumerate(test_cases):
-            stdin = tc.get("stdin", "")
-            expected = tc.get("expected_output", "")
-            description = tc.get("description", f"Test {i + 1}")
-            hidden = tc.get("hidden", False)
-
-            try:
-                exec_result = await self.execute_and_wait(
-                    source_code=source_code,
-                    stdin=stdin,
-                    data_files=data_files,
-                )
-
-                # Normalize output for comparison (strip trailing whitespace)
-                actual = exec_result.stdout.rstrip()
-                expected_normalized = expected.rstrip()
-
-                passed = (
-                    exec_result.is_accepted
-                    and actual == expected_normalized
-                )
-
-                test_result = TestResult(
-                    test_index=i,
-                    description=description,
-                    passed=passed,
-                    stdin=stdin,
-                    expected_output=expected,
-                    actual_output=exec_result.stdout,
-                    error_message=exec_result.error_message if not passed else "",
-                    execution_time=exec_result.time,
-                    memory_used=exec_result.memory,
-                    hidden=hidden,
-                )
-
-            except Exception as e:
-                test_result = TestResult(
-                    test_index=i,
-                    description=description,
-                    passed=False,
-                    stdin=stdin,
-                    expected_output=expected,
-                    actual_output="",
-                    error_message=f"Execution failed: {str(e)}",
-                    hidden=hidden,
+        timeouts = [
+            tc.get("timeout") or timeout or self.max_execution_time
+            for tc in test_cases
+        ]
+
+        if self.batch_submissions:
+            test_results = await self._run_batched(
+                source_code, test_cases, data_files, timeouts, fail_fast
+            )
+        else:
+
+            async def run_one(i: int) -> TestResult:
+                return await self._run_test_case(
+                    i,
+                    test_cases[i],
+                    source_code,
+                    data_files,
+                    timeout=timeouts[i],
                 )
 
+            test_results = await run_cases(
+                len(test_cases),
+                run_one,
+                max_parallel=self.max_parallel_tests,
+                failed=lambda tr: not tr.passed,
+                fail_fast=fail_fast,
+            )
+        for i, (tc, test_result) in enumerate(zip(test_cases, test_results)):
+            if test_result is None:
+                test_result = self._error_result(i, tc, NOT_RUN_MESSAGE)
+                test_result.skipped = True
+                results.skipped_count += 1
             results.test_results.append(test_result)
-            if test_result.passed:
-                results.passed_count += 1
+
+        results.passed_count = sum(
+            1 for tr in results.test_results if tr.passed
+        )
 
         results.all_passed = results.passed_count == results.total_tests
 
@@ -394,3 +1142,17 @@ def get_judge0_client() -> Judge0Client:
     if _client is None:
         _client = Judge0Client()
     return _client
+
+
+@asynccontextmanager
+async def judge0_lifespan() -> AsyncIterator[None]:
+    """Check the callback setup and close Judge0 connections on shutdown.
+
+    Registered as a lifespan task of the Reflex app.
+    """
+    check_callback_setup()
+    try:
+        yield
+    finally:
+        if _client is not None:
+            await _client.close()
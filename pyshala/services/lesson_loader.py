@@ -6,8 +6,9 @@ from typing import Optional
 
 import yaml
 
-from ..models.lesson import DataFile, Lesson, Question, TestCase
+from ..models.lesson import DataFile, Lesson, Question, TestCase, parse_timeout
 from ..models.module import Module
+from .comparators import LineComparator
 
 
 class LessonLoader:
@@ -154,6 +155,14 @@ class LessonLoader:
         # Parse test cases
         test_cases = []
         for tc_data in data.get("test_cases", []):
+            if "function" in tc_data:
+                tc_data = self._parse_function_case(tc_data, lesson_path)
+                if tc_data is None:
+                    continue
+            if "compare" in tc_data or "tolerance" in tc_data:
+                tc_data = self._parse_compare(tc_data, lesson_path)
+                if tc_data is None:
+                    continue
             test_cases.append(TestCase.from_dict(tc_data))
 
         # Parse data files
@@ -202,10 +211,64 @@ class LessonLoader:
             test_cases=test_cases,
             data_files=data_files,
             questions=questions,
+            fail_fast=data.get("fail_fast"),
+            timeout=parse_timeout(data.get("timeout")),
         )
 
         return lesson
 
+    @staticmethod
+    def _parse_function_case(tc_data: dict, lesson_path: Path) -> Optional[dict]:
+        """Check a function-call test case from lesson YAML.
+
+        Args:
+            tc_data: The raw test case.
+            lesson_path: Path of the lesson file, for error messages.
+
+        Returns:
+            The test case with ``args`` as a list, or None if it is invalid.
+        """
+        function = tc_data.get("function")
+        if not isinstance(function, str) or not function.isidentifier():
+            print(f"Error loading lesson {lesson_path}: invalid function name {function!r}")
+            return None
+        args = tc_data.get("args", [])
+        if not isinstance(args, list):
+            # A single argument may be given without a list
+            args = [args]
+        kwargs = tc_data.get("kwargs", {})
+        if not isinstance(kwargs, dict):
+            print(f"Error loading lesson {lesson_path}: kwargs of {function} must be a mapping")
+            return None
+        return {**tc_data, "args": args, "kwargs": kwargs}
+
+    @staticmethod
+    def _parse_compare(tc_data: dict, lesson_path: Path) -> Optional[dict]:
+        """Check the output matching settings of a test case.
+
+        Args:
+            tc_data: The raw test case.
+            lesson_path: Path of the lesson file, for error messages.
+
+        Returns:
+            The test case with ``tolerance`` as a float, or None if it is
+            invalid.
+        """
+        compare = tc_data.get("compare") or "exact"
+        tolerance = tc_data.get("tolerance")
+        if tolerance is not None:
+            if isinstance(tolerance, bool) or not isinstance(tolerance, (int, float)) or tolerance < 0:
+                print(f"Error loading lesson {lesson_path}: invalid tolerance {tolerance!r}")
+                return None
+            tolerance = float(tolerance)
+        try:
+            # Also checks the patterns of the "regex" mode
+            LineComparator(str(tc_data.get("expected_output", "")), compare, tolerance)
+        except ValueError as e:
+            print(f"Error loading lesson {lesson_path}: {e}")
+            return None
+        return {**tc_data, "compare": compare, "tolerance": tolerance}
+
     def get_module(self, module_id: str) -> Optional[Module]:
         """Get a module by ID.
 
@@ -0,0 +1,174 @@
+"""Resource limits applied to processes that run student code."""
+
+import math
+import os
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from .affinity import pin, resolve_cpu_set
+
+try:
+    import pwd
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    pwd = None
+    resource = None
+
+
+def execution_user(name: Optional[str] = None) -> tuple[int, int]:
+    """Resolve the user executions run as.
+
+    Args:
+        name: User name or numeric uid. Defaults to the EXECUTION_USER
+             env var.
+
+    Returns:
+        (uid, gid), or (0, 0) if executions run as the server's own user.
+
+    Raises:
+        ValueError: If there is no such user.
+    """
+    name = os.getenv("EXECUTION_USER", "") if name is None else name
+    if not name:
+        return 0, 0
+    try:
+        if name.isdigit():
+            entry = pwd.getpwuid(int(name))
+        else:
+            entry = pwd.getpwnam(name)
+    except (KeyError, AttributeError):
+        if name.isdigit():
+            return int(name), int(name)
+        raise ValueError(f"Unknown execution user: {name}") from None
+    return entry.pw_uid, entry.pw_gid
+
+
+@dataclass
+class ResourceLimits:
+    """Per-process rlimits, CPU affinity and user for code execution.
+
+    A value of 0 leaves the corresponding limit unchanged, an empty
+    ``cpus`` leaves the process free to run on any CPU, and a ``uid`` of
+    0 keeps the server's own user.
+    """
+
+    address_space_mb: int = 2048
+    cpu_seconds: int = 0
+    file_size_mb: int = 64
+    max_processes: int = 0
+    cpus: tuple[int, ...] = ()
+    uid: int = 0
+    gid: int = 0
+
+    @classmethod
+    def from_env(cls, timeout: float) -> "ResourceLimits":
+        """Build limits from environment variables.
+
+        Args:
+            timeout: Wall-clock time limit of an execution in seconds. The
+                    CPU limit defaults to one second more than this.
+                    Executions are pinned to the EXECUTION_CPUS CPU set
+                    and run as EXECUTION_USER.
+
+        Returns:
+            ResourceLimits object.
+        """
+        defaults = cls(cpu_seconds=cls.cpu_seconds_for(timeout))
+        uid, gid = execution_user()
+        return cls(
+            address_space_mb=int(
+                os.getenv("EXECUTION_MEMORY_LIMIT_MB", str(defaults.address_space_mb))
+            ),
+            cpu_seconds=int(
+                os.getenv("EXECUTION_CPU_LIMIT", str(defaults.cpu_seconds))
+            ),
+            file_size_mb=int(
+                os.getenv("EXECUTION_FILE_SIZE_LIMIT_MB", str(defaults.file_size_mb))
+            ),
+            max_processes=int(
+                os.getenv("EXECUTION_MAX_PROCESSES", str(defaults.max_processes))
+            ),
+            cpus=tuple(sorted(resolve_cpu_set() or ())),
+            uid=uid,
+            gid=gid,
+        )
+
+    @staticmethod
+    def cpu_seconds_for(timeout: float) -> int:
+        """Get the default CPU limit for a wall-clock time limit."""
+        return math.ceil(timeout) + 1
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary for passing to helper processes."""
+        return asdict(self)
+
+    def _rlimits(self) -> list[tuple[int, int]]:
+        """Get (resource, value) pairs for every limit that is set."""
+        if resource is None:
+            return []
+        pairs = []
+        if self.address_space_mb:
+            pairs.append((resource.RLIMIT_AS, self.address_space_mb * 1024 * 1024))
+        if self.cpu_seconds:
+            pairs.append((resource.RLIMIT_CPU, self.cpu_seconds))
+        if self.file_size_mb:
+            pairs.append((resource.RLIMIT_FSIZE, self.file_size_mb * 1024 * 1024))
+        if self.max_processes and hasattr(resource, "RLIMIT_NPROC"):
+            pairs.append((resource.RLIMIT_NPROC, self.max_processes))
+        return pairs
+
+    def apply(self, pid: Optional[int] = None) -> None:
+        """Apply the limits.
+
+        Soft and hard limits are both lowered, so student code cannot
+        raise them again. The hard CPU limit is one second above the soft
+        one so SIGXCPU arrives before the kernel's SIGKILL. The process
+        is pinned to ``cpus``; children it starts inherit the pinning.
+        Last, the calling process switches to ``uid`` and ``gid``; failing
+        to do so raises rather than running student code as the server.
+
+        Args:
+            pid: Process to limit. Defaults to the calling process, which
+                makes this usable as a ``preexec_fn``. The user of another
+                process cannot be changed.
+        """
+        for which, value in self._rlimits():
+            try:
+                if pid is None:
+                    _, current_hard = resource.getrlimit(which)
+                else:
+                    _, current_hard = resource.prlimit(pid, which)
+                soft = value
+                hard = value + 1 if which == resource.RLIMIT_CPU else value
+                if current_hard != resource.RLIM_INFINITY:
+                    soft, hard = min(soft, current_hard), min(hard, current_hard)
+                if pid is None:
+                    resource.setrlimit(which, (soft, hard))
+                else:
+                    resource.prlimit(pid, which, (soft, hard))
+            except (ValueError, OSError):
+                pass
+        if self.cpus:
+            pin(frozenset(self.cpus), pid or 0)
+        if self.uid and pid is None:
+            os.setgroups([])
+            os.setgid(self.gid)
+            os.setuid(self.uid)
+
+    def hand_over(self, path: str) -> None:
+        """Give a working directory and its files to the executions' user.
+
+        Files with more than one link are left alone: they share their
+        inode with a data file template, which must stay read-only.
+
+        Args:
+            path: Working directory, populated by the server.
+        """
+        if not self.uid:
+            return
+        for dirpath, _, filenames in os.walk(path):
+            os.chown(dirpath, self.uid, self.gid, follow_symlinks=False)
+            for name in filenames:
+                file_path = os.path.join(dirpath, name)
+                if os.lstat(file_path).st_nlink == 1:
+                    os.chown(file_path, self.uid, self.gid, follow_symlinks=False)
@@ -1,13 +1,57 @@
 """Local Python code executor - simpler alternative to Judge0."""
 
 import asyncio
+import json
 import os
+import signal
 import subprocess
 import tempfile
-from dataclasses import dataclass, field
-from typing import Optional
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Callable, Iterator, Optional
 
 from ..models.lesson import DataFile
+from .case_runner import NOT_RUN_MESSAGE, describe_call, run_cases
+from .comparators import LineComparator, compare_output, return_value_matches
+from .limits import ResourceLimits
+from .process import ChildProcess, kill_group
+from .reaper import ProcessReaper, get_process_reaper
+from .result_cache import (
+    ResultCache,
+    get_result_cache,
+    is_cacheable_output,
+    is_cacheable_source,
+)
+from .runtime_stats import RuntimeStats, get_runtime_stats
+from .sandbox import (
+    SandboxTemplates,
+    SessionSandboxes,
+    get_sandbox_templates,
+    get_session_sandboxes,
+    resolve_scratch_dir,
+)
+from .scheduler import ExecutionScheduler, get_execution_scheduler
+from .static_checks import StaticCheckStage, StaticIssue
+from .zygote import Zygote
+
+# Executions run with a fixed hash seed, so that iterating over a set of
+# strings prints the same order every time and their results can be cached
+EXECUTION_HASH_SEED = "0"
+
+BATCH_HARNESS_SCRIPT = str(Path(__file__).with_name("batch_harness.py"))
+SCRIPT_RUNNER = str(Path(__file__).with_name("script_runner.py"))
+
+# How the student script reaches the process: written to script.py, or
+# handed over in memory (a memfd, or the batch harness's stdin)
+SCRIPT_DELIVERY_MODES = ("file", "memory")
+
+# Extra time the batch harness gets per case before it is considered wedged
+BATCH_GRACE_PERIOD = 2.0
+
+# Largest single result line the batch harness may send back
+BATCH_LINE_LIMIT = 64 * 1024 * 1024
 
 
 @dataclass
@@ -18,17 +62,36 @@ class ExecutionResult:
     stderr: str = ""
     return_code: int = 0
     timed_out: bool = False
+    # Output hit the size limit and the process was stopped
+    truncated: bool = False
+    # Output could no longer match the expected output and the process
+    # was stopped
+    rejected: bool = False
+    # CPU time (user + system) in seconds and peak memory in KB
+    time: Optional[float] = None
+    memory: Optional[int] = None
+    wall_time: Optional[float] = None
+    # Function calls: repr of the return value, and its JSON encoding if
+    # it is plain data
+    return_value: Optional[str] = None
+    return_json: Optional[str] = None
 
     @property
     def is_success(self) -> bool:
         """Check if execution was successful."""
-        return self.return_code == 0 and not self.timed_out
+        return self.return_code == 0 and not self.timed_out and not self.truncated
 
     @property
     def error_message(self) -> str:
         """Get error message if any."""
         if self.timed_out:
             return "Execution timed out"
+        if self.truncated:
+            return "Output limit exceeded"
+        if self.rejected:
+            return "Stopped early: output does not match the expected output"
+        if self.return_code == -signal.SIGXCPU:
+            return "CPU time limit exceeded"
         if self.stderr:
             return self.stderr
         if self.return_code != 0:
@@ -48,6 +111,16 @@ class TestResult:
     actual_output: str = ""
     error_message: str = ""
     hidden: bool = False
+    # Skipped because an earlier test failed in fail-fast mode
+    skipped: bool = False
+    output_truncated: bool = False
+    execution_time: Optional[float] = None
+    memory_used: Optional[int] = None
+    wall_time: Optional[float] = None
+    timeout: Optional[float] = None  # Time limit the test case ran under
+    call: str = ""  # The call made by a function-call test case
+    # Where the output first differs from the expected output
+    difference: str = ""
 
 
 @dataclass
@@ -58,6 +131,9 @@ class TestRunResults:
     all_passed: bool = False
     total_tests: int = 0
     passed_count: int = 0
+    skipped_count: int = 0
+    # Set when a static check rejected the code before any test ran
+    static_error: Optional[StaticIssue] = None
 
 
 class LocalExecutor:
@@ -67,21 +143,331 @@ class LocalExecutor:
         self,
         timeout: float = 10.0,
         python_path: Optional[str] = None,
+        use_zygote: Optional[bool] = None,
+        preload_modules: Optional[list[str]] = None,
+        batch_tests: Optional[bool] = None,
+        max_parallel_tests: int = 4,
+        scheduler: Optional[ExecutionScheduler] = None,
+        cache: Optional[ResultCache] = None,
+        templates: Optional[SandboxTemplates] = None,
+        limits: Optional[ResourceLimits] = None,
+        max_output_bytes: int = 1024 * 1024,
+        early_kill: Optional[bool] = None,
+        fail_fast: Optional[bool] = None,
+        static_checks: Optional[bool] = None,
+        reaper: Optional[ProcessReaper] = None,
+        scratch_dir: Optional[str] = None,
+        script_delivery: Optional[str] = None,
+        runtime_stats: Optional[RuntimeStats] = None,
+        session_sandboxes: Optional[SessionSandboxes] = None,
     ):
         """Initialize the local executor.
 
         Args:
-            timeout: Maximum execution time in seconds.
+            timeout: Maximum execution time in seconds. Lessons and test
+                    cases can set their own.
             python_path: Path to Python interpreter. Defaults to 'python3'.
+            use_zygote: Fork executions from a long-lived zygote process
+                       instead of starting a fresh interpreter each time.
+                       Defaults to the EXECUTOR_ZYGOTE env var.
+            preload_modules: Modules the zygote imports once up front.
+                            Defaults to the comma-separated ZYGOTE_PRELOAD
+                            env var.
+            batch_tests: Run all test cases of a submission in one harness
+                        process instead of one process per case.
+                        Defaults to the EXECUTOR_BATCH_TESTS env var.
+            max_parallel_tests: Maximum number of test cases of one
+                               submission that run at the same time.
+            scheduler: Scheduler that caps executions across sessions.
+                      Defaults to the global scheduler.
+            cache: Cache for deterministic execution results. Defaults to
+                  the global cache if the EXECUTION_CACHE env var is set,
+                  otherwise results are not cached.
+            templates: Template store that links data files into working
+                      directories instead of writing them for every run.
+                      Defaults to the global store if the SANDBOX_TEMPLATES
+                      env var is set.
+            limits: Resource limits applied to every execution. Defaults
+                   to the EXECUTION_*_LIMIT env vars; unless
+                   EXECUTION_CPU_LIMIT is set, the CPU limit then follows
+                   each execution's own time limit.
+            max_output_bytes: Bytes kept from each of stdout and stderr.
+                             An execution that writes more is stopped.
+            early_kill: Stop a test case as soon as its output can no
+                       longer match the expected output, instead of
+                       waiting for the program to exit. Defaults to the
+                       EXECUTOR_EARLY_KILL env var.
+            fail_fast: Stop a test run at the first failing test case.
+                      Defaults to the FAIL_FAST env var; lessons can
+                      override it.
+            static_checks: Check submissions for syntax errors in-process
+                          before spawning any test process. Defaults to
+                          the STATIC_CHECKS env var (on unless set to 0).
+            reaper: Kills processes left behind by executions. Defaults
+                   to the global reaper.
+            scratch_dir: Where working directories are created: a path,
+                        "auto" for /dev/shm when usable, or empty for the
+                        system temp directory. Defaults to the
+                        EXECUTION_SCRATCH_DIR env var.
+            script_delivery: One of SCRIPT_DELIVERY_MODES. Defaults to the
+                            EXECUTION_SCRIPT_DELIVERY env var or "file".
+                            "memory" needs os.memfd_create and falls back
+                            to "file" without it.
+            runtime_stats: Records the runtimes of lessons' test cases and
+                          estimates how long their next executions take,
+                          for the scheduler. Defaults to the global stats.
+            session_sandboxes: Keeps a working directory per session and
+                              lesson between submissions, so data files
+                              are written once rather than for every run.
+                              Defaults to the global store if the
+                              SESSION_SANDBOXES env var is set.
         """
         self.timeout = float(os.getenv("MAX_EXECUTION_TIME", str(timeout)))
         self.python_path = python_path or os.getenv("PYTHON_PATH", "python3")
+        if use_zygote is None:
+            use_zygote = os.getenv("EXECUTOR_ZYGOTE", "").lower() in ("1", "true", "yes")
+        self.use_zygote = use_zygote
+        if preload_modules is None:
+            preload_modules = [
+                name.strip()
+                for name in os.getenv("ZYGOTE_PRELOAD", "").split(",")
+                if name.strip()
+            ]
+        self.preload_modules = preload_modules
+        if batch_tests is None:
+            batch_tests = os.getenv("EXECUTOR_BATCH_TESTS", "").lower() in ("1", "true", "yes")
+        self.batch_tests = batch_tests
+        self.max_parallel_tests = max(
+            1, int(os.getenv("MAX_PARALLEL_TESTS", str(max_parallel_tests)))
+        )
+        self.scheduler = scheduler or get_execution_scheduler()
+        if cache is None and os.getenv("EXECUTION_CACHE", "").lower() in ("1", "true", "yes"):
+            cache = get_result_cache()
+        self.cache = cache
+        if templates is None and os.getenv("SANDBOX_TEMPLATES", "").lower() in ("1", "true", "yes"):
+            templates = get_sandbox_templates()
+        self.templates = templates
+        self._cpu_follows_timeout = (
+            limits is None and "EXECUTION_CPU_LIMIT" not in os.environ
+        )
+        self.limits = limits or ResourceLimits.from_env(self.timeout)
+        self.max_output_bytes = int(
+            os.getenv("MAX_OUTPUT_BYTES", str(max_output_bytes))
+        )
+        if early_kill is None:
+            early_kill = os.getenv("EXECUTOR_EARLY_KILL", "").lower() in ("1", "true", "yes")
+        self.early_kill = early_kill
+        if fail_fast is None:
+            fail_fast = os.getenv("FAIL_FAST", "").lower() in ("1", "true", "yes")
+        self.fail_fast = fail_fast
+        if static_checks is None:
+            static_checks = os.getenv("STATIC_CHECKS", "1").lower() in ("1", "true", "yes")
+        self.static_checks = StaticCheckStage(self.python_path) if static_checks else None
+        self.reaper = reaper or get_process_reaper()
+        self.scratch_dir = resolve_scratch_dir(scratch_dir)
+        script_delivery = script_delivery or os.getenv("EXECUTION_SCRIPT_DELIVERY", "file")
+        if script_delivery not in SCRIPT_DELIVERY_MODES:
+            raise ValueError(f"Unknown script delivery mode: {script_delivery}")
+        if not hasattr(os, "memfd_create"):
+            script_delivery = "file"
+        self.script_delivery = script_delivery
+        self.runtime_stats = runtime_stats or get_runtime_stats()
+        if session_sandboxes is None and os.getenv("SESSION_SANDBOXES", "").lower() in ("1", "true", "yes"):
+            session_sandboxes = get_session_sandboxes()
+        self.session_sandboxes = session_sandboxes
+        self._zygote: Optional[Zygote] = None
+
+    def _in_memory(self, source_code: str) -> Optional[str]:
+        """Get the source to deliver in memory, or None in "file" mode."""
+        return source_code if self.script_delivery == "memory" else None
+
+    def _expected_runtime(self, lesson: str, cases: int = 1) -> float:
+        """Estimate how long running some of a lesson's test cases takes."""
+        if not lesson:
+            return 0.0
+        return (self.runtime_stats.estimate(lesson) or 0.0) * cases
+
+    def _resolve_timeout(self, timeout: Optional[float]) -> float:
+        """Get the time limit of an execution, falling back to the default."""
+        if timeout is not None and timeout > 0:
+            return float(timeout)
+        return self.timeout
+
+    def _limits_for(self, timeout: float) -> ResourceLimits:
+        """Get the resource limits of an execution with a given time limit."""
+        if not self._cpu_follows_timeout or timeout == self.timeout:
+            return self.limits
+        return replace(
+            self.limits, cpu_seconds=ResourceLimits.cpu_seconds_for(timeout)
+        )
+
+    async def _spawn(
+        self,
+        script_path: str,
+        cwd: str,
+        limits: ResourceLimits,
+        source: Optional[str] = None,
+    ):
+        """Start a process running the script with piped standard streams.
+
+        Args:
+            script_path: Path to the script to run.
+            cwd: Working directory for the process.
+            limits: Resource limits of the process.
+            source: The script's source, handed over in a memfd instead
+                   of being read from ``script_path``.
+
+        Returns:
+            A ChildProcess, or a ZygoteProcess in zygote mode. Either way
+            the process leads its own session and process group.
+        """
+        source_fd = self._source_fd(source) if source is not None else None
+        try:
+            if self.use_zygote:
+                if self._zygote is None:
+                    self._zygote = Zygote(
+                        self.python_path, self.preload_modules, env=self._env()
+                    )
+                process = await self._zygote.spawn(
+                    script_path, cwd, limits.to_dict(), source_fd
+                )
+            else:
+                args = [self.python_path, script_path]
+                if source_fd is not None:
+                    args = [self.python_path, SCRIPT_RUNNER, script_path, str(source_fd)]
+                process = await ChildProcess.start(
+                    args,
+                    cwd=cwd,
+                    preexec_fn=limits.apply,
+                    pass_fds=(source_fd,) if source_fd is not None else (),
+                    env=self._env(),
+                )
+        finally:
+            if source_fd is not None:
+                os.close(source_fd)
+        self.reaper.track(process.pid)
+        return process
+
+    @staticmethod
+    def _env() -> dict[str, str]:
+        """Get the environment executions run with."""
+        return {**os.environ, "PYTHONHASHSEED": EXECUTION_HASH_SEED}
+
+    @staticmethod
+    def _source_fd(source: str) -> int:
+        """Put a script's source into an anonymous in-memory file."""
+        fd = os.memfd_create("script.py", os.MFD_CLOEXEC)
+        data = memoryview(source.encode("utf-8"))
+        while data:
+            data = data[os.write(fd, data):]
+        os.lseek(fd, 0, os.SEEK_SET)
+        return fd
+
+    def release_session(self, session_id: str) -> None:
+        """Drop what is kept for a session between its submissions.
+
+        Args:
+            session_id: A session that left its lesson or disconnected.
+        """
+        if self.session_sandboxes is not None and session_id:
+            self.session_sandboxes.release(session_id)
+
+    async def close(self) -> None:
+        """Stop the zygote process, if one was started."""
+        if self._zygote is not None:
+            await self._zygote.close()
+            self._zygote = None
+
+    def _prepare_workdir(
+        self,
+        workdir: str,
+        source_code: str,
+        data_files: Optional[list[DataFile]],
+    ) -> str:
+        """Write the script and data files into a working directory.
+
+        Args:
+            workdir: Directory to populate.
+            source_code: Python source code to execute.
+            data_files: Additional data files to make available.
+
+        Returns:
+            Path of the script. In "memory" script delivery mode nothing
+            is written there.
+        """
+        self._write_data_files(workdir, data_files)
+        return self._write_script(workdir, source_code)
+
+    def _write_script(self, workdir: str, source_code: str) -> str:
+        """Write the script into a working directory, unless delivered in memory.
+
+        Returns:
+            Path of the script.
+        """
+        script_path = os.path.join(workdir, "script.py")
+        if self.script_delivery == "file":
+            with open(script_path, "w") as f:
+                f.write(source_code)
+        return script_path
+
+    def _write_data_files(
+        self, workdir: str, data_files: Optional[list[DataFile]]
+    ) -> None:
+        """Link data files from their template, or write them out.
+
+        The directory then belongs to the user executions run as.
+        """
+        if data_files and self.templates is not None:
+            self.templates.populate(workdir, data_files)
+        elif data_files:
+            for df in data_files:
+                if df.content:
+                    file_path = os.path.join(workdir, df.name)
+                    # Ensure parent directory exists (for nested paths like "data/file.csv")
+                    file_dir = os.path.dirname(file_path)
+                    if file_dir:
+                        os.makedirs(file_dir, exist_ok=True)
+                    # Write as binary since content is loaded as bytes
+                    with open(file_path, "wb") as f:
+                        f.write(df.content)
+        self.limits.hand_over(workdir)
+
+    @contextmanager
+    def _workdir(
+        self,
+        source_code: str,
+        data_files: Optional[list[DataFile]],
+        session_id: str,
+        lesson: str,
+    ) -> Iterator[tuple[str, str]]:
+        """Get a working directory with the script and data files in place.
+
+        Runs of a lesson reuse the session's directory if session
+        sandboxes are enabled; otherwise a temporary directory is used.
+
+        Yields:
+            The directory and the script's path in it.
+        """
+        if self.session_sandboxes is not None and session_id and lesson:
+            with self.session_sandboxes.lease(
+                session_id, lesson, data_files or [], self._write_data_files
+            ) as workdir:
+                yield workdir, self._write_script(workdir, source_code)
+            return
+        with tempfile.TemporaryDirectory(dir=self.scratch_dir) as workdir:
+            yield workdir, self._prepare_workdir(workdir, source_code, data_files)
 
     async def execute(
         self,
         source_code: str,
         stdin: str = "",
         data_files: Optional[list[DataFile]] = None,
+        session_id: str = "",
+        expected_output: Optional[str] = None,
+        timeout: Optional[float] = None,
+        lesson: str = "",
+        compare: str = "exact",
+        tolerance: Optional[float] = None,
     ) -> ExecutionResult:
         """Execute Python code and return the result.
 
@@ -89,118 +475,811 @@ class LocalExecutor:
             source_code: Python source code to execute.
             stdin: Standard input for the program.
             data_files: Additional data files to make available.
+            session_id: Session the execution is queued under.
+            expected_output: If given, the program is stopped as soon as
+                            its stdout can no longer match it.
+            timeout: Time limit in seconds. Defaults to the executor's.
+            lesson: Lesson key the execution belongs to, for estimating
+                   its runtime.
+            compare: How stdout is matched against ``expected_output``,
+                    one of COMPARE_MODES.
+            tolerance: Tolerance of the "float" compare mode.
 
         Returns:
             ExecutionResult object.
         """
-        # Create a temporary directory for execution
-        with tempfile.TemporaryDirectory() as tmpdir:
-            # Write the source code
-            script_path = os.path.join(tmpdir, "script.py")
-            with open(script_path, "w") as f:
-                f.write(source_code)
+        timeout = self._resolve_timeout(timeout)
+        cache_key = self._cache_key(source_code, stdin, data_files, timeout)
+        if cache_key is not None:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return ExecutionResult(**cached)
 
-            # Write any data files
-            if data_files:
-                for df in data_files:
-                    if df.content:
-                        file_path = os.path.join(tmpdir, df.name)
-                        # Ensure parent directory exists (for nested paths like "data/file.csv")
-                        file_dir = os.path.dirname(file_path)
-                        if file_dir:
-                            os.makedirs(file_dir, exist_ok=True)
-                        # Write as binary since content is loaded as bytes
-                        with open(file_path, "wb") as f:
-                            f.write(df.content)
-
-            # Run the code
-            try:
-                process = await asyncio.create_subprocess_exec(
-                    self.python_path,
+        # Wait for a slot, then create a temporary directory for execution
+        async with self.scheduler.slot(session_id, self._expected_runtime(lesson)):
+            with self._workdir(source_code, data_files, session_id, lesson) as (
+                tmpdir, script_path
+            ):
+                result = await self._run_script(
                     script_path,
-                    stdin=asyncio.subprocess.PIPE,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                    cwd=tmpdir,
+                    tmpdir,
+                    stdin,
+                    expected_output,
+                    timeout,
+                    source=self._in_memory(source_code),
+                    compare=compare,
+                    tolerance=tolerance,
+                )
+
+        await self._cache_result(cache_key, result)
+        return result
+
+    def _cache_key(
+        self,
+        source_code: str,
+        stdin: str,
+        data_files: Optional[list[DataFile]],
+        timeout: float,
+    ) -> Optional[str]:
+        """Build the result cache key for an execution.
+
+        Returns:
+            The key, or None if caching is disabled or the code may not
+            behave deterministically.
+        """
+        if self.cache is None or not is_cacheable_source(source_code):
+            return None
+        parts: list[object] = [
+            source_code, stdin, self.python_path, timeout,
+            self.max_output_bytes, sorted(self._limits_for(timeout).to_dict().items()),
+        ]
+        for df in data_files or []:
+            parts.extend([df.name, df.content])
+        return ResultCache.make_key(*parts)
+
+    async def _cache_result(
+        self, cache_key: Optional[str], result: ExecutionResult
+    ) -> None:
+        """Store a result if it is a deterministic outcome of the code."""
+        if cache_key is None or self.cache is None:
+            return
+        # Timeouts, kills and executor failures depend on host load
+        if (
+            result.timed_out
+            or result.truncated
+            or result.rejected
+            or result.return_code < 0
+            or not is_cacheable_output(result.stdout, result.stderr)
+        ):
+            return
+        await self.cache.put(cache_key, asdict(result))
+
+    async def _run_script(
+        self,
+        script_path: str,
+        cwd: str,
+        stdin: str,
+        expected_output: Optional[str] = None,
+        timeout: Optional[float] = None,
+        source: Optional[str] = None,
+        compare: str = "exact",
+        tolerance: Optional[float] = None,
+    ) -> ExecutionResult:
+        """Run a prepared script in its working directory.
+
+        Args:
+            script_path: Path to the script to run.
+            cwd: Working directory containing the script and data files.
+            stdin: Standard input for the program.
+            expected_output: If given, stop the program as soon as its
+                            stdout can no longer match it.
+            timeout: Time limit in seconds. Defaults to the executor's.
+            source: The script's source if it is delivered in memory
+                   rather than written to ``script_path``.
+            compare: How stdout is matched against ``expected_output``.
+            tolerance: Tolerance of the "float" compare mode.
+
+        Returns:
+            ExecutionResult object.
+        """
+        try:
+            monitor = None
+            if expected_output is not None:
+                monitor = LineComparator(
+                    expected_output, compare, tolerance, slack_bytes=1024
+                ).feed
+
+            timeout = self._resolve_timeout(timeout)
+            started = time.monotonic()
+            process = await self._spawn(
+                script_path, cwd, self._limits_for(timeout), source
+            )
+            # Kill anything the program leaves running in its session. That
+            # also closes stdout/stderr pipes inherited by leaked processes
+            process.add_exit_callback(
+                lambda: self.reaper.collect(process.pid, count=not process.killed)
+            )
+
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(
+                        input=stdin.encode(),
+                        max_output=self.max_output_bytes,
+                        stdout_monitor=monitor,
+                    ),
+                    timeout=timeout,
                 )
+                result = ExecutionResult(
+                    stdout=stdout.decode("utf-8", errors="replace"),
+                    stderr=stderr.decode("utf-8", errors="replace"),
+                    return_code=process.returncode or 0,
+                    truncated=process.output_truncated,
+                    rejected=process.output_rejected,
+                )
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                result = ExecutionResult(
+                    timed_out=True,
+                    return_code=-1,
+                )
+            except asyncio.CancelledError:
+                # The run was abandoned (e.g. fail-fast); don't leave it running
+                process.kill()
+                raise
+
+            result.wall_time = time.monotonic() - started
+            usage = process.rusage
+            if usage is not None:
+                result.time = usage.user_time + usage.system_time
+                result.memory = usage.max_rss_kb
+            return result
+
+        except Exception as e:
+            return ExecutionResult(
+                stderr=str(e),
+                return_code=-1,
+            )
+
+    async def execute_batch(
+        self,
+        source_code: str,
+        stdins: list[str],
+        data_files: Optional[list[DataFile]] = None,
+        session_id: str = "",
+        expected_outputs: Optional[list[Optional[str]]] = None,
+        stop_when: Optional[Callable[[int, ExecutionResult], bool]] = None,
+        timeouts: Optional[list[Optional[float]]] = None,
+        lesson: str = "",
+        compares: Optional[list[str]] = None,
+        tolerances: Optional[list[Optional[float]]] = None,
+    ) -> list[Optional[ExecutionResult]]:
+        """Execute Python code once per stdin inside a single harness process.
+
+        Every case gets fresh standard streams, a fresh ``__main__``
+        namespace, a working directory without what earlier cases wrote
+        and its own time limit. Cases the harness could not finish
+        (because a case crashed or wedged it, used the standard file
+        descriptors directly or changed a data file) are re-run in
+        isolation with :meth:`execute`, so the results match per-process
+        execution.
 
-                try:
-                    stdout, stderr = await asyncio.wait_for(
-                        process.communicate(input=stdin.encode()),
-                        timeout=self.timeout,
+        Args:
+            source_code: Python source code to execute.
+            stdins: Standard input for each case.
+            data_files: Additional data files to make available.
+            session_id: Session the execution is queued under.
+            expected_outputs: Expected output for each case. If given, a
+                             case is stopped as soon as its stdout can no
+                             longer match it; None entries are never
+                             stopped early.
+            stop_when: Called with each finished case's index and result;
+                      once it returns True no later case is run.
+            timeouts: Time limit of each case in seconds; None entries
+                     use the executor's.
+            lesson: Lesson key the cases belong to, for estimating their
+                   runtime.
+            compares: How each case's stdout is matched against its
+                     expected output; defaults to "exact".
+            tolerances: Tolerance of each case's "float" compare mode.
+
+        Returns:
+            One ExecutionResult per entry in ``stdins``, in order, or None
+            for cases skipped because of ``stop_when``.
+        """
+        compares = compares or ["exact"] * len(stdins)
+        tolerances = tolerances or [None] * len(stdins)
+        resolved = [
+            self._resolve_timeout(timeouts[index] if timeouts is not None else None)
+            for index in range(len(stdins))
+        ]
+        results: dict[int, ExecutionResult] = {}
+        cache_keys: dict[int, Optional[str]] = {}
+        for index, stdin in enumerate(stdins):
+            cache_key = self._cache_key(source_code, stdin, data_files, resolved[index])
+            cached = await self.cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                results[index] = ExecutionResult(**cached)
+            else:
+                cache_keys[index] = cache_key
+
+        # A cached result can already end the run
+        stop_index = len(stdins)
+        if stop_when is not None:
+            for index in sorted(results):
+                if stop_when(index, results[index]):
+                    stop_index = index
+                    break
+
+        pending = [index for index in cache_keys if index < stop_index]
+        if pending:
+            expected = self._expected_runtime(lesson, len(pending))
+            async with self.scheduler.slot(session_id, expected):
+                with self._workdir(source_code, data_files, session_id, lesson) as (
+                    tmpdir, script_path
+                ):
+                    harness_results = await self._run_harness(
+                        script_path,
+                        tmpdir,
+                        [stdins[index] for index in pending],
+                        [expected_outputs[index] for index in pending]
+                        if expected_outputs is not None
+                        else None,
+                        stop_when=(
+                            (lambda position, r: stop_when(pending[position], r))
+                            if stop_when is not None
+                            else None
+                        ),
+                        timeouts=[resolved[index] for index in pending],
+                        source=self._in_memory(source_code),
+                        compares=[compares[index] for index in pending],
+                        tolerances=[tolerances[index] for index in pending],
                     )
-                    return ExecutionResult(
-                        stdout=stdout.decode("utf-8", errors="replace"),
-                        stderr=stderr.decode("utf-8", errors="replace"),
-                        return_code=process.returncode or 0,
+            for position, result in harness_results.items():
+                index = pending[position]
+                results[index] = result
+                await self._cache_result(cache_keys[index], result)
+
+        # Fall back to isolated execution for anything the harness missed
+        ordered: list[Optional[ExecutionResult]] = [None] * len(stdins)
+        for index, stdin in enumerate(stdins):
+            if index not in results:
+                results[index] = await self.execute(
+                    source_code=source_code,
+                    stdin=stdin,
+                    data_files=data_files,
+                    session_id=session_id,
+                    expected_output=(
+                        expected_outputs[index] if expected_outputs is not None else None
+                    ),
+                    timeout=resolved[index],
+                    lesson=lesson,
+                    compare=compares[index],
+                    tolerance=tolerances[index],
+                )
+            ordered[index] = results[index]
+            if stop_when is not None and stop_when(index, results[index]):
+                break
+
+        return ordered
+
+    async def execute_calls(
+        self,
+        source_code: str,
+        calls: list[dict],
+        data_files: Optional[list[DataFile]] = None,
+        session_id: str = "",
+        stop_when: Optional[Callable[[int, ExecutionResult], bool]] = None,
+        timeouts: Optional[list[Optional[float]]] = None,
+        lesson: str = "",
+    ) -> list[Optional[ExecutionResult]]:
+        """Call functions defined by the code, all in one harness process.
+
+        The code is imported once and every call gets its own time limit.
+        If a call takes the harness down (e.g. with ``os._exit``), it is
+        reported as failed and the remaining calls run in a new harness.
+
+        Args:
+            source_code: Python source code defining the functions.
+            calls: Dictionaries with the function name, args and kwargs
+                  of each call.
+            data_files: Additional data files to make available.
+            session_id: Session the execution is queued under.
+            stop_when: Called with each finished call's index and result;
+                      once it returns True no later call is made.
+            timeouts: Time limit of each call in seconds; None entries use
+                     the executor's.
+            lesson: Lesson key the calls belong to, for estimating their
+                   runtime.
+
+        Returns:
+            One ExecutionResult per call, in order, or None for calls
+            skipped because of ``stop_when``.
+        """
+        resolved = [
+            self._resolve_timeout(timeouts[index] if timeouts is not None else None)
+            for index in range(len(calls))
+        ]
+        ordered: list[Optional[ExecutionResult]] = [None] * len(calls)
+        next_index = 0
+        while next_index < len(calls):
+            pending = list(range(next_index, len(calls)))
+            expected = self._expected_runtime(lesson, len(pending))
+            async with self.scheduler.slot(session_id, expected):
+                with self._workdir(source_code, data_files, session_id, lesson) as (
+                    tmpdir, script_path
+                ):
+                    finished = await self._run_harness(
+                        script_path,
+                        tmpdir,
+                        [""] * len(pending),
+                        stop_when=(
+                            (lambda position, r: stop_when(pending[position], r))
+                            if stop_when is not None
+                            else None
+                        ),
+                        timeouts=[resolved[index] for index in pending],
+                        source=self._in_memory(source_code),
+                        calls=[calls[index] for index in pending],
                     )
-                except asyncio.TimeoutError:
-                    process.kill()
-                    await process.wait()
-                    return ExecutionResult(
-                        timed_out=True,
+
+            # Results arrive in order, so the first gap is the call that
+            # took the harness down
+            for position, index in enumerate(pending):
+                result = finished.get(position)
+                if result is None:
+                    result = ExecutionResult(
+                        stderr="The test process exited unexpectedly",
                         return_code=-1,
                     )
+                ordered[index] = result
+                next_index = index + 1
+                if stop_when is not None and stop_when(index, result):
+                    return ordered
+                if position not in finished:
+                    break
 
-            except Exception as e:
-                return ExecutionResult(
-                    stderr=str(e),
-                    return_code=-1,
+        return ordered
+
+    async def _run_harness(
+        self,
+        script_path: str,
+        cwd: str,
+        stdins: list[str],
+        expected_outputs: Optional[list[Optional[str]]] = None,
+        stop_when: Optional[Callable[[int, ExecutionResult], bool]] = None,
+        timeouts: Optional[list[float]] = None,
+        source: Optional[str] = None,
+        calls: Optional[list[dict]] = None,
+        compares: Optional[list[str]] = None,
+        tolerances: Optional[list[Optional[float]]] = None,
+    ) -> dict[int, ExecutionResult]:
+        """Run a prepared script once per stdin in the batch harness.
+
+        Expected outputs stay in this process: cases that have one stream
+        their stdout back, and a case is stopped (through a line on the
+        harness's stdin and ``SIGUSR1``) once its output can no longer
+        match.
+
+        Args:
+            script_path: Path to the script to run.
+            cwd: Working directory containing the script and data files.
+            stdins: Standard input for each case.
+            expected_outputs: Expected output for each case, for early
+                             mismatch detection; None entries are never
+                             stopped early.
+            stop_when: Called with each finished case's position and
+                      result; the harness is stopped once it returns True.
+            timeouts: Time limit of each case in seconds. Defaults to the
+                     executor's.
+            source: The script's source if it is sent along with the test
+                   cases rather than written to ``script_path``.
+            calls: Function call of each case (function, args and
+                  kwargs), made instead of running the script.
+            compares: How each case's stdout is matched against its
+                     expected output; defaults to "exact".
+            tolerances: Tolerance of each case's "float" compare mode.
+
+        Returns:
+            Results keyed by case index for every case the harness finished.
+            Memory of a function call case is the harness's peak so far,
+            since those cases share its process.
+        """
+        results: dict[int, ExecutionResult] = {}
+        if timeouts is None:
+            timeouts = [self.timeout] * len(stdins)
+        cases = [
+            {
+                "stdin": stdin,
+                "timeout": timeout,
+                "max_output": self.max_output_bytes,
+            }
+            for stdin, timeout in zip(stdins, timeouts)
+        ]
+        monitors: dict[int, Callable[[bytes], bool]] = {}
+        if expected_outputs is not None:
+            for position, expected in enumerate(expected_outputs):
+                if expected is None:
+                    continue
+                monitors[position] = LineComparator(
+                    expected,
+                    compares[position] if compares is not None else "exact",
+                    tolerances[position] if tolerances is not None else None,
+                    slack_bytes=1024,
+                ).feed
+                cases[position]["monitor"] = True
+        if calls is not None:
+            for case, call in zip(cases, calls):
+                case["call"] = call
+        if source is not None:
+            payload = json.dumps({"source": source, "cases": cases}).encode()
+        else:
+            payload = json.dumps(cases).encode()
+        # The rest of stdin carries stop requests
+        payload += b"\n"
+
+        # The harness runs every case, so its CPU budget covers all of them
+        limits = replace(
+            self.limits,
+            cpu_seconds=sum(
+                self._limits_for(timeout).cpu_seconds for timeout in timeouts
+            ),
+        )
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.python_path,
+                BATCH_HARNESS_SCRIPT,
+                script_path,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                cwd=cwd,
+                limit=BATCH_LINE_LIMIT,
+                preexec_fn=limits.apply,
+                start_new_session=True,
+                env=self._env(),
+            )
+            self.reaper.track(process.pid)
+            process.stdin.write(payload)
+            await process.stdin.drain()
+
+            # Results stream back one line per case as each finishes,
+            # after the stdout chunks of monitored cases
+            stopped: set[int] = set()
+            deadline = time.monotonic() + BATCH_GRACE_PERIOD + (
+                timeouts[0] if timeouts else 0.0
+            )
+            while len(results) < len(timeouts):
+                line = await asyncio.wait_for(
+                    process.stdout.readline(),
+                    timeout=max(0.0, deadline - time.monotonic()),
+                )
+                if not line:
+                    break
+                message = json.loads(line)
+                if "chunk" in message:
+                    index = message["index"]
+                    monitor = monitors.get(index)
+                    if (
+                        monitor is not None
+                        and index not in stopped
+                        and not monitor(message["chunk"].encode("latin-1"))
+                    ):
+                        stopped.add(index)
+                        try:
+                            process.stdin.write(f"{index}\n".encode())
+                            await process.stdin.drain()
+                            process.send_signal(signal.SIGUSR1)
+                        except OSError:
+                            # The harness is gone; its output ends next
+                            pass
+                    continue
+                result = results[message["index"]] = ExecutionResult(
+                    stdout=message["stdout"],
+                    stderr=message["stderr"],
+                    return_code=message["return_code"],
+                    timed_out=message["timed_out"],
+                    truncated=message["truncated"],
+                    rejected=message["rejected"],
+                    time=message["user_time"] + message["system_time"],
+                    memory=message["memory"],
+                    wall_time=message["wall_time"],
+                    return_value=message.get("return_value"),
+                    return_json=message.get("return_json"),
                 )
+                if stop_when is not None and stop_when(message["index"], result):
+                    break
+                if len(results) < len(timeouts):
+                    deadline = (
+                        time.monotonic() + timeouts[len(results)] + BATCH_GRACE_PERIOD
+                    )
+            else:
+                # Let the harness exit by itself, so that whatever is left
+                # in its session afterwards is reaped as leaked
+                await asyncio.wait_for(process.wait(), timeout=BATCH_GRACE_PERIOD)
+        except (asyncio.TimeoutError, OSError, ValueError):
+            pass
+        finally:
+            if process is not None:
+                process.stdin.close()
+                killed = process.returncode is None
+                if killed:
+                    kill_group(process.pid)
+                    process.kill()
+                    await process.wait()
+                self.reaper.collect(process.pid, count=not killed)
+
+        return results
+
+    def _make_test_result(
+        self,
+        index: int,
+        tc: dict,
+        exec_result: ExecutionResult,
+        timeout: Optional[float] = None,
+    ) -> TestResult:
+        """Grade one execution against its test case.
+
+        Args:
+            index: Position of the test case.
+            tc: Test case dictionary.
+            exec_result: Result of running the code with the case's stdin.
+            timeout: Time limit the execution ran under.
+
+        Returns:
+            TestResult object.
+        """
+        if tc.get("function"):
+            # Compared here: the harness never sees the expected value
+            passed = exec_result.is_success and return_value_matches(
+                exec_result.return_json,
+                exec_result.return_value,
+                tc.get("expected_return"),
+            )
+            return TestResult(
+                test_index=index,
+                description=tc.get("description", f"Test {index + 1}"),
+                passed=passed,
+                expected_output=repr(tc.get("expected_return")),
+                actual_output=exec_result.return_value or "",
+                error_message=exec_result.error_message if not passed else "",
+                hidden=tc.get("hidden", False),
+                execution_time=exec_result.time,
+                memory_used=exec_result.memory,
+                wall_time=exec_result.wall_time,
+                timeout=timeout,
+                call=describe_call(tc),
+            )
+
+        stdin = tc.get("stdin", "")
+        expected = tc.get("expected_output", "")
+
+        comparison = compare_output(
+            exec_result.stdout, expected, tc.get("compare", "exact"), tc.get("tolerance")
+        )
+        passed = exec_result.is_success and comparison.passed
+
+        return TestResult(
+            test_index=index,
+            description=tc.get("description", f"Test {index + 1}"),
+            passed=passed,
+            stdin=stdin,
+            expected_output=expected,
+            actual_output=exec_result.stdout,
+            error_message=exec_result.error_message if not passed else "",
+            hidden=tc.get("hidden", False),
+            output_truncated=exec_result.truncated,
+            execution_time=exec_result.time,
+            memory_used=exec_result.memory,
+            wall_time=exec_result.wall_time,
+            timeout=timeout,
+            difference=(
+                comparison.difference
+                if (exec_result.is_success or exec_result.rejected)
+                and not comparison.passed
+                else ""
+            ),
+        )
+
+    def _not_run_result(self, index: int, tc: dict) -> TestResult:
+        """Build the result of a test case skipped in fail-fast mode."""
+        if tc.get("function"):
+            return TestResult(
+                test_index=index,
+                description=tc.get("description", f"Test {index + 1}"),
+                passed=False,
+                expected_output=repr(tc.get("expected_return")),
+                error_message=NOT_RUN_MESSAGE,
+                hidden=tc.get("hidden", False),
+                skipped=True,
+                call=describe_call(tc),
+            )
+        return TestResult(
+            test_index=index,
+            description=tc.get("description", f"Test {index + 1}"),
+            passed=False,
+            stdin=tc.get("stdin", ""),
+            expected_output=tc.get("expected_output", ""),
+            error_message=NOT_RUN_MESSAGE,
+            hidden=tc.get("hidden", False),
+            skipped=True,
+        )
+
+    def _static_error_results(
+        self, test_cases: list[dict], issue: StaticIssue
+    ) -> TestRunResults:
+        """Report every test case as not run because of a static issue."""
+        results = TestRunResults(
+            total_tests=len(test_cases),
+            skipped_count=len(test_cases),
+            static_error=issue,
+        )
+        for i, tc in enumerate(test_cases):
+            test_result = self._not_run_result(i, tc)
+            test_result.error_message = f"Not run: {issue.kind}"
+            if issue.line is not None:
+                test_result.error_message += f" on line {issue.line}"
+            results.test_results.append(test_result)
+        return results
 
     async def run_tests(
         self,
         source_code: str,
         test_cases: list[dict],
         data_files: Optional[list[DataFile]] = None,
+        session_id: str = "",
+        fail_fast: Optional[bool] = None,
+        timeout: Optional[float] = None,
+        lesson: str = "",
     ) -> TestRunResults:
         """Run code against multiple test cases.
 
         Args:
             source_code: Python source code to execute.
             test_cases: List of test case dictionaries with stdin,
-                       expected_output, description, and hidden.
+                       expected_output, description, hidden and an
+                       optional timeout. Function-call cases have a
+                       function, args, kwargs and expected_return instead
+                       of stdin and expected_output; they all run in one
+                       process, after the other cases.
             data_files: Additional files to include.
+            session_id: Session the executions are queued under.
+            fail_fast: Stop at the first failing test case and report the
+                      rest as not run. Defaults to the executor setting.
+            timeout: Time limit of test cases without their own, e.g. the
+                    lesson's. Defaults to the executor's.
+            lesson: Lesson key, e.g. "module_id/lesson_id". If given, the
+                   runtimes are recorded and used to estimate how long
+                   the lesson's later executions take.
 
         Returns:
             TestRunResults object.
         """
+        if fail_fast is None:
+            fail_fast = self.fail_fast
+
+        # Code that cannot compile fails every test the same way
+        if self.static_checks is not None and test_cases:
+            issue = await self.static_checks.run(source_code)
+            if issue is not None:
+                return self._static_error_results(test_cases, issue)
+
         results = TestRunResults(total_tests=len(test_cases))
+        expected_outputs = None
+        if self.early_kill:
+            expected_outputs = [tc.get("expected_output", "") for tc in test_cases]
+        # A test case's own time limit wins over the lesson's
+        timeouts = [
+            self._resolve_timeout(tc.get("timeout") or timeout) for tc in test_cases
+        ]
 
-        for i, tc in enumerate(test_cases):
-            stdin = tc.get("stdin", "")
-            expected = tc.get("expected_output", "")
-            description = tc.get("description", f"Test {i + 1}")
-            hidden = tc.get("hidden", False)
+        def case_failed(i: int, exec_result: ExecutionResult) -> bool:
+            return not self._make_test_result(i, test_cases[i], exec_result).passed
 
-            exec_result = await self.execute(
+        # Function-call cases run together in one process after the others
+        stdin_cases = [i for i, tc in enumerate(test_cases) if not tc.get("function")]
+        call_cases = [i for i, tc in enumerate(test_cases) if tc.get("function")]
+
+        test_results: list[Optional[TestResult]] = [None] * len(test_cases)
+        if self.batch_tests and len(stdin_cases) > 1:
+            exec_results = await self.execute_batch(
                 source_code=source_code,
-                stdin=stdin,
+                stdins=[test_cases[i].get("stdin", "") for i in stdin_cases],
                 data_files=data_files,
+                session_id=session_id,
+                expected_outputs=(
+                    [expected_outputs[i] for i in stdin_cases]
+                    if expected_outputs is not None
+                    else None
+                ),
+                stop_when=(
+                    (lambda position, r: case_failed(stdin_cases[position], r))
+                    if fail_fast
+                    else None
+                ),
+                timeouts=[timeouts[i] for i in stdin_cases],
+                lesson=lesson,
+                compares=[test_cases[i].get("compare", "exact") for i in stdin_cases],
+                tolerances=[test_cases[i].get("tolerance") for i in stdin_cases],
             )
+            for i, exec_result in zip(stdin_cases, exec_results):
+                if exec_result is not None:
+                    test_results[i] = self._make_test_result(
+                        i, test_cases[i], exec_result, timeouts[i]
+                    )
+        elif stdin_cases:
 
-            # Normalize output for comparison (strip trailing whitespace)
-            actual = exec_result.stdout.rstrip()
-            expected_normalized = expected.rstrip()
+            async def run_one(position: int) -> TestResult:
+                i = stdin_cases[position]
+                exec_result = await self.execute(
+                    source_code=source_code,
+                    stdin=test_cases[i].get("stdin", ""),
+                    data_files=data_files,
+                    session_id=session_id,
+                    expected_output=(
+                        expected_outputs[i] if expected_outputs is not None else None
+                    ),
+                    timeout=timeouts[i],
+                    lesson=lesson,
+                    compare=test_cases[i].get("compare", "exact"),
+                    tolerance=test_cases[i].get("tolerance"),
+                )
+                return self._make_test_result(
+                    i, test_cases[i], exec_result, timeouts[i]
+                )
 
-            passed = exec_result.is_success and actual == expected_normalized
+            stdin_results = await run_cases(
+                len(stdin_cases),
+                run_one,
+                max_parallel=self.max_parallel_tests,
+                failed=lambda tr: not tr.passed,
+                fail_fast=fail_fast,
+            )
+            for i, test_result in zip(stdin_cases, stdin_results):
+                test_results[i] = test_result
 
-            test_result = TestResult(
-                test_index=i,
-                description=description,
-                passed=passed,
-                stdin=stdin,
-                expected_output=expected,
-                actual_output=exec_result.stdout,
-                error_message=exec_result.error_message if not passed else "",
-                hidden=hidden,
+        stopped = fail_fast and any(
+            test_results[i] is None or not test_results[i].passed for i in stdin_cases
+        )
+        if call_cases and not stopped:
+            exec_results = await self.execute_calls(
+                source_code=source_code,
+                calls=[
+                    {
+                        "function": test_cases[i]["function"],
+                        "args": test_cases[i].get("args", []),
+                        "kwargs": test_cases[i].get("kwargs", {}),
+                    }
+                    for i in call_cases
+                ],
+                data_files=data_files,
+                session_id=session_id,
+                stop_when=(
+                    (lambda position, r: case_failed(call_cases[position], r))
+                    if fail_fast
+                    else None
+                ),
+                timeouts=[timeouts[i] for i in call_cases],
+                lesson=lesson,
             )
+            for i, exec_result in zip(call_cases, exec_results):
+                if exec_result is not None:
+                    test_results[i] = self._make_test_result(
+                        i, test_cases[i], exec_result, timeouts[i]
+                    )
 
+        for i, (tc, test_result) in enumerate(zip(test_cases, test_results)):
+            if test_result is None:
+                test_result = self._not_run_result(i, tc)
+                results.skipped_count += 1
             results.test_results.append(test_result)
             if test_result.passed:
                 results.passed_count += 1
 
         results.all_passed = results.passed_count == results.total_tests
+        if lesson:
+            await self.runtime_stats.record_results(lesson, results.test_results)
         return results
 
 
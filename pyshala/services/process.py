@@ -0,0 +1,301 @@
+"""Asyncio process handles that report resource usage on exit."""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Pipes are drained in chunks of this many bytes
+READ_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ResourceUsage:
+    """CPU time and peak memory of a finished process."""
+
+    user_time: float = 0.0
+    system_time: float = 0.0
+    max_rss_kb: int = 0
+
+    @classmethod
+    def from_rusage(cls, rusage) -> "ResourceUsage":
+        """Create from a ``resource.struct_rusage``."""
+        max_rss = rusage.ru_maxrss
+        if sys.platform == "darwin":
+            # macOS reports bytes, Linux kilobytes
+            max_rss //= 1024
+        return cls(
+            user_time=rusage.ru_utime,
+            system_time=rusage.ru_stime,
+            max_rss_kb=max_rss,
+        )
+
+
+async def open_pipe_reader(fd: int) -> asyncio.StreamReader:
+    """Wrap the read end of a pipe in an asyncio stream reader.
+
+    Args:
+        fd: File descriptor of the read end. Ownership passes to the reader.
+
+    Returns:
+        StreamReader fed from the pipe.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        os.fdopen(fd, "rb", 0),
+    )
+    return reader
+
+
+async def open_pipe_writer(fd: int) -> asyncio.StreamWriter:
+    """Wrap the write end of a pipe in an asyncio stream writer.
+
+    Args:
+        fd: File descriptor of the write end. Ownership passes to the writer.
+
+    Returns:
+        StreamWriter that writes into the pipe.
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin,
+        os.fdopen(fd, "wb", 0),
+    )
+    return asyncio.StreamWriter(transport, protocol, None, loop)
+
+
+def kill_pid(pid: int) -> None:
+    """Send SIGKILL to a pid, ignoring processes that are already gone."""
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def kill_group(pgid: int) -> bool:
+    """Send SIGKILL to a process group.
+
+    Args:
+        pgid: Process group ID.
+
+    Returns:
+        True if the group still had members.
+    """
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+
+
+class PipedProcess:
+    """A running process with piped standard streams.
+
+    Mirrors the parts of ``asyncio.subprocess.Process`` the executor uses,
+    and additionally exposes the process's resource usage once it exits.
+    Subclasses resolve ``exit_future`` with ``(returncode, ResourceUsage)``.
+    The process leads its own session and process group, so ``kill``
+    takes down everything it started as well.
+    """
+
+    def __init__(
+        self,
+        pid: int,
+        stdin: asyncio.StreamWriter,
+        stdout: asyncio.StreamReader,
+        stderr: asyncio.StreamReader,
+        exit_future: "asyncio.Future[tuple[int, Optional[ResourceUsage]]]",
+    ):
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.output_truncated = False
+        self.output_rejected = False
+        # Set once the process group was killed on purpose
+        self.killed = False
+        self._exit_future = exit_future
+
+    @property
+    def returncode(self) -> Optional[int]:
+        """Exit status, or None while the process is still running."""
+        if self._exit_future.done():
+            return self._exit_future.result()[0]
+        return None
+
+    @property
+    def rusage(self) -> Optional[ResourceUsage]:
+        """Resource usage, available once the process has exited."""
+        if self._exit_future.done():
+            return self._exit_future.result()[1]
+        return None
+
+    def add_exit_callback(self, callback: Callable[[], None]) -> None:
+        """Call a function on the event loop once the process has exited.
+
+        Args:
+            callback: Called without arguments.
+        """
+        self._exit_future.add_done_callback(lambda _: callback())
+
+    async def wait(self) -> int:
+        """Wait for the process to exit and return its exit status."""
+        returncode, _ = await asyncio.shield(self._exit_future)
+        return returncode
+
+    def kill(self) -> None:
+        """Kill the process and its process group with SIGKILL."""
+        if self.returncode is None:
+            self.killed = True
+            kill_group(self.pid)
+            kill_pid(self.pid)
+
+    async def communicate(
+        self,
+        input: bytes = b"",
+        max_output: Optional[int] = None,
+        stdout_monitor: Optional[Callable[[bytes], bool]] = None,
+    ) -> tuple[bytes, bytes]:
+        """Feed stdin, read stdout/stderr until EOF and wait for exit.
+
+        Args:
+            input: Data to write to stdin before closing it.
+            max_output: Maximum number of bytes kept from each stream. A
+                       process that writes more is killed and
+                       ``output_truncated`` is set.
+            stdout_monitor: Called with each chunk of stdout as it
+                           arrives. If it returns False the process is
+                           killed and ``output_rejected`` is set.
+
+        Returns:
+            Captured stdout and stderr.
+        """
+
+        async def feed() -> None:
+            try:
+                if input:
+                    self.stdin.write(input)
+                    await self.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                self.stdin.close()
+
+        async def capture(
+            stream: asyncio.StreamReader,
+            monitor: Optional[Callable[[bytes], bool]] = None,
+        ) -> bytes:
+            if max_output is None and monitor is None:
+                return await stream.read()
+            chunks = []
+            size = 0
+            while True:
+                chunk = await stream.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if max_output is not None and size + len(chunk) > max_output:
+                    chunks.append(chunk[: max_output - size])
+                    self.output_truncated = True
+                    self.kill()
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+                if monitor is not None and not monitor(chunk):
+                    self.output_rejected = True
+                    self.kill()
+                    break
+            return b"".join(chunks)
+
+        _, stdout, stderr = await asyncio.gather(
+            feed(), capture(self.stdout, stdout_monitor), capture(self.stderr)
+        )
+        await self.wait()
+        return stdout, stderr
+
+
+class ChildProcess(PipedProcess):
+    """A direct child process reaped with ``wait4`` to collect its rusage.
+
+    asyncio's own child watchers reap with ``waitpid`` and discard the
+    resource usage, so these processes are started with ``subprocess``
+    and reaped by a dedicated thread instead.
+    """
+
+    @classmethod
+    async def start(
+        cls,
+        args: list[str],
+        cwd: Optional[str] = None,
+        preexec_fn: Optional[Callable[[], None]] = None,
+        pass_fds: tuple[int, ...] = (),
+        env: Optional[dict[str, str]] = None,
+    ) -> "ChildProcess":
+        """Start a process with piped standard streams in a new session.
+
+        Args:
+            args: Program and arguments.
+            cwd: Working directory.
+            preexec_fn: Called in the child just before the program starts.
+            pass_fds: Extra file descriptors the child inherits.
+            env: Environment of the child; defaults to this process's.
+
+        Returns:
+            ChildProcess handle.
+        """
+        loop = asyncio.get_running_loop()
+        popen = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            preexec_fn=preexec_fn,
+            start_new_session=True,
+            pass_fds=pass_fds,
+            env=env,
+        )
+        exit_future = loop.create_future()
+
+        def reap() -> None:
+            _, status, rusage = os.wait4(popen.pid, 0)
+            returncode = os.waitstatus_to_exitcode(status)
+            # Keep Popen from trying to reap the pid again
+            popen.returncode = returncode
+            result = (returncode, ResourceUsage.from_rusage(rusage))
+            try:
+                loop.call_soon_threadsafe(_resolve, exit_future, result)
+            except RuntimeError:
+                # The event loop is already closed
+                pass
+
+        threading.Thread(target=reap, name=f"wait4-{popen.pid}", daemon=True).start()
+
+        # Hand the pipe fds over to asyncio transports
+        fds = []
+        for pipe in (popen.stdin, popen.stdout, popen.stderr):
+            fds.append(os.dup(pipe.fileno()))
+            pipe.close()
+        try:
+            return cls(
+                pid=popen.pid,
+                stdin=await open_pipe_writer(fds[0]),
+                stdout=await open_pipe_reader(fds[1]),
+                stderr=await open_pipe_reader(fds[2]),
+                exit_future=exit_future,
+            )
+        except BaseException:
+            # e.g. cancelled before the caller got a handle to kill
+            kill_group(popen.pid)
+            kill_pid(popen.pid)
+            raise
+
+
+def _resolve(future: asyncio.Future, result: object) -> None:
+    if not future.done():
+        future.set_result(result)
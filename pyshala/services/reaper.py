@@ -0,0 +1,214 @@
+"""Kill processes that outlive the execution that started them."""
+
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Optional
+
+from .process import kill_group
+
+logger = logging.getLogger(__name__)
+
+
+def session_members(sids: set[int]) -> dict[int, list[int]]:
+    """Find the live processes that belong to some sessions (Linux only).
+
+    Zombies are skipped: they already exited and only wait to be reaped.
+
+    Args:
+        sids: Session IDs.
+
+    Returns:
+        PIDs of each session's members. Empty if /proc is not available.
+    """
+    members: dict[int, list[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return members
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may contain spaces, so
+        # split after the last ")": state, ppid, pgrp, session, ...
+        fields = stat[stat.rfind(b")") + 2:].split()
+        if len(fields) < 4 or fields[0] == b"Z":
+            continue
+        sid = int(fields[3])
+        if sid in sids:
+            members.setdefault(sid, []).append(int(entry))
+    return members
+
+
+def group_exists(pgid: int) -> bool:
+    """Check if a process group still has members."""
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+
+
+class ProcessReaper:
+    """Track execution sessions and kill anything left running in them.
+
+    Every execution runs as the leader of its own session and process
+    group, whose ID is the leader's PID. When the leader exits, anything
+    still in the group is a leaked process (e.g. a ``multiprocessing``
+    worker or a backgrounded ``subprocess``); it is killed and counted.
+    Finished sessions stay watched for a while, and a background thread
+    sweeps /proc for members that moved to another process group. Only a
+    process that starts a new session of its own can escape.
+    """
+
+    def __init__(
+        self,
+        sweep_interval: Optional[float] = None,
+        watch_period: float = 30.0,
+    ):
+        """Initialize the reaper.
+
+        Args:
+            sweep_interval: Seconds between background sweeps. Defaults to
+                           the REAPER_INTERVAL env var or 5; 0 disables
+                           the sweeper thread.
+            watch_period: Seconds a finished session stays watched.
+        """
+        if sweep_interval is None:
+            sweep_interval = float(os.getenv("REAPER_INTERVAL", "5"))
+        self.sweep_interval = sweep_interval
+        self.watch_period = watch_period
+        self.leaked_count = 0
+        self.sweeps = 0
+        self._watched: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, sid: int) -> None:
+        """Note that a new execution session started.
+
+        A reused PID must not be swept as a finished session.
+
+        Args:
+            sid: Session ID, i.e. the PID of the execution's process.
+        """
+        with self._lock:
+            self._watched.pop(sid, None)
+
+    def collect(self, sid: int, count: bool = True) -> int:
+        """Kill whatever is left of a finished execution.
+
+        Call this once the session leader has exited (or been killed).
+
+        Args:
+            sid: Session ID, i.e. the PID of the execution's process.
+            count: Count survivors as leaked. Pass False when the whole
+                  group was already killed on purpose, e.g. on timeout.
+
+        Returns:
+            Number of leaked processes that were found and killed.
+        """
+        leaked = 0
+        # Cheap check first: a process group without members is gone
+        if group_exists(sid):
+            pids = session_members({sid}).get(sid, []) if count else []
+            leaked = self._kill(sid, pids)
+        with self._lock:
+            self._watched[sid] = time.monotonic() + self.watch_period
+        self._ensure_sweeper()
+        return leaked
+
+    def sweep(self) -> int:
+        """Kill leaked processes in every watched session.
+
+        Returns:
+            Number of leaked processes killed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.sweeps += 1
+            for sid, deadline in list(self._watched.items()):
+                if deadline < now:
+                    del self._watched[sid]
+            sids = set(self._watched)
+        if not sids:
+            return 0
+
+        leaked = 0
+        for sid, pids in session_members(sids).items():
+            leaked += self._kill(sid, pids)
+        return leaked
+
+    def _kill(self, sid: int, pids: list[int]) -> int:
+        """Kill leaked processes of a session and count them."""
+        killed = 0
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                killed += 1
+            except (ProcessLookupError, PermissionError):
+                pass
+        kill_group(sid)
+        return self._record(sid, killed)
+
+    def _record(self, sid: int, count: int) -> int:
+        """Add to the leak counter and log it."""
+        if count:
+            with self._lock:
+                self.leaked_count += count
+            logger.warning(
+                "Killed %d leaked process(es) from execution session %d", count, sid
+            )
+        return count
+
+    def _ensure_sweeper(self) -> None:
+        """Start the background sweeper thread on first use."""
+        if self.sweep_interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run_sweeper, name="pyshala-reaper", daemon=True
+            )
+            self._thread.start()
+
+    def _run_sweeper(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Process reaper sweep failed")
+
+    def stats(self) -> dict:
+        """Get reaper counters.
+
+        Returns:
+            Dictionary with leaked_processes, watched_sessions and sweeps.
+        """
+        with self._lock:
+            return {
+                "leaked_processes": self.leaked_count,
+                "watched_sessions": len(self._watched),
+                "sweeps": self.sweeps,
+            }
+
+
+# Global instance
+_reaper: Optional[ProcessReaper] = None
+
+
+def get_process_reaper() -> ProcessReaper:
+    """Get the global process reaper instance."""
+    global _reaper
+    if _reaper is None:
+        _reaper = ProcessReaper()
+    return _reaper
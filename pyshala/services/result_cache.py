@@ -0,0 +1,366 @@
+"""Content-addressed cache for execution results."""
+
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# Importing any of these makes a program's output depend on more than its
+# inputs, so its results are never cached. Dotted names block a submodule
+# only, however it is imported or reached through its package.
+NONDETERMINISTIC_MODULES = frozenset({
+    "asyncio",
+    "datetime",
+    "importlib",
+    "multiprocessing",
+    "numpy.random",
+    "os",
+    "random",
+    "secrets",
+    "socket",
+    "subprocess",
+    "threading",
+    "time",
+    "urllib",
+    "uuid",
+})
+
+# Calls to these can import any module without an import statement
+DYNAMIC_IMPORT_CALLS = frozenset({"__import__", "eval", "exec"})
+
+# Names whose values differ between runs of the same code: object
+# addresses and the path of the script's temporary directory
+NONDETERMINISTIC_NAMES = frozenset({"id", "__file__"})
+
+# Default reprs include an object's address, e.g. <Foo object at 0x7f...>
+ADDRESS_REPR = re.compile(r" at 0x[0-9a-fA-F]+>")
+
+
+def nondeterministic_modules() -> frozenset[str]:
+    """Get the modules whose use keeps a program's results out of the cache.
+
+    Returns:
+        NONDETERMINISTIC_MODULES plus the comma-separated names in the
+        EXECUTION_CACHE_NONDETERMINISTIC env var.
+    """
+    extra = os.getenv("EXECUTION_CACHE_NONDETERMINISTIC", "")
+    return NONDETERMINISTIC_MODULES | {
+        name.strip() for name in extra.split(",") if name.strip()
+    }
+
+
+def _is_listed(name: str, modules: frozenset[str]) -> bool:
+    """Check if a dotted name is a listed module or inside one."""
+    parts = name.split(".")
+    return any(".".join(parts[:i]) in modules for i in range(1, len(parts) + 1))
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    """Get ``a.b.c`` for an attribute chain on a plain name."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def is_cacheable_source(
+    source_code: str, modules: Optional[frozenset[str]] = None
+) -> bool:
+    """Check if a program's output can only depend on its inputs.
+
+    This is a static check of the code itself: it cannot see what the
+    modules it imports do, so anything nondeterministic behind a module
+    not on the list (or behind a data file) still gets cached.
+
+    Args:
+        source_code: Python source code.
+        modules: Modules to treat as nondeterministic.
+                Defaults to nondeterministic_modules().
+
+    Returns:
+        False if the code uses a listed module or name (see
+        NONDETERMINISTIC_NAMES) or imports modules dynamically
+        (``__import__``, ``eval``, ``exec``).
+    """
+    if modules is None:
+        modules = nondeterministic_modules()
+    try:
+        tree = ast.parse(source_code)
+    except (SyntaxError, ValueError):
+        # Fails the same way every time
+        return True
+    except (RecursionError, MemoryError):
+        # Too deeply nested to inspect
+        return False
+
+    # Local names bound to imported modules, e.g. np -> numpy
+    imported: dict[str, str] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if _is_listed(alias.name, modules):
+                    return False
+                if alias.asname:
+                    imported[alias.asname] = alias.name
+                else:
+                    top = alias.name.split(".")[0]
+                    imported[top] = top
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ""
+            for alias in node.names:
+                if _is_listed(f"{module}.{alias.name}", modules):
+                    return False
+                imported[alias.asname or alias.name] = f"{module}.{alias.name}"
+        elif isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id in DYNAMIC_IMPORT_CALLS:
+                return False
+        elif isinstance(node, ast.Name) and node.id in NONDETERMINISTIC_NAMES:
+            return False
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            name = _dotted_name(node)
+            if name is None:
+                continue
+            head, _, rest = name.partition(".")
+            if head in imported and _is_listed(
+                f"{imported[head]}.{rest}", modules
+            ):
+                return False
+    return True
+
+
+def is_cacheable_output(*outputs: str) -> bool:
+    """Check that a run's output has no object addresses in it.
+
+    Printing an object without a ``__repr__`` of its own shows where it
+    is in memory, which changes from run to run.
+    """
+    return not any(ADDRESS_REPR.search(output) for output in outputs)
+
+
+class ResultCache:
+    """LRU cache of execution results with an optional on-disk tier.
+
+    Results are stored as JSON-serializable dictionaries under a SHA-256
+    key of everything that can influence the outcome of a run. The disk
+    tier is read and written in worker threads, and once it grows past
+    its size limit the least recently used files are removed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_entry_bytes: int = 64 * 1024,
+        cache_dir: Optional[str] = None,
+        max_disk_mb: int = 256,
+    ):
+        """Initialize the result cache.
+
+        Args:
+            max_entries: Maximum number of results kept in memory.
+            max_entry_bytes: Results larger than this are not cached.
+            cache_dir: Directory for the on-disk tier.
+                      Defaults to EXECUTION_CACHE_DIR env var; disabled if unset.
+            max_disk_mb: Size limit of the on-disk tier. Defaults to the
+                        EXECUTION_CACHE_DIR_SIZE_MB env var.
+        """
+        self.max_entries = int(
+            os.getenv("EXECUTION_CACHE_SIZE", str(max_entries))
+        )
+        self.max_entry_bytes = max_entry_bytes
+        cache_dir = cache_dir or os.getenv("EXECUTION_CACHE_DIR")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_bytes = int(
+            os.getenv("EXECUTION_CACHE_DIR_SIZE_MB", str(max_disk_mb))
+        ) * 1024 * 1024
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Bytes in the disk tier, counted on the first write; other
+        # processes sharing the directory are only seen when evicting
+        self._disk_bytes: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self.disk_evictions = 0
+
+    @staticmethod
+    def make_key(*parts: object) -> str:
+        """Hash the inputs of a run into a cache key.
+
+        Args:
+            *parts: Strings, bytes, numbers or None; order matters.
+
+        Returns:
+            Hex SHA-256 digest.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                data = part
+            else:
+                data = repr(part).encode("utf-8")
+            # Length-prefix every part so boundaries are unambiguous
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        assert self.cache_dir is not None
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Look up a cached result.
+
+        Args:
+            key: Cache key from make_key.
+
+        Returns:
+            The cached result dictionary, or None on a miss.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry)
+
+        if self.cache_dir is not None:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self._remember(key, entry)
+                self.hits += 1
+                return dict(entry)
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, result: dict) -> None:
+        """Store a result.
+
+        Args:
+            key: Cache key from make_key.
+            result: JSON-serializable result dictionary.
+        """
+        data = json.dumps(result)
+        if len(data) > self.max_entry_bytes:
+            return
+        self._remember(key, dict(result))
+
+        if self.cache_dir is not None:
+            await asyncio.to_thread(self._write_disk, key, data)
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        """Load a result from the disk tier, marking it as recently used."""
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry if isinstance(entry, dict) else None
+
+    def _write_disk(self, key: str, data: str) -> None:
+        """Write a result to the disk tier, evicting if it grows too large."""
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _disk_files(self) -> list[tuple[float, int, str]]:
+        """Get (mtime, size, path) of every result file in the disk tier."""
+        files = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _evict_disk(self) -> None:
+        """Remove the least recently used files down to 90% of the limit."""
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 9 // 10
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.disk_evictions += 1
+        self._disk_bytes = total
+
+    def _remember(self, key: str, result: dict) -> None:
+        """Insert into the in-memory tier, evicting the oldest entries."""
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """Get cache counters.
+
+        Returns:
+            Dictionary with hits, misses, entries, hit_rate, disk_bytes
+            (None until the disk tier is first written) and
+            disk_evictions.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "disk_bytes": self._disk_bytes,
+            "disk_evictions": self.disk_evictions,
+        }
+
+
+# Global instance
+_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Get the global result cache instance."""
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
@@ -0,0 +1,108 @@
+"""Cancellable handles for in-flight submissions."""
+
+import asyncio
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class RunHandle:
+    """A submission running in the background for one client session.
+
+    Cancelling the handle cancels the task running the submission; the
+    executors kill every process (and process tree) the run started when
+    they are cancelled.
+    """
+
+    def __init__(self, session_id: str, task: "asyncio.Task"):
+        self.session_id = session_id
+        self.task = task
+
+    @property
+    def done(self) -> bool:
+        """Whether the run finished, failed or was cancelled."""
+        return self.task.done()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the run was cancelled."""
+        return self.task.cancelled()
+
+    def cancel(self) -> bool:
+        """Cancel the run.
+
+        Returns:
+            True if the run was still in progress.
+        """
+        return self.task.cancel()
+
+
+class RunRegistry:
+    """Track the in-flight run of every client session.
+
+    A session has at most one run; starting a new one cancels the old one.
+    """
+
+    def __init__(self):
+        self._runs: dict[str, RunHandle] = {}
+
+    @property
+    def active(self) -> int:
+        """Number of runs in progress."""
+        return len(self._runs)
+
+    def start(self, session_id: str, run: Awaitable[T]) -> RunHandle:
+        """Start a run for a session as a cancellable task.
+
+        Args:
+            session_id: Client session the run belongs to.
+            run: Coroutine doing the work.
+
+        Returns:
+            Handle of the new run.
+        """
+        self.cancel(session_id)
+        handle = RunHandle(session_id, asyncio.ensure_future(run))
+        self._runs[session_id] = handle
+        handle.task.add_done_callback(lambda _: self._forget(handle))
+        return handle
+
+    def get(self, session_id: str) -> Optional[RunHandle]:
+        """Get a session's in-flight run.
+
+        Args:
+            session_id: Client session.
+
+        Returns:
+            The run's handle, or None if the session has no run in progress.
+        """
+        return self._runs.get(session_id)
+
+    def cancel(self, session_id: str) -> bool:
+        """Cancel a session's in-flight run, if any.
+
+        Args:
+            session_id: Client session.
+
+        Returns:
+            True if a run was cancelled.
+        """
+        handle = self._runs.pop(session_id, None)
+        return handle is not None and handle.cancel()
+
+    def _forget(self, handle: RunHandle) -> None:
+        """Drop a finished run unless a newer one replaced it."""
+        if self._runs.get(handle.session_id) is handle:
+            del self._runs[handle.session_id]
+
+
+# Global instance
+_registry: Optional[RunRegistry] = None
+
+
+def get_run_registry() -> RunRegistry:
+    """Get the global run registry instance."""
+    global _registry
+    if _registry is None:
+        _registry = RunRegistry()
+    return _registry
@@ -0,0 +1,272 @@
+"""Observed runtimes of lessons, for tuning their time limits."""
+
+import asyncio
+import json
+import math
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Get a percentile of some values (nearest rank).
+
+    Args:
+        values: The values; need not be sorted.
+        fraction: Percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        The percentile, or 0.0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class LessonRuntimes:
+    """Recent test case runtimes of one lesson."""
+
+    lesson: str
+    # (wall-clock seconds, time limit in seconds) per test case run
+    samples: deque = field(default_factory=deque)
+    runs: int = 0
+    timeouts: int = 0
+
+    @property
+    def timeout(self) -> float:
+        """The most recent time limit."""
+        return self.samples[-1][1] if self.samples else 0.0
+
+    def runtime(self, fraction: float) -> float:
+        """Get a runtime percentile in seconds, e.g. ``runtime(0.95)``."""
+        return percentile([runtime for runtime, _ in self.samples], fraction)
+
+    def utilization(self, fraction: float = 0.95) -> float:
+        """Get a percentile of runtime as a fraction of the time limit."""
+        return percentile(
+            [runtime / timeout for runtime, timeout in self.samples if timeout > 0],
+            fraction,
+        )
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary for reports."""
+        return {
+            "lesson": self.lesson,
+            "timeout": self.timeout,
+            "runs": self.runs,
+            "timeouts": self.timeouts,
+            "p50": self.runtime(0.5),
+            "p95": self.runtime(0.95),
+            "max": self.runtime(1.0),
+            "utilization": self.utilization(),
+        }
+
+
+class RuntimeStats:
+    """Keep recent runtimes per lesson, optionally logging them to a file.
+
+    The log is JSON lines, one test case run per line, so that it can be
+    appended to cheaply by the server and aggregated later by the CLI.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_samples: int = 500):
+        """Initialize the stats.
+
+        Args:
+            path: JSON lines file every sample is appended to. Defaults to
+                 the RUNTIME_STATS_PATH env var; samples are kept in
+                 memory only if neither is set.
+            max_samples: Samples kept per lesson.
+        """
+        path = path or os.getenv("RUNTIME_STATS_PATH", "")
+        self.path = Path(path) if path else None
+        self.max_samples = max_samples
+        self._lessons: dict[str, LessonRuntimes] = {}
+
+    def _add(self, lesson: str, runtime: float, timeout: float) -> None:
+        entry = self._lessons.get(lesson)
+        if entry is None:
+            entry = self._lessons[lesson] = LessonRuntimes(
+                lesson, samples=deque(maxlen=self.max_samples)
+            )
+        entry.samples.append((runtime, timeout))
+        entry.runs += 1
+        if runtime >= timeout > 0:
+            entry.timeouts += 1
+
+    def _write(self, samples: list[tuple[str, float, float]]) -> None:
+        """Append samples to the log in one write."""
+        if self.path is None or not samples:
+            return
+        lines = "".join(
+            json.dumps(
+                {"lesson": lesson, "runtime": round(runtime, 4), "timeout": timeout}
+            ) + "\n"
+            for lesson, runtime, timeout in samples
+        )
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(lines)
+        except OSError:
+            pass
+
+    def record(self, lesson: str, runtime: float, timeout: float) -> None:
+        """Record one test case run.
+
+        Args:
+            lesson: Lesson key, e.g. "module_id/lesson_id".
+            runtime: Wall-clock time of the run in seconds.
+            timeout: Time limit the run was under in seconds.
+        """
+        self._add(lesson, runtime, timeout)
+        self._write([(lesson, runtime, timeout)])
+
+    async def record_results(self, lesson: str, test_results: Iterable) -> None:
+        """Record every test case of a run that actually executed.
+
+        The samples are kept in memory at once and appended to the log
+        with a single write in a worker thread, off the event loop.
+
+        Args:
+            lesson: Lesson key, e.g. "module_id/lesson_id".
+            test_results: TestResult objects with wall_time and timeout.
+        """
+        samples = []
+        for tr in test_results:
+            if getattr(tr, "skipped", False):
+                continue
+            if tr.wall_time is not None and tr.timeout:
+                self._add(lesson, tr.wall_time, tr.timeout)
+                samples.append((lesson, tr.wall_time, tr.timeout))
+        if self.path is not None and samples:
+            await asyncio.to_thread(self._write, samples)
+
+    def get(self, lesson: str) -> Optional[LessonRuntimes]:
+        """Get the runtimes of a lesson, or None if it has none."""
+        return self._lessons.get(lesson)
+
+    def estimate(self, lesson: str) -> Optional[float]:
+        """Estimate the runtime of one test case of a lesson.
+
+        The estimate is the median of the lesson's recent runtimes. A
+        lesson without samples gets the median estimate of all lessons.
+
+        Args:
+            lesson: Lesson key, e.g. "module_id/lesson_id".
+
+        Returns:
+            Expected wall-clock seconds, or None if nothing was recorded.
+        """
+        entry = self._lessons.get(lesson)
+        if entry is not None and entry.samples:
+            return entry.runtime(0.5)
+        if not self._lessons:
+            return None
+        return percentile(
+            [other.runtime(0.5) for other in self._lessons.values()], 0.5
+        )
+
+    def lessons(self) -> list[LessonRuntimes]:
+        """Get the runtimes of every lesson, sorted by lesson key."""
+        return [self._lessons[key] for key in sorted(self._lessons)]
+
+    def near_limit(self, threshold: float = 0.8) -> list[LessonRuntimes]:
+        """Find lessons whose runtimes sit close to their time limit.
+
+        Args:
+            threshold: Fraction of the time limit the 95th percentile
+                      runtime must reach.
+
+        Returns:
+            Matching lessons, closest to their limit first.
+        """
+        matches = [
+            entry for entry in self._lessons.values()
+            if entry.utilization() >= threshold
+        ]
+        return sorted(matches, key=lambda entry: entry.utilization(), reverse=True)
+
+    @classmethod
+    def load(cls, path: str, max_samples: int = 500) -> "RuntimeStats":
+        """Load samples from a runtime log, without logging new ones.
+
+        Args:
+            path: JSON lines file written by :meth:`record`.
+            max_samples: Samples kept per lesson; the most recent win.
+
+        Returns:
+            RuntimeStats object.
+        """
+        stats = cls(max_samples=max_samples)
+        stats.path = None
+        with open(path) as f:
+            for line in f:
+                try:
+                    sample = json.loads(line)
+                    stats._add(
+                        sample["lesson"],
+                        float(sample["runtime"]),
+                        float(sample["timeout"]),
+                    )
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return stats
+
+
+def format_report(entries: list[LessonRuntimes], threshold: float) -> str:
+    """Format lessons near their time limit as a text table.
+
+    Args:
+        entries: Lessons to list.
+        threshold: The fraction of the limit used to pick them.
+
+    Returns:
+        Printable report.
+    """
+    if not entries:
+        return f"No lesson's p95 runtime reaches {threshold:.0%} of its time limit."
+    return format_table(entries)
+
+
+def format_table(entries: list[LessonRuntimes]) -> str:
+    """Format the runtimes of lessons as a text table.
+
+    Args:
+        entries: Lessons to list, in order.
+
+    Returns:
+        Printable table.
+    """
+    if not entries:
+        return "No runtimes recorded."
+    width = max(len("Lesson"), *(len(entry.lesson) for entry in entries))
+    lines = [
+        f"{'Lesson':<{width}}  {'Limit':>7}  {'Runs':>6}  {'p50':>7}  "
+        f"{'p95':>7}  {'Max':>7}  {'Timeouts':>8}  {'p95/Limit':>9}"
+    ]
+    for entry in entries:
+        row = entry.to_dict()
+        lines.append(
+            f"{row['lesson']:<{width}}  {row['timeout']:>6.1f}s  {row['runs']:>6}  "
+            f"{row['p50']:>6.2f}s  {row['p95']:>6.2f}s  {row['max']:>6.2f}s  "
+            f"{row['timeouts']:>8}  {row['utilization']:>9.0%}"
+        )
+    return "\n".join(lines)
+
+
+# Global instance
+_stats: Optional[RuntimeStats] = None
+
+
+def get_runtime_stats() -> RuntimeStats:
+    """Get the global runtime stats instance."""
+    global _stats
+    if _stats is None:
+        _stats = RuntimeStats()
+    return _stats
@@ -0,0 +1,515 @@
+"""Data file templates and reusable execution working directories."""
+
+import atexit
+import errno
+import fcntl
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+
+from ..models.lesson import DataFile
+from .content_keys import ContentKeys, content_identity
+from .limits import execution_user
+
+# ioctl request that clones a file's extents (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+# Memory-backed filesystem tried by EXECUTION_SCRATCH_DIR=auto
+SHM_DIR = "/dev/shm"
+# Free space SHM_DIR needs to be used; Docker's default is only 64 MB
+SHM_MIN_FREE_MB = 128
+
+
+def resolve_scratch_dir(setting: Optional[str] = None) -> Optional[str]:
+    """Get the directory execution working directories are created in.
+
+    Args:
+        setting: A directory, "auto" to use /dev/shm when it is writable
+                and has room, or empty for the system temp directory.
+                Defaults to the EXECUTION_SCRATCH_DIR env var.
+
+    Returns:
+        Directory path, or None for the system temp directory.
+    """
+    if setting is None:
+        setting = os.getenv("EXECUTION_SCRATCH_DIR", "")
+    if not setting:
+        return None
+    if setting != "auto":
+        os.makedirs(setting, exist_ok=True)
+        return setting
+    try:
+        st = os.statvfs(SHM_DIR)
+    except OSError:
+        return None
+    if (
+        st.f_bavail * st.f_frsize >= SHM_MIN_FREE_MB * 1024 * 1024
+        and os.access(SHM_DIR, os.W_OK | os.X_OK)
+    ):
+        return SHM_DIR
+    return None
+
+
+def _file_state(path: Union[str, Path]) -> tuple[int, int, int, int]:
+    """Get what changes when a file is modified or replaced.
+
+    The mtime can be set back with os.utime, but the ctime cannot, so a
+    file written in place and "restored" still differs.
+    """
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns)
+
+
+def _hardlink_safe(path: str, uid: int) -> bool:
+    """Check that executions cannot write to a file through a hardlink.
+
+    File modes do not bind root, and an owner can make its file writable
+    again, so this needs executions to run as another, unprivileged user.
+
+    Args:
+        path: The template's file.
+        uid: User the executions run as.
+    """
+    st = os.stat(path)
+    return (
+        uid != 0
+        and st.st_uid != uid
+        and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    )
+
+
+@dataclass
+class Template:
+    """A materialized set of data files."""
+
+    path: Path
+    # _file_state of every file, used to detect tampering
+    snapshot: dict[str, tuple[int, int, int, int]] = field(default_factory=dict)
+
+    def is_intact(self, contents: dict[str, bytes]) -> bool:
+        """Check that no file in the template was modified.
+
+        Args:
+            contents: What each file should hold, by name.
+        """
+        for name, expected in self.snapshot.items():
+            path = self.path / name
+            try:
+                state = _file_state(path)
+                if state == expected:
+                    continue
+                # Adding or removing a hardlink (e.g. when a working
+                # directory is cleaned up) only changes the ctime
+                if (
+                    state[:3] != expected[:3]
+                    or os.stat(path).st_mode & 0o777 != 0o444
+                    or path.read_bytes() != contents.get(name)
+                ):
+                    return False
+                self.snapshot[name] = state
+            except OSError:
+                return False
+        return True
+
+
+def _clone_file(src: str, dst: str) -> None:
+    """Create ``dst`` as a copy-on-write clone of ``src``."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+class SandboxTemplates:
+    """Materialize each lesson's data files once and link them into sandboxes.
+
+    Data files are written into a read-only template directory keyed by a
+    hash of their names and contents. Working directories are then filled
+    with reflinks (copy-on-write clones) where the filesystem supports
+    them, hardlinks otherwise, and plain copies as a last resort.
+    Hardlinked data files share their inode with the template, so they
+    are only used when executions cannot write to it (see
+    ``_hardlink_safe``): in "auto" mode executions running as root, or as
+    the user owning the templates, get copies instead, and in "hardlink"
+    mode they fail. Templates are verified before each use and rebuilt
+    if anything changed them.
+    """
+
+    LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        link_mode: Optional[str] = None,
+        run_as: Optional[int] = None,
+    ):
+        """Initialize the template store.
+
+        Args:
+            root: Directory that holds the templates. Defaults to the
+                 SANDBOX_TEMPLATE_DIR env var, or a private directory in
+                 the scratch directory (see resolve_scratch_dir) removed
+                 at exit. Keep it on the same filesystem as the working
+                 directories so links are possible.
+            link_mode: One of LINK_MODES. Defaults to the SANDBOX_LINK_MODE
+                      env var or "auto".
+            run_as: Uid executions run as. Defaults to EXECUTION_USER's,
+                   or this process's own.
+        """
+        root = root or os.getenv("SANDBOX_TEMPLATE_DIR")
+        if root:
+            self.root = Path(root)
+            self.root.mkdir(parents=True, exist_ok=True)
+        else:
+            self.root = Path(
+                tempfile.mkdtemp(prefix="pyshala-templates-", dir=resolve_scratch_dir())
+            )
+            atexit.register(shutil.rmtree, self.root, True)
+
+        self.link_mode = link_mode or os.getenv("SANDBOX_LINK_MODE", "auto")
+        if self.link_mode not in self.LINK_MODES:
+            raise ValueError(f"Unknown sandbox link mode: {self.link_mode}")
+
+        self.run_as = run_as if run_as is not None else (
+            execution_user()[0] or os.geteuid()
+        )
+        # Method the last file was placed with, for monitoring
+        self.link_method: Optional[str] = None
+
+        self._templates: dict[str, Template] = {}
+        self._keys = ContentKeys()
+        self._lock = threading.Lock()
+        # Methods that failed once are not retried
+        self._reflink_ok = self.link_mode in ("auto", "reflink")
+        self._hardlink_ok = self.link_mode in ("auto", "hardlink")
+
+    def template_for(self, data_files: list[DataFile]) -> Template:
+        """Get the template for a set of data files, building it if needed.
+
+        Args:
+            data_files: The lesson's data files.
+
+        Returns:
+            Template with every non-empty data file materialized.
+        """
+        with self._lock:
+            key = self._keys.get(data_files)
+            template = self._templates.get(key)
+            contents = {df.name: df.content for df in data_files if df.content}
+            if template is not None and template.is_intact(contents):
+                return template
+            template = self._build(key, data_files)
+            self._templates[key] = template
+            return template
+
+    def _build(self, key: str, data_files: list[DataFile]) -> Template:
+        """Write a fresh template directory and swap it into place."""
+        staging = Path(tempfile.mkdtemp(prefix=f"{key[:12]}-", dir=self.root))
+        names = []
+        for df in data_files:
+            if not df.content:
+                continue
+            file_path = staging / df.name
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(file_path, "wb") as f:
+                f.write(df.content)
+            os.chmod(file_path, 0o444)
+            names.append(df.name)
+
+        # Replace any stale or tampered copy
+        template = Template(path=self.root / key)
+        if template.path.exists():
+            shutil.rmtree(template.path, ignore_errors=True)
+        try:
+            os.replace(staging, template.path)
+        except OSError:
+            # Another process sharing the root built it concurrently
+            shutil.rmtree(staging, ignore_errors=True)
+
+        for name in names:
+            template.snapshot[name] = _file_state(template.path / name)
+        return template
+
+    def populate(self, workdir: str, data_files: list[DataFile]) -> None:
+        """Make the data files available in a working directory.
+
+        Args:
+            workdir: Directory to populate.
+            data_files: The lesson's data files.
+        """
+        template = self.template_for(data_files)
+        for name in template.snapshot:
+            src = str(template.path / name)
+            dst = os.path.join(workdir, name)
+            # Ensure parent directory exists (for nested paths like "data/file.csv")
+            dst_dir = os.path.dirname(dst)
+            if dst_dir:
+                os.makedirs(dst_dir, exist_ok=True)
+            if self._link(src, dst):
+                # A new link changes the shared inode's ctime
+                with self._lock:
+                    template.snapshot[name] = _file_state(src)
+
+    def _link(self, src: str, dst: str) -> bool:
+        """Link or copy one file using the cheapest method that works.
+
+        Returns:
+            True if ``dst`` is a hardlink to ``src``.
+        """
+        if self._reflink_ok:
+            try:
+                _clone_file(src, dst)
+                # Clones are private copies, so students may write to them
+                os.chmod(dst, 0o644)
+                self.link_method = "reflink"
+                return False
+            except OSError:
+                if os.path.exists(dst):
+                    os.unlink(dst)
+                if self.link_mode == "reflink":
+                    raise
+                self._reflink_ok = False
+
+        if self._hardlink_ok and _hardlink_safe(src, self.run_as):
+            try:
+                os.link(src, dst)
+                self.link_method = "hardlink"
+                return True
+            except OSError as e:
+                if self.link_mode == "hardlink" or e.errno not in (
+                    errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP,
+                ):
+                    raise
+                self._hardlink_ok = False
+        elif self.link_mode == "hardlink":
+            raise PermissionError(
+                errno.EPERM,
+                "Executions could write to hardlinked data files; "
+                "run them as another user (EXECUTION_USER)",
+                src,
+            )
+
+        shutil.copyfile(src, dst)
+        self.link_method = "copy"
+        return False
+
+
+def _snapshot(
+    root: Path, names: list[str]
+) -> dict[str, tuple[int, int, int, int]]:
+    """Get the _file_state of files below a directory."""
+    return {name: _file_state(root / name) for name in names}
+
+
+@dataclass
+class SessionSandbox:
+    """A working directory kept between a session's submissions."""
+
+    path: Path
+    # content_identity of the data files it was populated with
+    contents: tuple
+    # The contents themselves, which keep that identity valid
+    held: list = field(default_factory=list)
+    snapshot: dict[str, tuple[int, int, int, int]] = field(default_factory=dict)
+    last_used: float = 0.0
+    busy: bool = False
+    # Dropped while in use; removed once released
+    retired: bool = False
+
+
+class SessionSandboxes:
+    """Working directories reused across a session's submissions to a lesson.
+
+    The first run of a lesson in a session populates a directory with the
+    lesson's data files; later runs reuse it, so they only (re)write
+    ``script.py``. Before each reuse anything the previous run created is
+    removed, and if a data file was modified the directory is rebuilt.
+    A session's directories are dropped when it moves to another lesson
+    or has been idle for ``ttl`` seconds. Concurrent runs (e.g. parallel
+    test cases) each lease a directory of their own.
+    """
+
+    def __init__(self, root: Optional[str] = None, ttl: float = 1800.0):
+        """Initialize the store.
+
+        Args:
+            root: Directory that holds the working directories. Defaults
+                 to a private directory in the scratch directory (see
+                 resolve_scratch_dir) removed at exit.
+            ttl: Seconds a session's directories are kept after their
+                last use. Defaults to the SESSION_SANDBOX_TTL env var.
+        """
+        if root:
+            self.root = Path(root)
+            self.root.mkdir(parents=True, exist_ok=True)
+        else:
+            self.root = Path(
+                tempfile.mkdtemp(prefix="pyshala-sessions-", dir=resolve_scratch_dir())
+            )
+            atexit.register(shutil.rmtree, self.root, True)
+            # Executions may run as another user, who needs to reach their
+            # own directories but not list the others
+            os.chmod(self.root, 0o711)
+        self.ttl = float(os.getenv("SESSION_SANDBOX_TTL", str(ttl)))
+        self._sandboxes: dict[tuple[str, str], list[SessionSandbox]] = {}
+        self._lock = threading.Lock()
+        # Directories populated with data files, for monitoring
+        self.populated = 0
+
+    @contextmanager
+    def lease(
+        self,
+        session_id: str,
+        lesson: str,
+        data_files: list[DataFile],
+        populate: Callable[[str, list[DataFile]], None],
+    ) -> Iterator[str]:
+        """Get a working directory holding a lesson's data files.
+
+        Args:
+            session_id: Session the run belongs to.
+            lesson: Lesson key, e.g. "module_id/lesson_id".
+            data_files: The lesson's data files.
+            populate: Writes the data files into a new directory.
+
+        Yields:
+            Path of the directory, without a ``script.py``.
+        """
+        key = (session_id, lesson)
+        contents = content_identity(data_files)
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(session_id, lesson, now)
+            sandbox = next(
+                (s for s in self._sandboxes.get(key, []) if not s.busy), None
+            )
+            if sandbox is not None:
+                sandbox.busy = True
+
+        if sandbox is not None and not (
+            sandbox.contents == contents and self._reset(sandbox)
+        ):
+            self._discard(key, sandbox)
+            sandbox = None
+        if sandbox is None:
+            sandbox = self._create(contents, data_files, populate)
+            with self._lock:
+                self._sandboxes.setdefault(key, []).append(sandbox)
+
+        try:
+            yield str(sandbox.path)
+        finally:
+            with self._lock:
+                sandbox.busy = False
+                sandbox.last_used = time.monotonic()
+                retired = sandbox.retired
+            if retired:
+                shutil.rmtree(sandbox.path, ignore_errors=True)
+
+    def release(self, session_id: str) -> None:
+        """Drop every working directory of a session.
+
+        Args:
+            session_id: The session, e.g. one that ended.
+        """
+        with self._lock:
+            for key in [k for k in self._sandboxes if k[0] == session_id]:
+                self._drop(key)
+
+    def _sweep(self, session_id: str, lesson: str, now: float) -> None:
+        """Drop the session's other lessons and idle sessions (lock held)."""
+        for key, pool in list(self._sandboxes.items()):
+            if key[0] == session_id and key[1] != lesson:
+                self._drop(key)
+            elif all(not s.busy and now - s.last_used > self.ttl for s in pool):
+                self._drop(key)
+
+    def _drop(self, key: tuple[str, str]) -> None:
+        """Remove a pool's directories, or retire those in use (lock held)."""
+        for sandbox in self._sandboxes.pop(key, []):
+            if sandbox.busy:
+                sandbox.retired = True
+            else:
+                shutil.rmtree(sandbox.path, ignore_errors=True)
+
+    def _discard(self, key: tuple[str, str], sandbox: SessionSandbox) -> None:
+        """Remove one leased directory that cannot be reused."""
+        with self._lock:
+            pool = self._sandboxes.get(key, [])
+            if sandbox in pool:
+                pool.remove(sandbox)
+        shutil.rmtree(sandbox.path, ignore_errors=True)
+
+    def _create(
+        self,
+        contents: tuple,
+        data_files: list[DataFile],
+        populate: Callable[[str, list[DataFile]], None],
+    ) -> SessionSandbox:
+        """Make and populate a new directory, leased to the caller."""
+        path = Path(tempfile.mkdtemp(dir=self.root))
+        populate(str(path), data_files)
+        names = [df.name for df in data_files if df.content]
+        self.populated += 1
+        return SessionSandbox(
+            path=path,
+            contents=contents,
+            held=[df.content for df in data_files],
+            snapshot=_snapshot(path, names),
+            busy=True,
+        )
+
+    def _reset(self, sandbox: SessionSandbox) -> bool:
+        """Remove what earlier runs left behind.
+
+        Returns:
+            False if a data file was modified, so the directory must be
+            rebuilt.
+        """
+        keep = set(sandbox.snapshot)
+        for name in sandbox.snapshot:
+            parent = os.path.dirname(name)
+            while parent:
+                keep.add(parent)
+                parent = os.path.dirname(parent)
+        try:
+            for dirpath, dirnames, filenames in os.walk(sandbox.path):
+                relative = os.path.relpath(dirpath, sandbox.path)
+                for name in list(dirnames):
+                    rel = os.path.normpath(os.path.join(relative, name))
+                    if rel not in keep:
+                        dirnames.remove(name)
+                        shutil.rmtree(os.path.join(dirpath, name))
+                for name in filenames:
+                    rel = os.path.normpath(os.path.join(relative, name))
+                    if rel not in keep:
+                        os.unlink(os.path.join(dirpath, name))
+            return _snapshot(sandbox.path, list(sandbox.snapshot)) == sandbox.snapshot
+        except OSError:
+            return False
+
+
+# Global instances
+_templates: Optional[SandboxTemplates] = None
+_session_sandboxes: Optional[SessionSandboxes] = None
+
+
+def get_sandbox_templates() -> SandboxTemplates:
+    """Get the global sandbox template store."""
+    global _templates
+    if _templates is None:
+        _templates = SandboxTemplates()
+    return _templates
+
+
+def get_session_sandboxes() -> SessionSandboxes:
+    """Get the global store of per-session working directories."""
+    global _session_sandboxes
+    if _session_sandboxes is None:
+        _session_sandboxes = SessionSandboxes()
+    return _session_sandboxes
@@ -0,0 +1,231 @@
+"""Process-wide scheduler for code executions."""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from .affinity import execution_cpu_count
+
+# How queued executions are ordered when every slot is busy
+SCHEDULER_POLICIES = ("fair", "sjf")
+
+
+@dataclass
+class _Waiter:
+    """An execution waiting for a slot."""
+
+    future: asyncio.Future
+    # Expected runtime in seconds, and when it started waiting
+    expected: float
+    enqueued: float
+
+
+class ExecutionScheduler:
+    """Cap concurrent executions and share slots fairly between sessions.
+
+    Every execution must hold a slot while its process runs. When all
+    slots are busy, waiters queue per session and each session's
+    executions start in order, so one student submitting many test cases
+    cannot starve everyone else. Which session goes next depends on the
+    policy:
+
+    - "fair": round-robin across sessions.
+    - "sjf": shortest expected job first, which minimizes the mean wait.
+      Every second spent waiting takes ``aging`` seconds off a job's
+      expected runtime, so long jobs still start eventually.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        policy: Optional[str] = None,
+        aging: Optional[float] = None,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            max_concurrent: Maximum number of executions running at once.
+                           Defaults to the number of CPUs executions are
+                           pinned to (EXECUTION_CPUS), or of all CPUs.
+            policy: One of SCHEDULER_POLICIES. Defaults to the
+                   SCHEDULER_POLICY env var or "fair".
+            aging: Seconds of expected runtime forgiven per second waited
+                  in "sjf" mode. Defaults to the SCHEDULER_AGING env var
+                  or 1.0.
+        """
+        default = max_concurrent or execution_cpu_count()
+        self.max_concurrent = max(
+            1, int(os.getenv("MAX_CONCURRENT_EXECUTIONS", str(default)))
+        )
+        policy = policy or os.getenv("SCHEDULER_POLICY", "fair")
+        if policy not in SCHEDULER_POLICIES:
+            raise ValueError(f"Unknown scheduler policy: {policy}")
+        self.policy = policy
+        if aging is None:
+            aging = float(os.getenv("SCHEDULER_AGING", "1.0"))
+        self.aging = aging
+        self._running = 0
+        # Waiters per session, and the round-robin order of sessions
+        self._waiters: dict[str, deque[_Waiter]] = {}
+        self._rotation: deque[str] = deque()
+
+    @property
+    def running(self) -> int:
+        """Number of executions currently holding a slot."""
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        """Number of executions waiting for a slot."""
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def queue_position(self, session_id: str) -> Optional[int]:
+        """Get how many sessions are served before this session's next execution.
+
+        Each of them starts one execution first, however many it has
+        queued. With the "sjf" policy the order can still change as new
+        executions arrive.
+
+        Args:
+            session_id: The session to look up.
+
+        Returns:
+            Number of sessions ahead, or None if the session has nothing
+            queued.
+        """
+        if session_id not in self._waiters:
+            return None
+        # Each session ahead in the order gets one slot first
+        return self._order().index(session_id)
+
+    def _score(self, waiter: _Waiter, now: float) -> float:
+        """Get a waiter's priority in "sjf" mode; lower starts sooner."""
+        return waiter.expected - self.aging * (now - waiter.enqueued)
+
+    def _order(self) -> list[str]:
+        """Get the sessions with waiters, the one served next first."""
+        if self.policy == "fair":
+            return list(self._rotation)
+        now = time.monotonic()
+        # Stable, so ties keep the round-robin order
+        return sorted(
+            self._rotation,
+            key=lambda session_id: self._score(self._waiters[session_id][0], now),
+        )
+
+    def _next_session(self) -> str:
+        """Get the session whose next waiter gets the free slot."""
+        if self.policy == "fair":
+            return self._rotation[0]
+        now = time.monotonic()
+        return min(
+            self._rotation,
+            key=lambda session_id: self._score(self._waiters[session_id][0], now),
+        )
+
+    async def acquire(self, session_id: str = "", expected: float = 0.0) -> None:
+        """Wait for an execution slot.
+
+        Args:
+            session_id: Session the execution belongs to.
+            expected: Expected runtime in seconds, used by the "sjf"
+                     policy. 0 if unknown.
+        """
+        if self._running < self.max_concurrent and not self._waiters:
+            self._running += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if session_id not in self._waiters:
+            self._waiters[session_id] = deque()
+            self._rotation.append(session_id)
+        self._waiters[session_id].append(
+            _Waiter(future, expected, time.monotonic())
+        )
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self.release()
+            else:
+                self._remove_waiter(session_id, future)
+            raise
+
+    def release(self) -> None:
+        """Give a slot back and wake the next waiter, if any."""
+        self._running -= 1
+        while self._rotation and self._running < self.max_concurrent:
+            session_id = self._next_session()
+            self._rotation.remove(session_id)
+            waiters = self._waiters[session_id]
+            future = waiters.popleft().future
+            if waiters:
+                self._rotation.append(session_id)
+            else:
+                del self._waiters[session_id]
+            if not future.done():
+                self._running += 1
+                future.set_result(None)
+
+    def _remove_waiter(self, session_id: str, future: asyncio.Future) -> None:
+        """Drop a cancelled waiter from its session queue."""
+        waiters = self._waiters.get(session_id)
+        if waiters is None:
+            return
+        for waiter in waiters:
+            if waiter.future is future:
+                waiters.remove(waiter)
+                break
+        else:
+            return
+        if not waiters:
+            del self._waiters[session_id]
+            self._rotation.remove(session_id)
+
+    def stats(self) -> dict:
+        """Get scheduler counters.
+
+        Returns:
+            Dictionary with policy, max_concurrent, running and queued.
+        """
+        return {
+            "policy": self.policy,
+            "max_concurrent": self.max_concurrent,
+            "running": self.running,
+            "queued": self.queued,
+        }
+
+    @asynccontextmanager
+    async def slot(
+        self, session_id: str = "", expected: float = 0.0
+    ) -> AsyncIterator[None]:
+        """Hold an execution slot for the duration of the block.
+
+        Args:
+            session_id: Session the execution belongs to.
+            expected: Expected runtime in seconds, used by the "sjf"
+                     policy. 0 if unknown.
+        """
+        await self.acquire(session_id, expected)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+# Global instance
+_scheduler: Optional[ExecutionScheduler] = None
+
+
+def get_execution_scheduler() -> ExecutionScheduler:
+    """Get the global execution scheduler instance."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ExecutionScheduler()
+    return _scheduler
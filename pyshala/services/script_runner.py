@@ -0,0 +1,51 @@
+"""Run a student script whose source arrives on a file descriptor.
+
+This file is executed as a standalone script by the interpreter configured
+for code execution, so it must only depend on the standard library and
+must never import pyshala itself.
+
+Usage: ``python script_runner.py SCRIPT_PATH FD`` with the working
+directory set to the sandbox. The source is read from ``FD`` (a memfd or
+pipe) instead of from ``SCRIPT_PATH``, which does not need to exist; it
+is only used for ``__file__``, ``sys.argv`` and tracebacks, so the script
+behaves as if started with ``python SCRIPT_PATH``.
+"""
+
+import os
+import sys
+import types
+
+
+def main(argv: list[str]) -> int:
+    """Run the script as ``__main__`` and return its exit status."""
+    script_path = argv[1]
+    with os.fdopen(int(argv[2]), "rb") as f:
+        source = f.read()
+
+    sys.argv = [script_path]
+    sys.path[0] = os.path.dirname(script_path)
+
+    main_module = types.ModuleType("__main__")
+    main_module.__file__ = script_path
+    main_module.__builtins__ = __builtins__
+    sys.modules["__main__"] = main_module
+
+    try:
+        code = compile(source, script_path, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        sys.excepthook(type(e), e, None)
+        return 1
+    try:
+        exec(code, main_module.__dict__)
+    except SystemExit:
+        raise
+    except BaseException as e:
+        # Drop this frame so the traceback starts at the student's script
+        tb = e.__traceback__.tb_next if e.__traceback__ else None
+        sys.excepthook(type(e), e.with_traceback(tb), tb)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,53 @@
+"""Serve the execution services' counters to operators."""
+
+from typing import Awaitable, Callable
+
+from starlette.responses import JSONResponse
+
+from .local_executor import get_local_executor
+
+# Path of the backend endpoint that reports the counters
+STATS_PATH = "/_stats"
+
+ASGIApp = Callable[[dict, Callable, Callable], Awaitable[None]]
+
+
+def collect_stats() -> dict:
+    """Gather the counters of the local executor's services.
+
+    Returns:
+        Dictionary with the stats() of the scheduler, the process reaper
+        and the result cache (None if caching is off).
+    """
+    executor = get_local_executor()
+    return {
+        "scheduler": executor.scheduler.stats(),
+        "reaper": executor.reaper.stats(),
+        "result_cache": executor.cache.stats() if executor.cache is not None else None,
+    }
+
+
+def stats_app(app: ASGIApp) -> ASGIApp:
+    """Serve the stats endpoint in front of the backend.
+
+    Used as an API transformer of the Reflex app. The endpoint is on the
+    backend port only; the Docker image's Caddy does not proxy it.
+
+    Args:
+        app: The backend ASGI app, which gets every other request.
+
+    Returns:
+        ASGI app answering ``STATS_PATH`` with collect_stats() as JSON.
+    """
+
+    async def asgi(scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["path"] != STATS_PATH:
+            await app(scope, receive, send)
+            return
+        if scope["method"] != "GET":
+            response = JSONResponse({"error": "Method not allowed"}, status_code=405)
+        else:
+            response = JSONResponse(collect_stats())
+        await response(scope, receive, send)
+
+    return asgi
@@ -0,0 +1,150 @@
+"""Static checks run on a submission before any test process is spawned."""
+
+import asyncio
+import subprocess
+import sys
+import traceback
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional
+
+# Filename shown in static check reports
+SCRIPT_NAME = "script.py"
+
+
+@dataclass
+class StaticIssue:
+    """A problem found in a submission without running it."""
+
+    kind: str  # e.g. "SyntaxError", "IndentationError"
+    message: str
+    line: Optional[int] = None
+    column: Optional[int] = None
+    # Report formatted the way the interpreter prints it
+    details: str = ""
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary for serialization."""
+        return {
+            "kind": self.kind,
+            "message": self.message,
+            "line": self.line,
+            "column": self.column,
+            "details": self.details,
+        }
+
+
+def check_syntax(source_code: str) -> Optional[StaticIssue]:
+    """Compile the source code and report a syntax error, if any.
+
+    Args:
+        source_code: Python source code.
+
+    Returns:
+        StaticIssue for the first syntax error, or None.
+    """
+    try:
+        compile(source_code, SCRIPT_NAME, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return StaticIssue(
+            kind=type(e).__name__,
+            message=e.msg,
+            line=e.lineno,
+            column=e.offset,
+            details="".join(traceback.format_exception_only(type(e), e)),
+        )
+    except ValueError as e:
+        # e.g. "source code string cannot contain null bytes"
+        return StaticIssue(
+            kind="SyntaxError",
+            message=str(e),
+            details=f"SyntaxError: {e}\n",
+        )
+    except (RecursionError, MemoryError) as e:
+        # Deeply nested code exhausts the compiler, and the interpreter
+        # fails the same way when it runs the script
+        return StaticIssue(
+            kind=type(e).__name__,
+            message="code is too deeply nested to compile",
+            details=f"{type(e).__name__}: {e or 'code is too deeply nested'}\n",
+        )
+    return None
+
+
+@lru_cache(maxsize=None)
+def matches_host_python(python_path: str) -> bool:
+    """Check if an interpreter has the same major.minor version as this one.
+
+    Syntax accepted by one Python version can be rejected by another, so
+    compiling in-process is only a faithful check for the same version.
+
+    Args:
+        python_path: Interpreter used to run submissions.
+
+    Returns:
+        True if the versions match.
+    """
+    try:
+        completed = subprocess.run(
+            [python_path, "-c", "import sys; print(sys.hexversion >> 16)"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        return int(completed.stdout.strip()) == sys.hexversion >> 16
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return False
+
+
+StaticCheck = Callable[[str], Optional[StaticIssue]]
+
+
+class StaticCheckStage:
+    """Run static checks on a submission off the event loop.
+
+    Checks run in order and the first issue found is reported. Checks
+    that compile code with this interpreter are skipped when submissions
+    run on a different Python version.
+    """
+
+    def __init__(
+        self,
+        python_path: str,
+        checks: Optional[list[StaticCheck]] = None,
+    ):
+        """Initialize the stage.
+
+        Args:
+            python_path: Interpreter used to run submissions.
+            checks: Checks to run. Defaults to the syntax check.
+        """
+        self.python_path = python_path
+        self.checks = list(checks) if checks is not None else [check_syntax]
+
+    def run_sync(self, source_code: str) -> Optional[StaticIssue]:
+        """Run the checks in the calling thread.
+
+        Args:
+            source_code: Python source code.
+
+        Returns:
+            The first issue found, or None.
+        """
+        for check in self.checks:
+            if check is check_syntax and not matches_host_python(self.python_path):
+                continue
+            issue = check(source_code)
+            if issue is not None:
+                return issue
+        return None
+
+    async def run(self, source_code: str) -> Optional[StaticIssue]:
+        """Run the checks in a worker thread.
+
+        Args:
+            source_code: Python source code.
+
+        Returns:
+            The first issue found, or None.
+        """
+        return await asyncio.to_thread(self.run_sync, source_code)
@@ -0,0 +1,247 @@
+"""Client side of the zygote fork-server used by the local executor."""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+from pathlib import Path
+from typing import Optional
+
+from .process import (
+    PipedProcess,
+    ResourceUsage,
+    kill_group,
+    kill_pid,
+    open_pipe_reader,
+    open_pipe_writer,
+)
+
+SERVER_SCRIPT = str(Path(__file__).with_name("zygote_server.py"))
+
+
+class ZygoteProcess(PipedProcess):
+    """A child forked by the zygote."""
+
+
+class Zygote:
+    """A long-lived process with preimported modules that forks executions."""
+
+    def __init__(
+        self,
+        python_path: str,
+        preload_modules: Optional[list[str]] = None,
+        env: Optional[dict[str, str]] = None,
+    ):
+        """Initialize the zygote client.
+
+        Args:
+            python_path: Path to the Python interpreter that runs the server.
+            preload_modules: Modules to import once before forking children.
+            env: Environment of the server, which its children inherit;
+                defaults to this process's.
+        """
+        self.python_path = python_path
+        self.preload_modules = list(preload_modules or [])
+        self.env = env
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._next_id = 0
+        self._pending: dict[int, asyncio.Future] = {}
+        self._exits: dict[int, asyncio.Future] = {}
+
+    @property
+    def is_running(self) -> bool:
+        """Check if the server process is alive on the current event loop."""
+        return (
+            self._process is not None
+            and self._process.returncode is None
+            and self._loop is asyncio.get_running_loop()
+        )
+
+    async def _ensure_started(self) -> None:
+        """Start the server, or restart it if it died or the loop changed."""
+        if self._lock is None or self._loop is not asyncio.get_running_loop():
+            self._discard()
+            self._lock = asyncio.Lock()
+            self._loop = asyncio.get_running_loop()
+
+        async with self._lock:
+            if self.is_running:
+                return
+            self._discard()
+
+            parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    self.python_path,
+                    SERVER_SCRIPT,
+                    str(child_sock.fileno()),
+                    *self.preload_modules,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    pass_fds=[child_sock.fileno()],
+                    env=self.env,
+                )
+            except Exception:
+                parent_sock.close()
+                raise
+            finally:
+                child_sock.close()
+
+            self._sock = parent_sock
+            self._reader_task = asyncio.create_task(self._read_replies(self._process))
+
+    async def _read_replies(self, process: asyncio.subprocess.Process) -> None:
+        """Dispatch spawn acknowledgements and exit notifications."""
+        loop = asyncio.get_running_loop()
+        assert process.stdout is not None
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if "id" in message:
+                future = self._pending.pop(message["id"], None)
+                if future is None or future.done():
+                    # Nobody is waiting for this child any more
+                    if "pid" in message:
+                        kill_group(message["pid"])
+                        kill_pid(message["pid"])
+                    continue
+                if "error" in message:
+                    future.set_exception(OSError(message["error"]))
+                else:
+                    # Register the exit future right away so an exit
+                    # notification that follows immediately is not lost
+                    exit_future = loop.create_future()
+                    self._exits[message["pid"]] = exit_future
+                    future.set_result((message["pid"], exit_future))
+            else:
+                exit_future = self._exits.pop(message["pid"], None)
+                if exit_future is not None and not exit_future.done():
+                    rusage = ResourceUsage(
+                        user_time=message.get("utime", 0.0),
+                        system_time=message.get("stime", 0.0),
+                        max_rss_kb=message.get("maxrss", 0),
+                    )
+                    exit_future.set_result((message["returncode"], rusage))
+
+        # The server is gone: nothing pending will ever complete, and
+        # orphaned children can no longer be reaped by it
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("Zygote process exited unexpectedly"))
+        for pid, exit_future in self._exits.items():
+            kill_group(pid)
+            kill_pid(pid)
+            if not exit_future.done():
+                exit_future.set_result((-signal.SIGKILL, None))
+        self._pending.clear()
+        self._exits.clear()
+
+    async def spawn(
+        self,
+        script_path: str,
+        cwd: str,
+        limits: Optional[dict] = None,
+        source_fd: Optional[int] = None,
+    ) -> ZygoteProcess:
+        """Fork a child that runs ``script_path`` with ``cwd`` as working directory.
+
+        Args:
+            script_path: Path to the Python script to run.
+            cwd: Working directory for the child.
+            limits: ResourceLimits as a dictionary, applied in the child.
+            source_fd: File descriptor to read the script's source from
+                      instead of ``script_path``, which then need not
+                      exist. The caller keeps ownership.
+
+        Returns:
+            ZygoteProcess handle for the child.
+        """
+        await self._ensure_started()
+        assert self._sock is not None
+
+        stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            self._next_id += 1
+            request_id = self._next_id
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            request = {
+                "id": request_id,
+                "script": script_path,
+                "cwd": cwd,
+                "limits": limits or {},
+            }
+            fds = [stdin_r, stdout_w, stderr_w]
+            if source_fd is not None:
+                fds.append(source_fd)
+            socket.send_fds(self._sock, [json.dumps(request).encode()], fds)
+        except Exception:
+            self._pending.pop(request_id, None)
+            for fd in (stdin_w, stdout_r, stderr_r):
+                os.close(fd)
+            raise
+        finally:
+            # The server holds its own copies now
+            for fd in (stdin_r, stdout_w, stderr_w):
+                os.close(fd)
+
+        try:
+            pid, exit_future = await future
+        except BaseException:
+            for fd in (stdin_w, stdout_r, stderr_r):
+                os.close(fd)
+            raise
+
+        try:
+            return ZygoteProcess(
+                pid=pid,
+                stdin=await open_pipe_writer(stdin_w),
+                stdout=await open_pipe_reader(stdout_r),
+                stderr=await open_pipe_reader(stderr_r),
+                exit_future=exit_future,
+            )
+        except BaseException:
+            kill_group(pid)
+            kill_pid(pid)
+            raise
+
+    def _discard(self) -> None:
+        """Drop the current server process, if any."""
+        if self._reader_task is not None and not self._reader_task.done():
+            try:
+                self._reader_task.cancel()
+            except RuntimeError:
+                # The loop the task belongs to is already closed
+                pass
+        if self._sock is not None:
+            # Closing the control socket makes the server exit on its own
+            self._sock.close()
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except (ProcessLookupError, RuntimeError):
+                pass
+        self._process = None
+        self._sock = None
+        self._reader_task = None
+        self._pending.clear()
+        self._exits.clear()
+
+    async def close(self) -> None:
+        """Stop the server process."""
+        process = self._process
+        self._discard()
+        if process is not None:
+            try:
+                await process.wait()
+            except RuntimeError:
+                pass
@@ -0,0 +1,242 @@
+"""Zygote fork-server used by the local executor.
+
+This file is executed as a standalone script by the interpreter configured
+for code execution, so it must only depend on the standard library and
+must never import pyshala itself.
+
+The server preimports the modules named on its command line, then waits
+for spawn requests on the Unix socket whose file descriptor is passed as
+the first argument (one request per packet). Each request carries the script path, the working
+directory and three file descriptors (stdin, stdout, stderr), plus
+optionally a fourth one the script's source is read from instead of the
+script path. The server
+forks a child that runs the script as ``__main__`` in a new session, with
+those descriptors as its standard streams and the requested rlimits and
+user applied, and reports the
+child's pid and, later, its exit status and resource usage as JSON lines on
+its own stdout.
+"""
+
+import atexit
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import types
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+def _run_child(script_path: str, cwd: str, source_fd: int = -1) -> int:
+    """Run a script the way ``python script.py`` would and return the exit code.
+
+    The source is read from ``source_fd`` if it is given, otherwise from
+    ``script_path``.
+    """
+    os.chdir(cwd)
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", closefd=False)
+    sys.stderr = open(2, "w", buffering=1, errors="backslashreplace", closefd=False)
+    sys.argv = [script_path]
+    sys.path[0] = os.path.dirname(script_path)
+
+    main_module = types.ModuleType("__main__")
+    main_module.__file__ = script_path
+    main_module.__builtins__ = __builtins__
+    sys.modules["__main__"] = main_module
+
+    exit_code = 0
+    try:
+        with open(source_fd if source_fd >= 0 else script_path, "rb") as f:
+            source = f.read()
+        code = compile(source, script_path, "exec", dont_inherit=True)
+        exec(code, main_module.__dict__)
+    except SystemExit as e:
+        exit_code = _exit_code(e.code)
+    except SyntaxError as e:
+        sys.excepthook(type(e), e, None)
+        exit_code = 1
+    except BaseException as e:
+        # Drop this frame so the traceback starts at the student's script
+        tb = e.__traceback__.tb_next if e.__traceback__ else None
+        sys.excepthook(type(e), e.with_traceback(tb), tb)
+        exit_code = 1
+
+    # Mirror interpreter shutdown: join non-daemon threads, run atexit hooks
+    threading = sys.modules.get("threading")
+    if threading is not None and hasattr(threading, "_shutdown"):
+        threading._shutdown()
+    atexit._run_exitfuncs()
+
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    return exit_code
+
+
+def _apply_limits(limits: dict) -> None:
+    """Lower soft and hard rlimits and pin CPUs; mirrors ResourceLimits.apply."""
+    cpus = limits.get("cpus")
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (ValueError, OSError):
+            pass
+    if resource is None:
+        return
+    mb = 1024 * 1024
+    pairs = [
+        ("RLIMIT_AS", limits.get("address_space_mb", 0) * mb),
+        ("RLIMIT_CPU", limits.get("cpu_seconds", 0)),
+        ("RLIMIT_FSIZE", limits.get("file_size_mb", 0) * mb),
+        ("RLIMIT_NPROC", limits.get("max_processes", 0)),
+    ]
+    for name, value in pairs:
+        which = getattr(resource, name, None)
+        if not value or which is None:
+            continue
+        try:
+            _, current_hard = resource.getrlimit(which)
+            soft = value
+            hard = value + 1 if name == "RLIMIT_CPU" else value
+            if current_hard != resource.RLIM_INFINITY:
+                soft, hard = min(soft, current_hard), min(hard, current_hard)
+            resource.setrlimit(which, (soft, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def _switch_user(limits: dict) -> None:
+    """Run as the requested user; mirrors the end of ResourceLimits.apply."""
+    uid = limits.get("uid", 0)
+    if uid:
+        os.setgroups([])
+        os.setgid(limits.get("gid", 0))
+        os.setuid(uid)
+
+
+def _exit_code(code: object) -> int:
+    """Translate a SystemExit code into a process exit status."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xFF
+    print(code, file=sys.stderr)
+    return 1
+
+
+def main(argv: list[str]) -> int:
+    """Serve spawn requests until the control socket is closed."""
+    sock = socket.socket(fileno=int(argv[1]))
+    sock.setblocking(True)
+
+    # Keep a private copy of stdout for replies so stray output from the
+    # preimported modules cannot corrupt the protocol
+    reply = os.fdopen(os.dup(1), "w", buffering=1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 1)
+
+    for name in argv[2:]:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    selector.register(wake_r, selectors.EVENT_READ)
+
+    def send(message: dict) -> None:
+        reply.write(json.dumps(message) + "\n")
+
+    def reap() -> None:
+        while True:
+            try:
+                pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            max_rss = rusage.ru_maxrss
+            if sys.platform == "darwin":
+                max_rss //= 1024
+            send({
+                "pid": pid,
+                "returncode": os.waitstatus_to_exitcode(status),
+                "utime": rusage.ru_utime,
+                "stime": rusage.ru_stime,
+                "maxrss": max_rss,
+            })
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is wake_r:
+                try:
+                    while os.read(wake_r, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+                reap()
+                continue
+
+            try:
+                data, fds, _, _ = socket.recv_fds(sock, 65536, 4)
+            except OSError:
+                data, fds = b"", []
+            if not data:
+                return 0
+
+            request = json.loads(data)
+            try:
+                pid = os.fork()
+            except OSError as e:
+                for fd in fds:
+                    os.close(fd)
+                send({"id": request["id"], "error": str(e)})
+                continue
+
+            if pid == 0:
+                exit_code = 1
+                try:
+                    signal.set_wakeup_fd(-1)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    selector.close()
+                    sock.close()
+                    reply.close()
+                    for fd in (wake_r, wake_w, devnull):
+                        os.close(fd)
+                    for target, fd in enumerate(fds):
+                        if fd != target:
+                            os.dup2(fd, target)
+                            os.close(fd)
+                    atexit._clear()
+                    # Lead a new session so the whole tree can be killed
+                    os.setsid()
+                    _apply_limits(request.get("limits", {}))
+                    _switch_user(request.get("limits", {}))
+                    exit_code = _run_child(
+                        request["script"], request["cwd"], 3 if len(fds) > 3 else -1
+                    )
+                finally:
+                    os._exit(exit_code)
+
+            for fd in fds:
+                os.close(fd)
+            send({"id": request["id"], "pid": pid})
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -2,12 +2,18 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+from functools import lru_cache
+from typing import Optional
+
 import reflex as rx
 from pydantic import BaseModel
 
 from ..services.config_loader import get_app_config
 from ..services.local_executor import get_local_executor
 from ..services.lesson_loader import get_lesson_loader
+from ..services.run_registry import get_run_registry
 
 
 class ModuleInfo(BaseModel):
@@ -34,6 +40,12 @@ class TestCaseInfo(BaseModel):
     expected_output: str = ""
     description: str = ""
     hidden: bool = False
+    timeout: float = 0.0  # Seconds, 0 uses the lesson's time limit
+    # JSON of a function-call case's function, args, kwargs and
+    # expected_return; empty for stdin/stdout cases
+    call: str = ""
+    compare: str = "exact"  # How output is matched, see TestCase
+    tolerance: float = -1.0  # Tolerance of "float" matching, -1 for the default
 
 
 class TestResultInfo(BaseModel):
@@ -45,6 +57,54 @@ class TestResultInfo(BaseModel):
     expected_output: str = ""
     actual_output: str = ""
     error_message: str = ""
+    skipped: bool = False
+    output_truncated: bool = False
+    execution_time: float = -1.0
+    memory_used: int = -1
+    resource_usage: str = ""
+    call: str = ""  # e.g. "add(2, 3)" for function-call test cases
+    difference: str = ""  # Where the output first differs, e.g. "Line 2: ..."
+
+
+@lru_cache(maxsize=None)
+def _running_app() -> Optional[rx.App]:
+    """Look up the app served by this process, once.
+
+    Each lookup puts the working directory on sys.path again, so it must
+    not be repeated on every poll.
+    """
+    try:
+        from reflex.utils.prerequisites import get_and_validate_app
+
+        return get_and_validate_app().app
+    except Exception:
+        return None
+
+
+def client_connected(token: str) -> bool:
+    """Check if a client still has a websocket connection to this server.
+
+    Args:
+        token: The client's session token.
+
+    Returns:
+        False only if the client is known to be gone.
+    """
+    app = _running_app()
+    namespace = app.event_namespace if app is not None else None
+    if namespace is None:
+        return True
+    return token in namespace.token_to_sid
+
+
+def format_resource_usage(execution_time, memory_used) -> str:
+    """Format CPU time (seconds) and peak memory (KB) for display."""
+    parts = []
+    if execution_time is not None:
+        parts.append(f"{execution_time * 1000:.0f} ms")
+    if memory_used is not None:
+        parts.append(f"{memory_used / 1024:.1f} MB")
+    return " · ".join(parts)
 
 
 class QuestionOptionInfo(BaseModel):
@@ -103,10 +163,13 @@ class AppState(rx.State):
 
     # Test execution state
     is_running: bool = False
+    queued_ahead: int = -1  # Sessions served before ours in the scheduler, -1 if not queued
+    _run_id: int = 0  # Incremented per run; results of an older run are dropped
     test_results: list[TestResultInfo] = []
     tests_all_passed: bool = False
     tests_passed_count: int = 0
     tests_total_count: int = 0
+    static_error: str = ""  # Syntax error report covering all tests, if any
 
     # Error handling
     error_message: str = ""
@@ -216,6 +279,10 @@ class AppState(rx.State):
         if self.current_module_id == module_id and self.current_lesson_id == lesson_id:
             return
 
+        # Nobody will see the results of a run for the previous lesson
+        self._cancel_run()
+        get_local_executor().release_session(self.router.session.client_token)
+
         loader = get_lesson_loader()
         lesson = loader.get_lesson(module_id, lesson_id)
         module = loader.get_module(module_id)
@@ -242,6 +309,15 @@ class AppState(rx.State):
                     expected_output=tc.expected_output,
                     description=tc.description,
                     hidden=tc.hidden,
+                    timeout=tc.timeout or 0.0,
+                    call=json.dumps({
+                        "function": tc.function,
+                        "args": tc.args,
+                        "kwargs": tc.kwargs,
+                        "expected_return": tc.expected_return,
+                    }) if tc.is_function_call else "",
+                    compare=tc.compare,
+                    tolerance=tc.tolerance if tc.tolerance is not None else -1.0,
                 )
                 for tc in lesson.test_cases
             ]
@@ -269,6 +345,7 @@ class AppState(rx.State):
 
             # Reset test results
             self.test_results = []
+            self.static_error = ""
             self.tests_all_passed = False
             self.tests_passed_count = 0
             self.tests_total_count = 0
@@ -314,6 +391,7 @@ class AppState(rx.State):
         self.current_code = self.starter_code
         self.editor_reset_count = self.editor_reset_count + 1  # Force editor re-mount
         self.test_results = []
+        self.static_error = ""
         self.tests_all_passed = False
         self.tests_passed_count = 0
         self.tests_total_count = 0
@@ -406,46 +484,108 @@ class AppState(rx.State):
         self.quiz_correct_count = 0
         self.quiz_total_count = 0
 
+    def _cancel_run(self) -> None:
+        """Cancel the in-flight run, killing its processes, if any."""
+        get_run_registry().cancel(self.router.session.client_token)
+        self._run_id += 1
+        self.is_running = False
+        self.queued_ahead = -1
+
+    def cancel_run(self) -> None:
+        """Cancel the submission that is running."""
+        if self.is_running:
+            self._cancel_run()
+            self.test_results = []
+            self.static_error = ""
+
     @rx.event(background=True)
     async def run_code(self) -> None:
         """Execute the current code against test cases."""
-        # Check if already running and set running state
-        async with self:
-            if self.is_running:
-                return
-            self.is_running = True
-            self.test_results = []
-            # Capture values needed for the API call
-            module_id = self.current_module_id
-            lesson_id = self.current_lesson_id
-            code = self.current_code
-            test_cases_dict = [
-                {
-                    "stdin": tc.stdin,
-                    "expected_output": tc.expected_output,
-                    "description": tc.description,
-                    "hidden": tc.hidden,
-                }
-                for tc in self.current_lesson_test_cases
-            ]
-
+        # Set when this run takes over the state; an error before then
+        # leaves the state alone
+        run_id = None
         try:
+            # Check if already running and set running state
+            async with self:
+                if self.is_running:
+                    return
+                self._run_id += 1
+                run_id = self._run_id
+                self.is_running = True
+                self.test_results = []
+                self.static_error = ""
+                # Capture values needed for the API call
+                session_id = self.router.session.client_token
+                module_id = self.current_module_id
+                lesson_id = self.current_lesson_id
+                code = self.current_code
+                test_cases_dict = [
+                    {
+                        "stdin": tc.stdin,
+                        "expected_output": tc.expected_output,
+                        "description": tc.description,
+                        "hidden": tc.hidden,
+                        "timeout": tc.timeout or None,
+                        "compare": tc.compare,
+                        "tolerance": tc.tolerance if tc.tolerance >= 0 else None,
+                        **(json.loads(tc.call) if tc.call else {}),
+                    }
+                    for tc in self.current_lesson_test_cases
+                ]
+
             executor = get_local_executor()
             loader = get_lesson_loader()
 
-            # Get lesson for data files
+            # Get lesson for data files and per-lesson options
             lesson = loader.get_lesson(module_id, lesson_id)
             data_files = lesson.data_files if lesson else []
+            fail_fast = lesson.fail_fast if lesson else None
+            timeout = lesson.timeout if lesson else None
 
             # Run tests (this is the async operation outside state lock)
-            results = await executor.run_tests(
-                source_code=code,
-                test_cases=test_cases_dict,
-                data_files=data_files,
+            registry = get_run_registry()
+            run = registry.start(
+                session_id,
+                executor.run_tests(
+                    source_code=code,
+                    test_cases=test_cases_dict,
+                    data_files=data_files,
+                    session_id=session_id,
+                    fail_fast=fail_fast,
+                    timeout=timeout,
+                    lesson=f"{module_id}/{lesson_id}",
+                ),
             )
 
+            # Report our place in the execution queue while waiting
+            queued_ahead = -1
+            while not run.done:
+                await asyncio.wait({run.task}, timeout=0.25)
+                if not run.done and not client_connected(session_id):
+                    # The tab was closed; stop spending CPU on this run
+                    run.cancel()
+                    executor.release_session(session_id)
+                    continue
+                position = executor.scheduler.queue_position(session_id)
+                position = -1 if position is None else position
+                if position != queued_ahead:
+                    queued_ahead = position
+                    async with self:
+                        if self._run_id == run_id:
+                            self.queued_ahead = position
+            if run.cancelled:
+                async with self:
+                    # Unless a newer run or lesson took over the state
+                    if self._run_id == run_id:
+                        self.is_running = False
+                        self.queued_ahead = -1
+                return
+            results = run.task.result()
+
             # Store results back in state
             async with self:
+                if self._run_id != run_id:
+                    return
                 self.test_results = [
                     TestResultInfo(
                         test_index=tr.test_index,
@@ -455,13 +595,29 @@ class AppState(rx.State):
                         expected_output=tr.expected_output if not tr.hidden else "[hidden]",
                         actual_output=tr.actual_output,
                         error_message=tr.error_message,
+                        skipped=tr.skipped,
+                        output_truncated=tr.output_truncated,
+                        execution_time=(
+                            tr.execution_time if tr.execution_time is not None else -1.0
+                        ),
+                        memory_used=tr.memory_used if tr.memory_used is not None else -1,
+                        resource_usage=format_resource_usage(
+                            tr.execution_time, tr.memory_used
+                        ),
+                        call=tr.call if not tr.hidden or not tr.call else "[hidden]",
+                        # The difference would reveal a hidden expected output
+                        difference=tr.difference if not tr.hidden else "",
                     )
                     for tr in results.test_results
                 ]
+                self.static_error = (
+                    results.static_error.details if results.static_error else ""
+                )
                 self.tests_all_passed = results.all_passed
                 self.tests_passed_count = results.passed_count
                 self.tests_total_count = results.total_tests
                 self.is_running = False
+                self.queued_ahead = -1
 
                 # Mark as completed if all tests pass (session-only, not persisted)
                 if results.all_passed and module_id and lesson_id:
@@ -471,12 +627,25 @@ class AppState(rx.State):
 
         except Exception as e:
             async with self:
+                if self._run_id != run_id:
+                    return
                 self.error_message = f"Error running code: {str(e)}"
                 self.test_results = []
                 self.tests_all_passed = False
                 self.tests_passed_count = 0
                 self.tests_total_count = 0
                 self.is_running = False
+                self.queued_ahead = -1
+
+    @rx.var
+    def run_status_text(self) -> str:
+        """Get the status label shown while a submission is in progress."""
+        if self.queued_ahead == 0:
+            return "Queued (next)"
+        if self.queued_ahead > 0:
+            sessions = "session" if self.queued_ahead == 1 else "sessions"
+            return f"Queued ({self.queued_ahead} {sessions} ahead)"
+        return "Running..."
 
     @rx.var
     def has_next_lesson(self) -> bool:
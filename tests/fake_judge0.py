@@ -0,0 +1,203 @@
+"""A minimal stand-in for the Judge0 API, served over real HTTP.
+
+It speaks just enough HTTP/1.1 (with keep-alive) for Judge0Client and
+"runs" submissions with a Python callable instead of a sandbox, so tests
+and benchmarks can exercise the client's networking without Judge0.
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+
+def echo(source_code: str, stdin: str) -> dict:
+    """Default runner: the program prints its stdin."""
+    return {"stdout": stdin}
+
+
+class FakeJudge0:
+    """Serve the Judge0 submission endpoints on localhost.
+
+    Args:
+        run: Called with the decoded source code and stdin of each
+            submission; returns the submission's fields (stdout, stderr,
+            status_id, ...). Defaults to echoing stdin.
+        processing_polls: GET requests that report a submission as
+                         still processing before it is finished.
+        max_batch_size: Largest batch accepted, like Judge0's
+                       MAX_SUBMISSION_BATCH_SIZE.
+        allow_wait: Answer ``wait=true`` submissions with their result;
+                   otherwise refuse them with a 400, like Judge0 with
+                   ENABLE_WAIT_RESULT off.
+        callbacks: PUT finished submissions to their ``callback_url``.
+        callback_transport: Transport the callbacks are sent with, e.g. an
+                           ``httpx.ASGITransport`` to deliver them to an
+                           app in-process. Defaults to real HTTP.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str, str], dict] = echo,
+        processing_polls: int = 0,
+        max_batch_size: int = 20,
+        allow_wait: bool = True,
+        callbacks: bool = True,
+        callback_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.run = run
+        self.processing_polls = processing_polls
+        self.max_batch_size = max_batch_size
+        self.allow_wait = allow_wait
+        self.callbacks = callbacks
+        self.callback_transport = callback_transport
+        self.callbacks_sent: list[str] = []
+        self._callback_tasks: set[asyncio.Task] = set()
+        self.submissions: dict[str, dict] = {}
+        self.connections = 0
+        self.requests: list[tuple[str, str]] = []
+        self._tokens = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.url = ""
+
+    async def __aenter__(self) -> "FakeJudge0":
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        for task in self._callback_tasks:
+            task.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                url = urlsplit(target)
+                self.requests.append((method, url.path))
+                status, payload = await self.handle(
+                    method, url.path, parse_qs(url.query), body
+                )
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    "\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(
+        self, method: str, path: str, query: dict, body: bytes
+    ) -> tuple[int, object]:
+        """Answer one request with an HTTP status and a JSON payload."""
+        if method == "POST" and path == "/submissions":
+            if query.get("wait") == ["true"]:
+                if not self.allow_wait:
+                    return 400, {"error": "wait not allowed"}
+                token = self.submit(json.loads(body))
+                return 201, self.result(token)
+            return 201, {"token": self.submit(json.loads(body))}
+        if method == "POST" and path == "/submissions/batch":
+            submissions = json.loads(body)["submissions"]
+            if len(submissions) > self.max_batch_size:
+                return 400, {"error": "too many submissions"}
+            return 201, [
+                {"token": self.submit(payload)}
+                if payload.get("source_code")
+                else {"source_code": ["can't be blank"]}
+                for payload in submissions
+            ]
+        if method == "GET" and path == "/submissions/batch":
+            tokens = query["tokens"][0].split(",")
+            return 200, {
+                "submissions": [
+                    self.poll(token) if token in self.submissions else None
+                    for token in tokens
+                ]
+            }
+        if method == "GET" and path.startswith("/submissions/"):
+            token = path.rsplit("/", 1)[1]
+            if token not in self.submissions:
+                return 404, {"error": "Not found"}
+            return 200, self.poll(token)
+        return 404, {"error": "Not found"}
+
+    def submit(self, payload: dict) -> str:
+        """Run a submission and store its result until it is polled."""
+        token = f"token-{next(self._tokens)}"
+        source = base64.b64decode(payload["source_code"]).decode()
+        stdin = base64.b64decode(payload.get("stdin") or "").decode()
+        result = {"status_id": 3, "stdout": "", "stderr": ""}
+        result.update(self.run(source, stdin))
+        self.submissions[token] = {
+            "result": result,
+            "polls": 0,
+            "payload": payload,
+        }
+        if self.callbacks and payload.get("callback_url"):
+            # Like Judge0, call back after the submission was answered
+            task = asyncio.get_running_loop().create_task(
+                self._call_back(token, payload["callback_url"])
+            )
+            self._callback_tasks.add(task)
+            task.add_done_callback(self._callback_tasks.discard)
+        return token
+
+    async def _call_back(self, token: str, url: str) -> None:
+        """Send a finished submission to its callback URL."""
+        await asyncio.sleep(0.01)
+        async with httpx.AsyncClient(transport=self.callback_transport) as client:
+            response = await client.put(url, json=self.result(token))
+            response.raise_for_status()
+        self.callbacks_sent.append(token)
+
+    def poll(self, token: str) -> dict:
+        """Get a submission's fields as Judge0 returns them."""
+        submission = self.submissions[token]
+        submission["polls"] += 1
+        if submission["polls"] <= self.processing_polls:
+            return {"token": token, "status": {"id": 2, "description": "Processing"}}
+        return self.result(token)
+
+    def result(self, token: str) -> dict:
+        """Get a finished submission's fields."""
+        result = self.submissions[token]["result"]
+        description = "Accepted" if result["status_id"] == 3 else "Runtime Error"
+        return {
+            "token": token,
+            "status": {"id": result["status_id"], "description": description},
+            "stdout": base64.b64encode(result["stdout"].encode()).decode(),
+            "stderr": base64.b64encode(result["stderr"].encode()).decode(),
+            "time": "0.01",
+            "memory": 1024,
+        }
@@ -0,0 +1,83 @@
+"""Tests for execution CPU sets."""
+
+import os
+
+import pytest
+
+from pyshala.services import affinity
+from pyshala.services.affinity import (
+    execution_cpu_count,
+    parse_cpu_list,
+    resolve_cpu_set,
+)
+from pyshala.services.limits import ResourceLimits
+from pyshala.services.local_executor import LocalExecutor
+from pyshala.services.result_cache import ResultCache
+from pyshala.services.scheduler import ExecutionScheduler
+
+needs_affinity = pytest.mark.skipif(
+    not hasattr(os, "sched_setaffinity"), reason="needs sched_setaffinity"
+)
+
+
+class TestCpuSets:
+    """Tests for parsing and resolving CPU sets."""
+
+    def test_parse_cpu_list(self):
+        assert parse_cpu_list("0") == {0}
+        assert parse_cpu_list("2-4, 7") == {2, 3, 4, 7}
+
+    @pytest.mark.parametrize("spec", ["", "a", "3-1", "-1", "1-x"])
+    def test_parse_rejects_malformed_lists(self, spec):
+        with pytest.raises(ValueError):
+            parse_cpu_list(spec)
+
+    @needs_affinity
+    def test_resolve(self, monkeypatch):
+        monkeypatch.setattr(affinity, "available_cpus", lambda: {0, 1, 2, 3})
+
+        assert resolve_cpu_set("") is None
+        assert resolve_cpu_set("2-3,9") == {2, 3}
+        assert resolve_cpu_set("auto") == {1, 2, 3}
+        # Nothing usable means no pinning rather than an empty set
+        assert resolve_cpu_set("8-9") is None
+
+    @needs_affinity
+    def test_auto_keeps_single_cpu_unpinned(self, monkeypatch):
+        monkeypatch.setattr(affinity, "available_cpus", lambda: {0})
+        assert resolve_cpu_set("auto") is None
+
+    @needs_affinity
+    def test_env_var_sizes_scheduler(self, monkeypatch):
+        monkeypatch.setattr(affinity, "available_cpus", lambda: set(range(8)))
+        monkeypatch.setenv("EXECUTION_CPUS", "4-6")
+        monkeypatch.delenv("MAX_CONCURRENT_EXECUTIONS", raising=False)
+
+        assert execution_cpu_count() == 3
+        assert ExecutionScheduler().max_concurrent == 3
+        assert ResourceLimits.from_env(10.0).cpus == (4, 5, 6)
+
+
+@needs_affinity
+class TestPinnedExecutions:
+    """Tests for running code on a CPU set."""
+
+    @pytest.mark.parametrize("mode", ["subprocess", "zygote", "batch"])
+    async def test_children_are_pinned(self, mode):
+        cpu = min(os.sched_getaffinity(0))
+        executor = LocalExecutor(
+            use_zygote=mode == "zygote",
+            batch_tests=mode == "batch",
+            scheduler=ExecutionScheduler(max_concurrent=2),
+            cache=ResultCache(max_entries=0),
+            limits=ResourceLimits(cpus=(cpu,)),
+        )
+        code = "import os\nprint(sorted(os.sched_getaffinity(0)))"
+        try:
+            results = await executor.run_tests(
+                code, [{"stdin": "", "expected_output": str([cpu])}]
+            )
+        finally:
+            await executor.close()
+
+        assert results.all_passed, results.test_results[0].actual_output
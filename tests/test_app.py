@@ -108,6 +108,21 @@ class TestEnvironmentSetup:
         assert env["MAX_EXECUTION_TIME"] == "15.0"
         assert env["PYTHON_PATH"] == "/usr/bin/python3"
 
+    def test_execution_cpus(self, tmp_path):
+        lessons_dir = tmp_path / "lessons"
+        lessons_dir.mkdir()
+
+        app = PyShala(lessons_path=str(lessons_dir), execution_cpus="2-5")
+
+        assert app._setup_environment()["EXECUTION_CPUS"] == "2-5"
+
+    def test_invalid_execution_cpus_raises(self, tmp_path):
+        lessons_dir = tmp_path / "lessons"
+        lessons_dir.mkdir()
+
+        with pytest.raises(ValueError, match="Invalid CPU list"):
+            PyShala(lessons_path=str(lessons_dir), execution_cpus="two")
+
 
 class TestVersion:
     """Tests for package version."""
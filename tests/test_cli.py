@@ -136,3 +136,51 @@ class TestCLI:
                 assert result == 0
                 captured = capsys.readouterr()
                 assert "Shutting down" in captured.out
+
+    def test_runtime_report(self, tmp_path, capsys):
+        from pyshala.services.runtime_stats import RuntimeStats
+
+        log = tmp_path / "runtimes.jsonl"
+        stats = RuntimeStats(path=str(log))
+        for _ in range(10):
+            stats.record("basics/hello", 0.1, 10.0)
+            stats.record("data/pandas", 9.0, 10.0)
+
+        with patch.object(
+            sys, "argv", ["pyshala", "--runtime-report", "--runtime-stats", str(log)]
+        ):
+            result = main()
+
+        assert result == 0
+        out = capsys.readouterr().out
+        assert "data/pandas" in out
+        assert "basics/hello" not in out
+
+    def test_runtime_report_all_lessons(self, tmp_path, capsys):
+        from pyshala.services.runtime_stats import RuntimeStats
+
+        log = tmp_path / "runtimes.jsonl"
+        stats = RuntimeStats(path=str(log))
+        stats.record("basics/hello", 0.1, 10.0)
+        stats.record("data/pandas", 2.0, 10.0)
+
+        with patch.object(
+            sys,
+            "argv",
+            ["pyshala", "--runtime-report", "--all-lessons", "--runtime-stats", str(log)],
+        ):
+            result = main()
+
+        assert result == 0
+        out = capsys.readouterr().out
+        assert "p50" in out and "p95" in out
+        # Slowest lesson first
+        assert out.index("data/pandas") < out.index("basics/hello")
+
+    def test_runtime_report_requires_log(self, capsys, monkeypatch):
+        monkeypatch.delenv("RUNTIME_STATS_PATH", raising=False)
+        with patch.object(sys, "argv", ["pyshala", "--runtime-report"]):
+            result = main()
+
+        assert result == 1
+        assert "RUNTIME_STATS_PATH" in capsys.readouterr().err
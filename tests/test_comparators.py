@@ -0,0 +1,135 @@
+"""Tests for streaming output comparison."""
+
+import pytest
+
+from pyshala.services.comparators import (
+    LineComparator,
+    StreamingMatcher,
+    compare_output,
+    return_value_matches,
+)
+
+
+class TestStreamingMatcher:
+    """Tests for StreamingMatcher."""
+
+    def feed_all(self, matcher, *chunks):
+        return all([matcher.feed(chunk) for chunk in chunks])
+
+    def test_matching_output_in_pieces(self):
+        matcher = StreamingMatcher("hello\nworld\n")
+        assert self.feed_all(matcher, b"hel", b"lo\nwo", b"rld\n")
+
+    def test_trailing_whitespace_is_allowed(self):
+        matcher = StreamingMatcher("hello")
+        assert self.feed_all(matcher, b"hello", b"  \n\n", b"\t")
+
+    def test_divergent_byte(self):
+        matcher = StreamingMatcher("hello")
+        assert matcher.feed(b"he")
+        assert not matcher.feed(b"lp")
+        assert matcher.mismatch
+
+    def test_text_after_expected_output(self):
+        matcher = StreamingMatcher("1\n2")
+        assert matcher.feed(b"1\n2\n")
+        assert not matcher.feed(b"3\n")
+
+    def test_expected_trailing_whitespace_is_ignored(self):
+        matcher = StreamingMatcher("hello\n\n")
+        assert not matcher.feed(b"hello\nx")
+
+    def test_endless_whitespace_is_rejected(self):
+        matcher = StreamingMatcher("ok", slack_bytes=10)
+        assert matcher.feed(b"ok" + b"\n" * 10)
+        assert not matcher.feed(b"\n" * 10)
+
+    def test_non_ascii_tail_is_left_undecided(self):
+        matcher = StreamingMatcher("ok")
+        # U+00A0 NO-BREAK SPACE is whitespace for str.rstrip()
+        assert matcher.feed("ok ".encode("utf-8"))
+
+    def test_stays_rejected(self):
+        matcher = StreamingMatcher("a")
+        assert not matcher.feed(b"b")
+        assert not matcher.feed(b"")
+
+
+class TestLineComparator:
+    """Tests for the compare modes of LineComparator."""
+
+    def test_exact_reports_first_difference(self):
+        result = compare_output("1\n2\n5\n4\n", "1\n2\n3\n4")
+        assert not result.passed
+        assert result.difference == "Line 3: expected '3', got '5'"
+
+    def test_exact_reports_missing_and_extra_output(self):
+        assert compare_output("1\n", "1\n2").difference == (
+            "Line 2: expected '2', got end of output"
+        )
+        assert compare_output("1\n2\n", "1").difference == (
+            "Line 2: expected end of output, got '2'"
+        )
+
+    def test_exact_ignores_trailing_whitespace_only(self):
+        assert compare_output("a\nb  \n\n", "a\nb").passed
+        assert not compare_output("a \nb", "a\nb").passed
+
+    def test_whitespace_mode(self):
+        assert compare_output("1   2\n\n3\t4\n", "1 2\n3 4", "whitespace").passed
+        assert not compare_output("1 2 3\n", "1 2\n3", "whitespace").passed
+
+    def test_float_mode(self):
+        assert compare_output("0.3333334 x\n", "0.333333 x", "float").passed
+        assert compare_output("3.14\n", "3.1", "float", tolerance=0.1).passed
+        result = compare_output("3.2\n", "3.1", "float", tolerance=0.01)
+        assert result.difference == "Line 1: expected '3.1', got '3.2'"
+
+    def test_unordered_mode(self):
+        assert compare_output("b\na\n\na\n", "a\na\nb", "unordered").passed
+        assert compare_output("a\nc\n", "a\nb", "unordered").difference == (
+            "Line 2: unexpected line 'c'"
+        )
+        assert compare_output("a\n", "a\nb\nc", "unordered").difference == (
+            "Missing line 'b' and 1 more"
+        )
+
+    def test_regex_mode(self):
+        expected = r"Total: \d+" + "\n" + r"(yes|no)"
+        assert compare_output("Total: 42\nno\n", expected, "regex").passed
+        assert not compare_output("Total: many\nno\n", expected, "regex").passed
+
+    def test_invalid_settings(self):
+        with pytest.raises(ValueError):
+            LineComparator("a", "fuzzy")
+        with pytest.raises(ValueError):
+            LineComparator("(", "regex")
+
+    def test_lenient_modes_reject_while_streaming(self):
+        comparator = LineComparator("1 2\n3 4", "whitespace")
+        assert comparator.feed(b"1  2\n")
+        assert not comparator.feed(b"3 5\n")
+        assert comparator.finish().difference == "Line 2: expected '3 4', got '3 5'"
+
+    def test_long_lines_are_not_buffered(self):
+        comparator = LineComparator("x", "unordered", max_line_chars=100)
+        assert not comparator.feed(b"y" * 1000)
+        assert len(comparator._partial) <= 100
+
+    def test_long_reports_are_shortened(self):
+        result = compare_output("b" * 500, "a" * 500)
+        assert len(result.difference) < 200
+
+
+class TestReturnValueMatches:
+    """Tests for checking a function call's reported return value."""
+
+    def test_json_values(self):
+        assert return_value_matches("[1, 0.30000000000000004]", "(1, 0.3)", [1, 0.3])
+        assert not return_value_matches("true", "True", 1)
+
+    def test_literal_fallback(self):
+        assert return_value_matches(None, "{1: 'a'}", {1: "a"})
+        assert return_value_matches(None, "{1, 2}", {1, 2})
+        assert not return_value_matches(None, "<object object at 0x7f>", None)
+        assert not return_value_matches(None, None, None)
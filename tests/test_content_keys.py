@@ -0,0 +1,43 @@
+"""Tests for memoized data file content hashes."""
+
+from pyshala.models.lesson import DataFile
+from pyshala.services import content_keys
+from pyshala.services.content_keys import ContentKeys, content_key
+
+
+def files(content: bytes) -> list[DataFile]:
+    return [DataFile(name="d.csv", path="d.csv", content=content)]
+
+
+class TestContentKeys:
+    """Tests for ContentKeys."""
+
+    def test_same_contents_are_hashed_once(self, monkeypatch):
+        hashed = []
+
+        def counting_key(data_files):
+            hashed.append(1)
+            return content_key(data_files)
+
+        monkeypatch.setattr(content_keys, "content_key", counting_key)
+        keys = ContentKeys()
+        data_files = files(b"a,b\n")
+        assert keys.get(data_files) == keys.get(data_files)
+        assert hashed == [1]
+
+    def test_equal_contents_in_other_objects_get_the_same_key(self):
+        keys = ContentKeys()
+        first = keys.get(files(bytes(bytearray(b"x" * 100))))
+        assert keys.get(files(bytes(bytearray(b"x" * 100)))) == first
+        assert keys.get(files(b"y")) != first
+
+    def test_entries_hold_their_contents(self):
+        keys = ContentKeys(max_entries=2)
+        for index in range(3):
+            keys.remember(files(bytes([index]) * 10), str(index))
+
+        assert len(keys._keys) == 2
+        # Held contents cannot be freed, so their ids are not reused
+        assert [entry[1][0] for entry in keys._keys.values()] == [
+            b"\x01" * 10, b"\x02" * 10
+        ]
@@ -0,0 +1,146 @@
+"""Tests for receiving Judge0 results through callbacks."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from pyshala.services import judge0_callbacks
+from pyshala.services.judge0_callbacks import (
+    CALLBACK_PATH,
+    Judge0Callbacks,
+    check_callback_setup,
+    get_judge0_callbacks,
+    judge0_callback_app,
+)
+from pyshala.services.judge0_client import Judge0Client, judge0_lifespan
+
+from .fake_judge0 import FakeJudge0
+
+
+async def backend(scope, receive, send):
+    """Stand-in for the Reflex backend behind the callback endpoint."""
+    await send({"type": "http.response.start", "status": 204, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+@pytest.fixture
+def callbacks(monkeypatch):
+    registry = Judge0Callbacks(secret="s3cret")
+    monkeypatch.setattr(judge0_callbacks, "_callbacks", registry)
+    return registry
+
+
+@pytest.fixture
+def transport(callbacks):
+    return httpx.ASGITransport(app=judge0_callback_app(backend))
+
+
+class TestJudge0Callbacks:
+    """Tests for the callback registry."""
+
+    async def test_callback_resolves_waiter(self):
+        callbacks = Judge0Callbacks()
+        future = callbacks.expect("t1")
+        assert callbacks.deliver({"token": "t1", "stdout": "x"})
+        assert (await future)["stdout"] == "x"
+
+    async def test_early_callback_is_kept_for_the_waiter(self):
+        callbacks = Judge0Callbacks(max_unclaimed=2)
+        for token in ("t1", "t2", "t3"):
+            assert not callbacks.deliver({"token": token})
+
+        assert callbacks.expect("t3").done()
+        # The oldest unclaimed callback was dropped
+        assert not callbacks.expect("t1").done()
+
+    async def test_discard_cancels_waiter(self):
+        callbacks = Judge0Callbacks()
+        future = callbacks.expect("t1")
+        callbacks.discard("t1")
+        assert future.cancelled()
+
+    def test_url_carries_the_key(self):
+        callbacks = Judge0Callbacks(secret="abc")
+        assert callbacks.url("http://pyshala:8000/") == (
+            f"http://pyshala:8000{CALLBACK_PATH}?key=abc"
+        )
+
+    async def test_startup_warns_without_shared_secret(self, monkeypatch, caplog):
+        monkeypatch.delenv("JUDGE0_CALLBACK_SECRET", raising=False)
+        monkeypatch.delenv("JUDGE0_CALLBACK_URL", raising=False)
+        assert check_callback_setup()
+
+        monkeypatch.setenv("JUDGE0_CALLBACK_URL", "http://pyshala:8000")
+        async with judge0_lifespan():
+            pass
+        assert "single backend worker" in caplog.text
+
+        monkeypatch.setenv("JUDGE0_CALLBACK_SECRET", "s3cret")
+        assert check_callback_setup()
+
+
+class TestCallbackEndpoint:
+    """Tests for the endpoint Judge0 calls back."""
+
+    async def test_endpoint_checks_key_and_body(self, callbacks, transport):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://pyshala"
+        ) as client:
+            forbidden = await client.put(
+                CALLBACK_PATH, params={"key": "wrong"}, json={"token": "t1"}
+            )
+            bad = await client.put(
+                CALLBACK_PATH, params={"key": "s3cret"}, content=b"not json"
+            )
+            not_allowed = await client.get(CALLBACK_PATH, params={"key": "s3cret"})
+            ok = await client.put(
+                CALLBACK_PATH, params={"key": "s3cret"}, json={"token": "t1"}
+            )
+            other = await client.get("/ping")
+
+        assert forbidden.status_code == 403
+        assert bad.status_code == 400
+        assert not_allowed.status_code == 405
+        assert ok.status_code == 200
+        assert other.status_code == 204
+        assert callbacks.received == 1
+        assert get_judge0_callbacks() is callbacks
+
+    async def test_results_arrive_without_polling(self, transport):
+        async with FakeJudge0(
+            processing_polls=5, callback_transport=transport
+        ) as judge0:
+            async with Judge0Client(
+                base_url=judge0.url, callback_url="http://pyshala"
+            ) as client:
+                result = await client.execute_and_wait("print(input())", "a")
+                results = await client.run_tests(
+                    "print(input())",
+                    [{"stdin": str(i), "expected_output": str(i)} for i in range(3)],
+                )
+
+        assert result.stdout == "a"
+        assert result.polls == 0
+        assert results.all_passed
+        assert len(judge0.callbacks_sent) == 4
+        assert all(method == "POST" for method, _ in judge0.requests)
+
+    async def test_missing_callback_falls_back_to_polling(self, callbacks):
+        async with FakeJudge0(callbacks=False) as judge0:
+            async with Judge0Client(
+                base_url=judge0.url,
+                callback_url="http://pyshala",
+                callback_grace=0.05,
+                max_execution_time=0.1,
+            ) as client:
+                result = await client.execute_and_wait("print(input())", "a")
+                test_cases = [{"stdin": "b", "expected_output": "b"}]
+                results = await asyncio.wait_for(
+                    client.run_tests("print(input())", test_cases), 5
+                )
+
+        assert result.stdout == "a"
+        assert result.polls == 1
+        assert results.all_passed
+        assert ("GET", "/submissions/batch") in judge0.requests
@@ -0,0 +1,406 @@
+"""Tests for the Judge0 API client."""
+
+import asyncio
+import base64
+import io
+import os
+import zipfile
+
+from pyshala.models.lesson import DataFile
+from pyshala.services import judge0_client
+from pyshala.services.judge0_client import (
+    ExecutionResult,
+    Judge0Client,
+    SubmissionStatus,
+)
+
+from .fake_judge0 import FakeJudge0
+
+
+def accepted(stdout: str) -> ExecutionResult:
+    return ExecutionResult(
+        status_id=SubmissionStatus.ACCEPTED,
+        status_description="Accepted",
+        stdout=stdout,
+    )
+
+
+class TestRunTests:
+    """Tests for the run_tests method, one submission per test case."""
+
+    async def test_limits_concurrency_and_keeps_order(self, monkeypatch):
+        client = Judge0Client(max_parallel_tests=2, batch_submissions=False)
+        in_flight = 0
+        peak = 0
+
+        async def fake_execute_and_wait(
+            source_code, stdin="", data_files=None, cpu_time_limit=None
+        ):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            # Earlier cases finish last
+            await asyncio.sleep(0.05 * (5 - int(stdin)))
+            in_flight -= 1
+            return accepted(stdin)
+
+        monkeypatch.setattr(client, "execute_and_wait", fake_execute_and_wait)
+        test_cases = [
+            {"stdin": str(i), "expected_output": str(i)} for i in range(5)
+        ]
+        results = await client.run_tests("print(input())", test_cases)
+
+        assert results.all_passed
+        assert results.passed_count == 5
+        assert peak == 2
+        assert [tr.test_index for tr in results.test_results] == [0, 1, 2, 3, 4]
+
+    async def test_function_call_cases_are_not_supported(self, monkeypatch):
+        client = Judge0Client()
+
+        async def fake_execute_and_wait(*args, **kwargs):
+            raise AssertionError("function calls must not be submitted")
+
+        monkeypatch.setattr(client, "execute_and_wait", fake_execute_and_wait)
+        results = await client.run_tests(
+            "def f():\n    return 1",
+            [{"function": "f", "args": [], "expected_return": 1}],
+        )
+
+        result = results.test_results[0]
+        assert not result.passed
+        assert result.call == "f()"
+        assert "local executor" in result.error_message
+
+    async def test_request_error_fails_only_that_case(self, monkeypatch):
+        client = Judge0Client(batch_submissions=False)
+
+        async def fake_execute_and_wait(
+            source_code, stdin="", data_files=None, cpu_time_limit=None
+        ):
+            if stdin == "boom":
+                raise RuntimeError("connection refused")
+            return accepted(stdin)
+
+        monkeypatch.setattr(client, "execute_and_wait", fake_execute_and_wait)
+        test_cases = [
+            {"stdin": "ok", "expected_output": "ok"},
+            {"stdin": "boom", "expected_output": "boom"},
+        ]
+        results = await client.run_tests("print(input())", test_cases)
+
+        assert results.passed_count == 1
+        assert "connection refused" in results.test_results[1].error_message
+
+    async def test_fail_fast_skips_cases_after_first_failure(self, monkeypatch):
+        client = Judge0Client(max_parallel_tests=1, batch_submissions=False)
+        calls = []
+
+        async def fake_execute_and_wait(
+            source_code, stdin="", data_files=None, cpu_time_limit=None
+        ):
+            calls.append(stdin)
+            return accepted(stdin)
+
+        monkeypatch.setattr(client, "execute_and_wait", fake_execute_and_wait)
+        test_cases = [
+            {"stdin": "a", "expected_output": "a"},
+            {"stdin": "b", "expected_output": "wrong"},
+            {"stdin": "c", "expected_output": "c"},
+            {"stdin": "d", "expected_output": "d", "hidden": True},
+        ]
+        results = await client.run_tests("print(input())", test_cases, fail_fast=True)
+
+        assert calls == ["a", "b"]
+        assert results.passed_count == 1
+        assert results.skipped_count == 2
+        assert [tr.skipped for tr in results.test_results] == [False, False, True, True]
+        assert results.test_results[3].hidden
+        assert results.to_dict()["skipped_count"] == 2
+
+    async def test_timeouts_set_cpu_time_limit(self, monkeypatch):
+        client = Judge0Client(max_execution_time=10.0, batch_submissions=False)
+        limits = {}
+
+        async def fake_execute_and_wait(
+            source_code, stdin="", data_files=None, cpu_time_limit=None
+        ):
+            limits[stdin] = cpu_time_limit
+            return accepted(stdin)
+
+        monkeypatch.setattr(client, "execute_and_wait", fake_execute_and_wait)
+        test_cases = [
+            {"stdin": "lesson", "expected_output": "lesson"},
+            {"stdin": "case", "expected_output": "case", "timeout": 1.5},
+        ]
+        results = await client.run_tests("print(input())", test_cases, timeout=3.0)
+
+        assert limits == {"lesson": 3.0, "case": 1.5}
+        assert [tr.timeout for tr in results.test_results] == [3.0, 1.5]
+
+
+class TestConnectionPooling:
+    """Tests for the pooled HTTP client."""
+
+    async def test_requests_reuse_one_connection(self):
+        async with FakeJudge0(processing_polls=2) as judge0:
+            client = Judge0Client(base_url=judge0.url)
+            try:
+                for stdin in ("a", "b", "c"):
+                    result = await client.execute_and_wait(
+                        "print(input())", stdin, poll_interval=0.01
+                    )
+                    assert result.stdout == stdin
+            finally:
+                await client.close()
+
+        # 3 submits and 9 polls over a single keep-alive connection
+        assert len(judge0.requests) == 12
+        assert judge0.connections == 1
+
+    async def test_close_opens_a_new_client_on_next_use(self):
+        async with FakeJudge0() as judge0:
+            async with Judge0Client(base_url=judge0.url) as client:
+                first = client._http()
+                assert client._http() is first
+            assert first.is_closed
+
+            await client.submit_code("print(1)")
+            assert client._http() is not first
+            await client.close()
+
+    def test_http2_needs_h2(self, monkeypatch):
+        monkeypatch.setattr(judge0_client, "HTTP2_AVAILABLE", False)
+        assert not Judge0Client(http2=True).http2
+        monkeypatch.setattr(judge0_client, "HTTP2_AVAILABLE", True)
+        monkeypatch.setenv("JUDGE0_HTTP2", "0")
+        assert not Judge0Client().http2
+
+
+class TestBatchSubmissions:
+    """Tests for running test cases through the batch endpoints."""
+
+    async def test_run_takes_a_handful_of_requests(self):
+        async with FakeJudge0(processing_polls=2, max_batch_size=3) as judge0:
+            async with Judge0Client(base_url=judge0.url, batch_size=3) as client:
+                test_cases = [
+                    {"stdin": str(i), "expected_output": str(i)} for i in range(5)
+                ]
+                test_cases[3]["expected_output"] = "wrong"
+                test_cases.append({"function": "f", "expected_return": 1})
+                results = await client.run_tests("print(input())", test_cases)
+
+        assert results.total_tests == 6
+        assert results.passed_count == 4
+        assert [tr.test_index for tr in results.test_results] == list(range(6))
+        assert results.test_results[3].difference == "Line 1: expected 'wrong', got '3'"
+        assert "local executor" in results.test_results[5].error_message
+        # 2 batch creates, then 3 rounds of 2 batched polls
+        assert judge0.requests.count(("POST", "/submissions/batch")) == 2
+        assert judge0.requests.count(("GET", "/submissions/batch")) == 6
+        assert len(judge0.requests) == 8
+
+    async def test_fail_fast_reports_later_cases_as_not_run(self):
+        async with FakeJudge0() as judge0:
+            async with Judge0Client(base_url=judge0.url) as client:
+                test_cases = [
+                    {"stdin": "a", "expected_output": "a"},
+                    {"stdin": "b", "expected_output": "wrong"},
+                    {"stdin": "c", "expected_output": "c"},
+                ]
+                results = await client.run_tests(
+                    "print(input())", test_cases, fail_fast=True
+                )
+
+        assert [tr.skipped for tr in results.test_results] == [False, False, True]
+        assert results.skipped_count == 1
+
+    async def test_fail_fast_stops_submitting_after_a_failure(self):
+        async with FakeJudge0() as judge0:
+            async with Judge0Client(base_url=judge0.url, max_parallel_tests=2) as client:
+                test_cases = [
+                    {"stdin": str(i), "expected_output": str(i)} for i in range(6)
+                ]
+                test_cases[2]["expected_output"] = "wrong"
+                results = await client.run_tests(
+                    "print(input())", test_cases, fail_fast=True
+                )
+
+        # Two chunks of two reached Judge0; the last two were never sent
+        assert len(judge0.submissions) == 4
+        assert judge0.requests.count(("POST", "/submissions/batch")) == 2
+        assert results.passed_count == 2
+        assert [tr.skipped for tr in results.test_results] == [
+            False, False, False, True, True, True
+        ]
+
+    async def test_request_error_fails_every_case(self):
+        client = Judge0Client(base_url="http://127.0.0.1:9")
+        try:
+            results = await client.run_tests(
+                "print(1)", [{"expected_output": "1"}, {"expected_output": "1"}]
+            )
+        finally:
+            await client.close()
+
+        assert results.passed_count == 0
+        assert all(
+            tr.error_message.startswith("Execution failed") for tr in results.test_results
+        )
+
+    async def test_rejected_submission_fails_only_that_case(self):
+        async with FakeJudge0() as judge0:
+            async with Judge0Client(base_url=judge0.url) as client:
+                payloads = [
+                    client._submission_payload("print(1)"),
+                    {**client._submission_payload("print(1)"), "source_code": ""},
+                ]
+                results = await client.execute_batch_and_wait(payloads, poll_interval=0.01)
+
+        assert results[0].is_accepted
+        assert "rejected" in results[1].error_message
+
+
+class TestPolling:
+    """Tests for waiting on submission results."""
+
+    def test_poll_delays_back_off_to_a_cap(self):
+        client = Judge0Client(poll_initial=0.05, poll_max=2.0, max_execution_time=10.0)
+        delays = client.poll_delays()
+        assert [next(delays) for _ in range(8)] == [
+            0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 2.0, 2.0
+        ]
+        # Short jobs are capped at a quarter of their limit
+        delays = client.poll_delays(1.0)
+        assert [next(delays) for _ in range(5)] == [0.05, 0.1, 0.2, 0.25, 0.25]
+
+    async def test_result_records_polls_and_latency(self):
+        async with FakeJudge0(processing_polls=3) as judge0:
+            async with Judge0Client(
+                base_url=judge0.url, poll_initial=0.01
+            ) as client:
+                result = await client.execute_and_wait("print(input())", "a")
+
+        assert result.stdout == "a"
+        assert result.polls == 4
+        assert 0.07 <= result.latency < 1.0
+        assert client.poll_stats.submissions == 1
+        assert client.poll_stats.mean_polls == 4
+
+    async def test_max_wait_times_out(self):
+        async with FakeJudge0(processing_polls=1000) as judge0:
+            async with Judge0Client(base_url=judge0.url, poll_initial=0.01) as client:
+                result = await client.execute_and_wait("print(1)", max_wait=0.1)
+
+        assert result.status_id == SubmissionStatus.TIME_LIMIT_EXCEEDED
+        assert result.latency < 0.5
+
+    async def test_max_wait_follows_the_time_limit(self):
+        async with FakeJudge0(processing_polls=1000) as judge0:
+            async with Judge0Client(
+                base_url=judge0.url, poll_initial=0.01, result_grace=0.1
+            ) as client:
+                result = await client.execute_and_wait("print(1)", cpu_time_limit=0.2)
+                payloads = [
+                    client._submission_payload("print(1)", cpu_time_limit=limit)
+                    for limit in (0.1, 0.3)
+                ]
+                batch = await client.execute_batch_and_wait(payloads)
+
+        assert result.status_id == SubmissionStatus.TIME_LIMIT_EXCEEDED
+        assert 0.3 <= result.latency < 1.0
+        assert all(r.status_id == SubmissionStatus.TIME_LIMIT_EXCEEDED for r in batch)
+        assert 0.4 <= batch[0].latency < 1.0
+
+    async def test_wait_mode_needs_no_polls(self):
+        async with FakeJudge0(processing_polls=3) as judge0:
+            async with Judge0Client(base_url=judge0.url, wait=True) as client:
+                result = await client.execute_and_wait(
+                    "print(input())", "a", cpu_time_limit=1.0
+                )
+                # Long jobs are still polled
+                await client.execute_and_wait(
+                    "print(input())", "b", cpu_time_limit=5.0, poll_interval=0.01
+                )
+
+        assert result.stdout == "a"
+        assert result.polls == 0
+        assert judge0.requests.count(("GET", "/submissions/token-1")) == 0
+        assert judge0.requests.count(("GET", "/submissions/token-2")) == 4
+
+    async def test_wait_mode_falls_back_when_refused(self):
+        async with FakeJudge0(allow_wait=False) as judge0:
+            async with Judge0Client(
+                base_url=judge0.url, wait=True, max_execution_time=1.0
+            ) as client:
+                result = await client.execute_and_wait("print(input())", "a")
+                assert not client.wait
+                await client.execute_and_wait("print(input())", "b")
+
+        assert result.stdout == "a"
+        assert result.polls == 1
+        # One refused wait, then plain submits
+        assert judge0.requests.count(("POST", "/submissions")) == 3
+
+    def test_wait_from_env(self, monkeypatch):
+        monkeypatch.setenv("JUDGE0_WAIT", "true")
+        monkeypatch.setenv("JUDGE0_POLL_MAX", "0.5")
+        client = Judge0Client()
+        assert client.wait
+        assert client.poll_max == 0.5
+
+
+class TestDataFileZips:
+    """Tests for the cached data-file ZIPs."""
+
+    async def test_zip_is_built_once_per_content(self):
+        data_files = [
+            DataFile(name="data.csv", path="data.csv", content=b"a,b\n1,2\n" * 1000)
+        ]
+        async with FakeJudge0() as judge0:
+            async with Judge0Client(base_url=judge0.url) as client:
+                results = await client.run_tests(
+                    "print(input())",
+                    [{"stdin": str(i), "expected_output": str(i)} for i in range(3)],
+                    data_files=data_files,
+                )
+                await asyncio.gather(
+                    *(
+                        client.submit_code("print(1)", data_files=data_files)
+                        for _ in range(3)
+                    )
+                )
+                # Equal contents in new objects hit the same entry
+                content = bytes(data_files[0].content)
+                copy = [DataFile(name="data.csv", path="data.csv", content=content)]
+                await client.submit_code("print(1)", data_files=copy)
+
+        assert results.all_passed
+        assert client.zips_built == 1
+        encoded = {s["payload"]["additional_files"] for s in judge0.submissions.values()}
+        assert len(encoded) == 1
+        with zipfile.ZipFile(io.BytesIO(base64.b64decode(encoded.pop()))) as zf:
+            assert zf.read("data.csv") == data_files[0].content
+
+    async def test_concurrent_submissions_share_one_build(self):
+        client = Judge0Client()
+        data_files = [DataFile(name="data.csv", path="data.csv", content=b"x" * 1000)]
+        zips = await asyncio.gather(
+            *(client.additional_files_zip(data_files) for _ in range(5))
+        )
+
+        assert len(set(zips)) == 1
+        assert client.zips_built == 1
+
+    async def test_cache_is_bounded(self):
+        client = Judge0Client(zip_cache_mb=1)
+        for i in range(4):
+            # Random bytes do not compress, so each ZIP is about 400 KB
+            await client.additional_files_zip(
+                [DataFile(name=f"{i}.bin", path=f"{i}.bin", content=os.urandom(300_000))]
+            )
+
+        assert len(client._zips) == 2
+        assert client._zip_bytes <= client.zip_cache_bytes
+        empty = [DataFile(name="empty.txt", path="empty.txt")]
+        assert await client.additional_files_zip(empty) is None
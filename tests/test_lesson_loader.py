@@ -178,3 +178,120 @@ class TestLessonLoaderExternalInstructions:
             assert loaded_lesson is not None
             assert "External Instructions" in loaded_lesson.instructions
             assert "loaded from a file" in loaded_lesson.instructions
+
+
+class TestLessonLoaderFailFast:
+    """Tests for the per-lesson fail_fast option."""
+
+    def test_fail_fast_option(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            module_dir = Path(tmpdir) / "test_module"
+            module_dir.mkdir()
+            with open(module_dir / "strict.yaml", "w") as f:
+                yaml.dump({"title": "Strict", "fail_fast": True}, f)
+            with open(module_dir / "default.yaml", "w") as f:
+                yaml.dump({"title": "Default"}, f)
+
+            loader = LessonLoader(tmpdir)
+
+            assert loader.get_lesson("test_module", "strict").fail_fast is True
+            assert loader.get_lesson("test_module", "default").fail_fast is None
+
+
+class TestLessonLoaderTimeouts:
+    """Tests for lesson and test case time limits."""
+
+    def test_timeout_fields(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            module_dir = Path(tmpdir) / "test_module"
+            module_dir.mkdir()
+            with open(module_dir / "slow.yaml", "w") as f:
+                yaml.dump(
+                    {
+                        "title": "Slow",
+                        "timeout": 30,
+                        "test_cases": [
+                            {"stdin": "", "expected_output": "a"},
+                            {"stdin": "", "expected_output": "b", "timeout": 2.5},
+                        ],
+                    },
+                    f,
+                )
+            with open(module_dir / "default.yaml", "w") as f:
+                yaml.dump({"title": "Default", "timeout": "soon"}, f)
+
+            loader = LessonLoader(tmpdir)
+            slow = loader.get_lesson("test_module", "slow")
+
+            assert slow.timeout == 30.0
+            assert [tc.timeout for tc in slow.test_cases] == [None, 2.5]
+            # Values that aren't positive numbers leave the default in place
+            assert loader.get_lesson("test_module", "default").timeout is None
+
+
+class TestLessonLoaderFunctionCalls:
+    """Tests for function-call test cases."""
+
+    def test_function_call_cases(self, capsys):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            module_dir = Path(tmpdir) / "test_module"
+            module_dir.mkdir()
+            with open(module_dir / "functions.yaml", "w") as f:
+                yaml.dump(
+                    {
+                        "title": "Functions",
+                        "test_cases": [
+                            {"function": "add", "args": [2, 3], "expected_return": 5},
+                            {"function": "square", "args": 4, "expected_return": 16},
+                            {"function": "not valid", "expected_return": 1},
+                            {"stdin": "1", "expected_output": "1"},
+                        ],
+                    },
+                    f,
+                )
+
+            loader = LessonLoader(tmpdir)
+            cases = loader.get_lesson("test_module", "functions").test_cases
+
+        assert [(tc.function, tc.args, tc.expected_return) for tc in cases] == [
+            ("add", [2, 3], 5),
+            # A single argument does not need a list
+            ("square", [4], 16),
+            ("", [], None),
+        ]
+        assert "invalid function name" in capsys.readouterr().out
+
+
+class TestLessonLoaderCompareModes:
+    """Tests for the output matching settings of test cases."""
+
+    def test_compare_modes(self, capsys):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            module_dir = Path(tmpdir) / "test_module"
+            module_dir.mkdir()
+            with open(module_dir / "matching.yaml", "w") as f:
+                yaml.dump(
+                    {
+                        "title": "Matching",
+                        "test_cases": [
+                            {"expected_output": "1"},
+                            {"expected_output": "0.5", "compare": "float", "tolerance": 0.1},
+                            {"expected_output": "a", "compare": "fuzzy"},
+                            {"expected_output": "(", "compare": "regex"},
+                            {"expected_output": "1", "compare": "float", "tolerance": -1},
+                        ],
+                    },
+                    f,
+                )
+
+            loader = LessonLoader(tmpdir)
+            cases = loader.get_lesson("test_module", "matching").test_cases
+
+        assert [(tc.compare, tc.tolerance) for tc in cases] == [
+            ("exact", None),
+            ("float", 0.1),
+        ]
+        output = capsys.readouterr().out
+        assert "Unknown compare mode" in output
+        assert "Invalid pattern" in output
+        assert "invalid tolerance" in output
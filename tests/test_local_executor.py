@@ -1,5 +1,7 @@
 """Tests for the local Python executor."""
 
+import os
+
 import pytest
 
 from pyshala.models.lesson import DataFile
@@ -9,6 +11,10 @@ from pyshala.services.local_executor import (
     TestResult,
     TestRunResults,
 )
+from pyshala.services.limits import ResourceLimits
+from pyshala.services.result_cache import ResultCache
+from pyshala.services.runtime_stats import RuntimeStats
+from pyshala.services.scheduler import ExecutionScheduler
 
 
 class TestExecutionResult:
@@ -113,6 +119,19 @@ class TestRunTests:
         results = await executor.run_tests(code, test_cases)
         assert results.all_passed
 
+    async def test_compare_modes(self, executor):
+        code = "print('b')\nprint('a  1.0000001')"
+        test_cases = [
+            {"expected_output": "a 1\nb", "compare": "unordered"},
+            {"expected_output": "b\na 1", "compare": "float"},
+            {"expected_output": "b\na 2", "compare": "float"},
+        ]
+        results = await executor.run_tests(code, test_cases)
+
+        assert [tr.passed for tr in results.test_results] == [False, True, False]
+        assert results.test_results[0].difference == "Line 2: unexpected line 'a  1.0000001'"
+        assert results.test_results[2].difference == "Line 2: expected 'a 2', got 'a 1.0000001'"
+
     async def test_hidden_test_case(self, executor):
         code = "print(input())"
         test_cases = [
@@ -157,3 +176,985 @@ with open('test.txt', 'rb') as f:
         result = await executor.execute(code, data_files=data_files)
         assert result.is_success
         assert result.stdout.strip() == "hello world"
+
+
+class TestZygoteMode:
+    """Tests for executions forked from the zygote process."""
+
+    @pytest.fixture
+    async def executor(self):
+        executor = LocalExecutor(
+            timeout=5.0, use_zygote=True, preload_modules=["decimal"]
+        )
+        yield executor
+        await executor.close()
+
+    async def test_simple_execution(self, executor):
+        result = await executor.execute("print('hello')")
+        assert result.is_success
+        assert result.stdout.strip() == "hello"
+
+    async def test_execution_with_stdin(self, executor):
+        code = "name = input()\nprint(f'Hello, {name}!')"
+        result = await executor.execute(code, stdin="World")
+        assert result.stdout.strip() == "Hello, World!"
+
+    async def test_preloaded_module_is_imported(self, executor):
+        result = await executor.execute("import sys\nprint('decimal' in sys.modules)")
+        assert result.stdout.strip() == "True"
+
+    async def test_runs_as_main(self, executor):
+        code = "if __name__ == '__main__':\n    print('main')"
+        result = await executor.execute(code)
+        assert result.stdout.strip() == "main"
+
+    async def test_runtime_error(self, executor):
+        result = await executor.execute("raise ValueError('test error')")
+        assert result.return_code == 1
+        assert "ValueError: test error" in result.stderr
+        assert "zygote" not in result.stderr
+
+    async def test_syntax_error(self, executor):
+        result = await executor.execute("print('hello'")
+        assert not result.is_success
+        assert "SyntaxError" in result.stderr
+
+    async def test_exit_code(self, executor):
+        result = await executor.execute("import sys\nsys.exit(3)")
+        assert result.return_code == 3
+
+    async def test_timeout(self):
+        executor = LocalExecutor(timeout=0.5, use_zygote=True)
+        try:
+            result = await executor.execute("import time; time.sleep(10)")
+            assert result.timed_out
+        finally:
+            await executor.close()
+
+    async def test_with_data_file(self, executor):
+        data_files = [DataFile(name="test.txt", path="test.txt", content=b"hello world")]
+        result = await executor.execute(
+            "print(open('test.txt').read())", data_files=data_files
+        )
+        assert result.stdout.strip() == "hello world"
+
+    async def test_run_tests(self, executor):
+        test_cases = [
+            {"stdin": "hello", "expected_output": "hello"},
+            {"stdin": "world", "expected_output": "world"},
+        ]
+        results = await executor.run_tests("print(input())", test_cases)
+        assert results.all_passed
+
+
+class TestBatchMode:
+    """Tests for running all test cases in one harness process."""
+
+    @pytest.fixture
+    def executor(self):
+        return LocalExecutor(timeout=5.0, batch_tests=True)
+
+    async def test_matches_per_process_results(self, executor):
+        code = (
+            "import sys\n"
+            "x = input()\n"
+            "if x == 'err':\n"
+            "    raise ValueError('bad')\n"
+            "if x == 'exit':\n"
+            "    sys.exit(2)\n"
+            "print(x * 2)\n"
+        )
+        stdins = ["ab", "err", "exit", "c", ""]
+        batched = await executor.execute_batch(code, stdins)
+        isolated = [
+            await LocalExecutor(timeout=5.0).execute(code, stdin=s) for s in stdins
+        ]
+        for b, i in zip(batched, isolated):
+            assert b.stdout == i.stdout
+            assert b.return_code == i.return_code
+            assert b.timed_out == i.timed_out
+            assert b.stderr.splitlines()[-1:] == i.stderr.splitlines()[-1:]
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            # Binary standard streams
+            "import sys\ndata = sys.stdin.buffer.read()\n"
+            "sys.stdout.buffer.write(data.upper())\nprint(len(data))",
+            # Output written to the file descriptor directly
+            "import os\nos.write(1, (input() + '\\n').encode())",
+            "import subprocess\nsubprocess.run(['echo', input()])",
+            "import sys\nprint(sys.stdout.fileno(), input())",
+            # Files left behind by an earlier case
+            "import os\nprint(os.path.exists('out.txt'))\n"
+            "open('out.txt', 'w').write(input())",
+            "import os\nos.makedirs('d/e', exist_ok=True)\nprint(os.listdir('.'))",
+            # Data files changed by an earlier case
+            "print(open('data.csv').read(), end='')\n"
+            "open('data.csv', 'a').write(input() + '\\n')",
+        ],
+    )
+    async def test_matches_per_process_side_effects(self, executor, code):
+        data_files = [DataFile(name="data.csv", path="data.csv", content=b"a,b\n")]
+        stdins = ["first", "second", "third"]
+        batched = await executor.execute_batch(code, stdins, data_files=data_files)
+        isolated = [
+            await LocalExecutor(timeout=5.0).execute(
+                code, stdin=s, data_files=data_files
+            )
+            for s in stdins
+        ]
+        for b, i in zip(batched, isolated):
+            assert (b.stdout, b.stderr, b.return_code) == (
+                i.stdout, i.stderr, i.return_code
+            )
+
+    async def test_clean_cases_stay_in_one_process(self, executor, monkeypatch):
+        isolated = []
+        execute = executor.execute
+
+        async def counting_execute(*args, **kwargs):
+            isolated.append(kwargs.get("stdin"))
+            return await execute(*args, **kwargs)
+
+        monkeypatch.setattr(executor, "execute", counting_execute)
+        code = "open('scratch.txt', 'w').write(input())\nprint(open('scratch.txt').read())"
+        results = await executor.execute_batch(code, ["a", "b", "c"])
+
+        assert [r.stdout for r in results] == ["a\n", "b\n", "c\n"]
+        assert isolated == []
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            # Module and builtins state changed by an earlier case
+            "import string\nstring.count = getattr(string, 'count', 0) + 1\n"
+            "print(string.count, input())",
+            "import builtins\nbuiltins.n = getattr(builtins, 'n', 0) + 1\n"
+            "print(n, input())",
+            # Output written while the interpreter exits
+            "import atexit\natexit.register(print, 'bye')\nprint(input())",
+            "import threading, time\n"
+            "threading.Thread(target=lambda: (time.sleep(0.1), print('late'))).start()\n"
+            "print(input())",
+        ],
+    )
+    async def test_cases_are_isolated_in_one_harness(self, executor, monkeypatch, code):
+        isolated = []
+        execute = executor.execute
+
+        async def counting_execute(*args, **kwargs):
+            isolated.append(kwargs.get("stdin"))
+            return await execute(*args, **kwargs)
+
+        monkeypatch.setattr(executor, "execute", counting_execute)
+        stdins = ["a", "b", "c"]
+        batched = await executor.execute_batch(code, stdins)
+        expected = [
+            await LocalExecutor(timeout=5.0).execute(code, stdin=s) for s in stdins
+        ]
+        assert [(r.stdout, r.return_code) for r in batched] == [
+            (r.stdout, r.return_code) for r in expected
+        ]
+        assert isolated == []
+
+    async def test_fresh_namespace_per_case(self, executor):
+        code = "try:\n    seen\nexcept NameError:\n    seen = True\n    print('fresh')"
+        results = await executor.execute_batch(code, ["", ""])
+        assert [r.stdout for r in results] == ["fresh\n", "fresh\n"]
+
+    async def test_per_case_timeout(self):
+        executor = LocalExecutor(timeout=0.5, batch_tests=True)
+        code = "import time\nif input() == 'slow':\n    time.sleep(10)\nprint('done')"
+        results = await executor.execute_batch(code, ["slow", "fast"])
+        assert results[0].timed_out
+        assert results[1].stdout == "done\n"
+
+    async def test_falls_back_when_harness_crashes(self, executor):
+        code = "import os\nx = input()\nif x == 'crash':\n    os._exit(0)\nprint(x)"
+        results = await executor.execute_batch(code, ["a", "crash", "b"])
+        assert [r.stdout for r in results] == ["a\n", "", "b\n"]
+        assert all(r.is_success for r in results)
+
+    async def test_run_tests(self, executor):
+        test_cases = [
+            {"stdin": "hello", "expected_output": "hello"},
+            {"stdin": "world", "expected_output": "nope"},
+        ]
+        results = await executor.run_tests("print(input())", test_cases)
+        assert results.passed_count == 1
+        assert results.test_results[1].actual_output == "world\n"
+
+
+class TestParallelTests:
+    """Tests for running test cases of one submission concurrently."""
+
+    async def test_cases_run_concurrently(self):
+        import time
+
+        executor = LocalExecutor(
+            timeout=5.0,
+            max_parallel_tests=4,
+            scheduler=ExecutionScheduler(max_concurrent=4),
+        )
+        code = "import time\ntime.sleep(0.5)\nprint(input())"
+        test_cases = [
+            {"stdin": str(i), "expected_output": str(i)} for i in range(4)
+        ]
+        start = time.monotonic()
+        results = await executor.run_tests(code, test_cases)
+        elapsed = time.monotonic() - start
+
+        assert results.all_passed
+        assert elapsed < 1.5
+        assert [tr.test_index for tr in results.test_results] == [0, 1, 2, 3]
+
+    async def test_results_keep_test_order(self):
+        executor = LocalExecutor(timeout=5.0, max_parallel_tests=2)
+        # Earlier cases finish last
+        code = "import time\nn = int(input())\ntime.sleep(n / 10)\nprint(n)"
+        test_cases = [
+            {"stdin": str(n), "expected_output": str(n)} for n in (3, 2, 1, 0)
+        ]
+        results = await executor.run_tests(code, test_cases)
+        assert [tr.actual_output.strip() for tr in results.test_results] == [
+            "3", "2", "1", "0"
+        ]
+
+
+class TestResultCaching:
+    """Tests for serving repeated executions from the result cache."""
+
+    @pytest.fixture
+    def executor(self):
+        return LocalExecutor(timeout=5.0, cache=ResultCache())
+
+    async def test_identical_execution_is_served_from_cache(self, executor):
+        first = await executor.execute("print(input())", stdin="hi")
+        second = await executor.execute("print(input())", stdin="hi")
+
+        assert second == first
+        assert executor.cache.stats()["hits"] == 1
+
+    async def test_different_stdin_misses(self, executor):
+        await executor.execute("print(input())", stdin="a")
+        result = await executor.execute("print(input())", stdin="b")
+
+        assert result.stdout == "b\n"
+        assert executor.cache.stats()["hits"] == 0
+
+    async def test_data_file_contents_are_part_of_key(self, executor):
+        code = "print(open('d.txt').read())"
+        first = [DataFile(name="d.txt", path="d.txt", content=b"one")]
+        second = [DataFile(name="d.txt", path="d.txt", content=b"two")]
+        await executor.execute(code, data_files=first)
+        result = await executor.execute(code, data_files=second)
+
+        assert result.stdout.strip() == "two"
+
+    async def test_timeouts_are_not_cached(self):
+        executor = LocalExecutor(timeout=0.3, cache=ResultCache())
+        await executor.execute("while True: pass")
+        await executor.execute("while True: pass")
+
+        assert executor.cache.stats()["entries"] == 0
+
+    async def test_nondeterministic_code_is_not_cached(self, executor):
+        await executor.execute("import random\nprint(random.random())")
+        await executor.execute("import random\nprint(random.random())")
+
+        assert executor.cache.stats() == {
+            "hits": 0, "misses": 0, "entries": 0, "hit_rate": 0.0,
+            "disk_bytes": None, "disk_evictions": 0,
+        }
+
+    async def test_output_with_object_addresses_is_not_cached(self, executor):
+        code = "class Point:\n    pass\nprint(Point())"
+        await executor.execute(code)
+        await executor.execute(code)
+
+        assert executor.cache.stats()["entries"] == 0
+
+    @pytest.mark.parametrize(
+        "options",
+        [{}, {"use_zygote": True}, {"batch_tests": True}],
+        ids=["subprocess", "zygote", "batch"],
+    )
+    async def test_set_order_does_not_change_between_runs(self, options):
+        # Uncached, so every run below really executes the code
+        executor = LocalExecutor(
+            timeout=5.0, cache=ResultCache(max_entries=0), **options
+        )
+        code = "print(list({'apple', 'banana', 'cherry', 'date', 'elder'}))"
+        try:
+            outputs = {
+                result.stdout
+                for result in await executor.execute_batch(code, [""] * 4)
+            }
+            outputs.add((await executor.execute(code)).stdout)
+        finally:
+            await executor.close()
+
+        assert len(outputs) == 1
+
+    async def test_batch_mode_uses_cache(self):
+        executor = LocalExecutor(timeout=5.0, batch_tests=True, cache=ResultCache())
+        await executor.execute_batch("print(input())", ["a", "b"])
+        results = await executor.execute_batch("print(input())", ["b", "c"])
+
+        assert [r.stdout for r in results] == ["b\n", "c\n"]
+        assert executor.cache.stats()["hits"] == 1
+
+
+class TestResourceLimits:
+    """Tests for rlimits and resource usage accounting."""
+
+    MEMORY_HOG = "data = bytearray(512 * 1024 * 1024)\nprint('allocated')"
+    FILE_HOG = "open('big.bin', 'wb').write(b'x' * 4 * 1024 * 1024)\nprint('written')"
+
+    @pytest.fixture(params=["subprocess", "zygote"])
+    async def executor(self, request):
+        executor = LocalExecutor(
+            timeout=5.0,
+            use_zygote=request.param == "zygote",
+            limits=ResourceLimits(address_space_mb=256, cpu_seconds=1, file_size_mb=1),
+        )
+        yield executor
+        await executor.close()
+
+    async def test_usage_is_reported(self, executor):
+        result = await executor.execute("print(sum(range(10**6)))")
+        assert result.is_success
+        assert result.time is not None and result.time > 0
+        assert result.memory is not None and result.memory > 1024
+        assert result.wall_time is not None and result.wall_time > 0
+
+    async def test_memory_limit(self, executor):
+        result = await executor.execute(self.MEMORY_HOG)
+        assert not result.is_success
+        assert "MemoryError" in result.stderr
+
+    async def test_file_size_limit(self, executor):
+        result = await executor.execute(self.FILE_HOG)
+        assert not result.is_success
+        assert "File too large" in result.stderr
+
+    async def test_cpu_limit(self, executor):
+        result = await executor.execute("while True: pass")
+        assert not result.timed_out
+        assert result.error_message == "CPU time limit exceeded"
+
+    async def test_limits_are_set_before_student_code_runs(self, executor, monkeypatch):
+        import resource
+
+        # Limits must be in place in the child before it starts the
+        # script, not set on it from the parent afterwards
+        def no_prlimit(*args):
+            raise AssertionError("limits applied from the parent")
+
+        monkeypatch.setattr(resource, "prlimit", no_prlimit)
+        code = (
+            "import resource\n"
+            "print(resource.getrlimit(resource.RLIMIT_AS)[0] // 2**20)\n"
+            "print(resource.getrlimit(resource.RLIMIT_FSIZE)[0] // 2**20)"
+        )
+        result = await executor.execute(code)
+        assert result.stdout == "256\n1\n"
+
+        batch = LocalExecutor(timeout=5.0, batch_tests=True, limits=executor.limits)
+        results = await batch.execute_batch(code, ["", ""])
+        assert [r.stdout for r in results] == ["256\n1\n"] * 2
+
+    async def test_usage_reaches_test_results(self, executor):
+        results = await executor.run_tests(
+            "print(input())", [{"stdin": "a", "expected_output": "a"}]
+        )
+        test_result = results.test_results[0]
+        assert test_result.execution_time is not None
+        assert test_result.memory_used is not None
+
+    def test_execution_user_is_resolved(self, monkeypatch):
+        import pwd
+
+        from pyshala.services.limits import execution_user
+
+        root = pwd.getpwuid(0)
+        assert execution_user(root.pw_name) == (0, root.pw_gid)
+        assert execution_user("54321") == (54321, 54321)
+        assert execution_user("") == (0, 0)
+        with pytest.raises(ValueError, match="no-such-user"):
+            execution_user("no-such-user")
+        monkeypatch.setenv("EXECUTION_USER", "54321")
+        assert ResourceLimits.from_env(5.0).uid == 54321
+
+    async def test_batch_mode_reports_usage_and_limits(self):
+        executor = LocalExecutor(
+            timeout=5.0,
+            batch_tests=True,
+            limits=ResourceLimits(address_space_mb=256, cpu_seconds=2),
+        )
+        results = await executor.execute_batch(self.MEMORY_HOG, ["", ""])
+        assert all("MemoryError" in r.stderr for r in results)
+        assert all(r.time is not None and r.memory for r in results)
+
+
+class TestTimeouts:
+    """Tests for lesson and test case time limits."""
+
+    SLEEPY = "import time\ntime.sleep(float(input()))\nprint('done')"
+
+    @pytest.fixture(params=["subprocess", "batch"])
+    async def executor(self, request, monkeypatch):
+        monkeypatch.delenv("EXECUTION_CPU_LIMIT", raising=False)
+        executor = LocalExecutor(
+            timeout=10.0,
+            batch_tests=request.param == "batch",
+            cache=ResultCache(max_entries=0),
+        )
+        yield executor
+        await executor.close()
+
+    async def test_per_test_case_timeout(self, executor):
+        results = await executor.run_tests(
+            self.SLEEPY,
+            [
+                {"stdin": "0", "expected_output": "done"},
+                {"stdin": "5", "expected_output": "done", "timeout": 0.5},
+            ],
+        )
+
+        first, second = results.test_results
+        assert first.passed and first.timeout == 10.0
+        assert not second.passed and second.timeout == 0.5
+        assert second.error_message == "Execution timed out"
+        assert second.wall_time < 3
+
+    async def test_lesson_timeout_applies_to_cases_without_their_own(self, executor):
+        results = await executor.run_tests(
+            self.SLEEPY,
+            [
+                {"stdin": "5", "expected_output": "done"},
+                {"stdin": "1", "expected_output": "done", "timeout": 5},
+            ],
+            timeout=0.5,
+        )
+
+        first, second = results.test_results
+        assert first.error_message == "Execution timed out"
+        assert second.passed
+
+    async def test_cpu_limit_follows_timeout(self, executor):
+        assert executor._limits_for(30.0).cpu_seconds == 31
+        assert executor._limits_for(0.5).cpu_seconds == 2
+
+    def test_explicit_cpu_limit_is_kept(self, monkeypatch):
+        monkeypatch.setenv("EXECUTION_CPU_LIMIT", "3")
+        executor = LocalExecutor(timeout=10.0)
+        assert executor._limits_for(30.0).cpu_seconds == 3
+
+
+class TestFunctionCalls:
+    """Tests for function-call test cases."""
+
+    SOURCE = (
+        "import time\n"
+        "calls = []\n"
+        "def count():\n"
+        "    calls.append(1)\n"
+        "    return len(calls)\n"
+        "def pair(a, b=0.1):\n"
+        "    return (a, b + 0.2)\n"
+        "def boom():\n"
+        "    return 1 / 0\n"
+        "def spin():\n"
+        "    while True:\n"
+        "        pass\n"
+        "def crash():\n"
+        "    import os\n"
+        "    os._exit(3)\n"
+        "if __name__ == '__main__':\n"
+        "    print(input())\n"
+    )
+
+    @pytest.fixture(params=["file", "memory"])
+    async def executor(self, request):
+        if request.param == "memory" and not hasattr(os, "memfd_create"):
+            pytest.skip("Needs memfd_create")
+        executor = LocalExecutor(
+            timeout=5.0,
+            cache=ResultCache(max_entries=0),
+            script_delivery=request.param,
+        )
+        yield executor
+        await executor.close()
+
+    @staticmethod
+    def call(function, *args, expected=None, **extra):
+        return {
+            "function": function,
+            "args": list(args),
+            "expected_return": expected,
+            **extra,
+        }
+
+    async def test_calls_share_one_import(self, executor):
+        results = await executor.run_tests(
+            self.SOURCE,
+            [self.call("count", expected=n) for n in (1, 2, 3)],
+        )
+
+        assert results.all_passed
+        first = results.test_results[0]
+        assert first.call == "count()"
+        assert first.actual_output == "1"
+
+    async def test_return_values(self, executor):
+        results = await executor.run_tests(
+            self.SOURCE,
+            [
+                # Tuples match lists, floats match within a tolerance
+                self.call("pair", 1, expected=[1, 0.3]),
+                self.call("pair", 1, expected=[1, 0.3], kwargs={"b": 1.0}),
+            ],
+        )
+
+        passed, failed = results.test_results
+        assert passed.passed
+        assert not failed.passed
+        assert failed.call == "pair(1, b=1.0)"
+        assert failed.expected_output == "[1, 0.3]"
+        assert failed.actual_output == "(1, 1.2)"
+
+    async def test_values_that_are_not_json_are_compared(self, executor):
+        results = await executor.run_tests(
+            "def f():\n    return {1: 'a', 2: (3, 4)}\ndef g():\n    return object()\n",
+            [
+                self.call("f", expected={1: "a", 2: [3, 4]}),
+                self.call("f", expected={"1": "a", "2": [3, 4]}),
+                self.call("g", expected=None),
+            ],
+        )
+
+        assert [tr.passed for tr in results.test_results] == [True, False, False]
+
+    async def test_expected_values_stay_out_of_the_student_process(self, executor):
+        # Looks through every frame of the harness for the expected value
+        source = (
+            "import sys\n"
+            "def answer():\n"
+            "    frame = sys._getframe(1)\n"
+            "    while frame is not None:\n"
+            "        for value in list(frame.f_locals.values()):\n"
+            "            if isinstance(value, dict) and 'expected' in value:\n"
+            "                return value['expected']\n"
+            "        frame = frame.f_back\n"
+            "    return 'not found'\n"
+        )
+        results = await executor.run_tests(
+            source, [self.call("answer", expected=41), self.call("answer", expected=42)]
+        )
+
+        assert not any(tr.passed for tr in results.test_results)
+        assert results.test_results[0].actual_output == "'not found'"
+
+    async def test_failures_are_isolated_per_call(self, executor):
+        results = await executor.run_tests(
+            self.SOURCE,
+            [
+                self.call("boom", expected=1),
+                self.call("spin", timeout=0.5),
+                self.call("missing"),
+                self.call("crash"),
+                self.call("count", expected=1),
+            ],
+        )
+
+        boom, spin, missing, crash, count = results.test_results
+        assert "ZeroDivisionError" in boom.error_message
+        assert 'File "' in boom.error_message and "batch_harness" not in boom.error_message
+        assert spin.error_message == "Execution timed out"
+        assert spin.timeout == 0.5
+        assert "NameError" in missing.error_message
+        assert not crash.passed
+        # Calls after a crash run in a fresh process
+        assert count.passed
+
+    async def test_mixed_with_stdin_cases(self, executor):
+        results = await executor.run_tests(
+            self.SOURCE,
+            [
+                self.call("count", expected=1),
+                {"stdin": "hi", "expected_output": "hi"},
+            ],
+        )
+
+        assert results.all_passed
+        assert results.test_results[1].call == ""
+
+    async def test_fail_fast(self, executor):
+        results = await executor.run_tests(
+            self.SOURCE,
+            [
+                self.call("count", expected=1),
+                self.call("count", expected=5),
+                self.call("count", expected=3),
+            ],
+            fail_fast=True,
+        )
+
+        assert [tr.passed for tr in results.test_results] == [True, False, False]
+        assert results.test_results[2].skipped
+        assert results.test_results[2].call == "count()"
+
+    async def test_import_error_fails_every_call(self, executor):
+        results = await executor.run_tests(
+            "raise ValueError('bad module')\ndef f():\n    return 1\n",
+            [self.call("f", expected=1), self.call("f", expected=1)],
+        )
+
+        assert all("bad module" in tr.error_message for tr in results.test_results)
+
+
+class TestRuntimeEstimates:
+    """Tests for recording runtimes and queueing by expected runtime."""
+
+    @pytest.mark.parametrize("batch", [False, True])
+    async def test_records_runtimes_and_passes_estimates(self, batch):
+        expected: list[float] = []
+
+        class RecordingScheduler(ExecutionScheduler):
+            async def acquire(self, session_id="", expected_runtime=0.0):
+                expected.append(expected_runtime)
+                await super().acquire(session_id, expected_runtime)
+
+        stats = RuntimeStats(path="")
+        executor = LocalExecutor(
+            batch_tests=batch,
+            scheduler=RecordingScheduler(max_concurrent=1),
+            cache=ResultCache(max_entries=0),
+            runtime_stats=stats,
+        )
+        test_cases = [
+            {"stdin": "1", "expected_output": "1"},
+            {"stdin": "2", "expected_output": "2"},
+        ]
+
+        await executor.run_tests("print(input())", test_cases, lesson="m/echo")
+        entry = stats.get("m/echo")
+        assert entry.runs == 2
+        assert expected and all(value == 0.0 for value in expected)
+
+        expected.clear()
+        estimate = stats.estimate("m/echo")
+        assert estimate > 0
+        await executor.run_tests("print(input())", test_cases, lesson="m/echo")
+        assert expected == ([estimate * 2] if batch else [estimate, estimate])
+
+
+@pytest.mark.skipif(not hasattr(os, "memfd_create"), reason="Needs memfd_create")
+class TestScriptDelivery:
+    """Tests for handing the script over in memory."""
+
+    SOURCE = (
+        "import os, sys, helper\n"
+        "print(os.path.basename(__file__), os.path.basename(sys.argv[0]))\n"
+        "print(sorted(os.listdir('.')))\n"
+        "print(helper.VALUE, input())\n"
+    )
+    DATA_FILES = [DataFile(name="helper.py", path="helper.py", content=b"VALUE = 42\n")]
+
+    @pytest.fixture(params=["subprocess", "zygote", "batch"])
+    async def executor(self, request):
+        executor = LocalExecutor(
+            timeout=5.0,
+            use_zygote=request.param == "zygote",
+            batch_tests=request.param == "batch",
+            cache=ResultCache(max_entries=0),
+            script_delivery="memory",
+        )
+        yield executor
+        await executor.close()
+
+    async def test_behaves_like_a_script_file(self, executor):
+        results = await executor.run_tests(
+            self.SOURCE,
+            [
+                {"stdin": "a", "expected_output": "script.py script.py\n['helper.py']\n42 a"},
+                {"stdin": "b", "expected_output": "script.py script.py\n['helper.py']\n42 b"},
+            ],
+            data_files=self.DATA_FILES,
+        )
+        assert results.all_passed, results.test_results[0].actual_output
+
+    async def test_traceback_points_at_script(self, executor):
+        results = await executor.run_tests(
+            "x = 1\nraise ValueError('boom')\n",
+            [{"stdin": "", "expected_output": ""}, {"stdin": "", "expected_output": ""}],
+        )
+        error = results.test_results[0].error_message
+        assert 'script.py", line 2' in error
+        assert "ValueError: boom" in error
+        assert "script_runner" not in error
+        assert "zygote_server" not in error
+
+    async def test_exit_code(self, executor):
+        result = await executor.execute("import sys\nprint('bye')\nsys.exit(3)")
+        assert result.stdout == "bye\n"
+        assert result.return_code == 3
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            LocalExecutor(script_delivery="carrier-pigeon")
+
+
+class TestOutputLimit:
+    """Tests for the stdout/stderr size cap."""
+
+    FLOOD = "while True:\n    print('x' * 1000)"
+
+    @pytest.fixture(params=["subprocess", "zygote"])
+    async def executor(self, request):
+        executor = LocalExecutor(
+            timeout=5.0,
+            use_zygote=request.param == "zygote",
+            max_output_bytes=10_000,
+        )
+        yield executor
+        await executor.close()
+
+    async def test_flood_is_stopped(self, executor):
+        result = await executor.execute(self.FLOOD)
+        assert result.truncated
+        assert not result.timed_out
+        assert len(result.stdout) == 10_000
+        assert result.error_message == "Output limit exceeded"
+
+    async def test_stderr_flood_is_stopped(self, executor):
+        result = await executor.execute(
+            "import sys\nwhile True:\n    sys.stderr.write('x' * 1000)"
+        )
+        assert result.truncated
+        assert len(result.stderr) == 10_000
+
+    async def test_output_within_limit_is_untouched(self, executor):
+        result = await executor.execute("print('x' * 9000)")
+        assert result.is_success
+        assert not result.truncated
+
+    async def test_batch_mode(self):
+        executor = LocalExecutor(timeout=5.0, batch_tests=True, max_output_bytes=10_000)
+        results = await executor.run_tests(
+            self.FLOOD,
+            [{"expected_output": "x"}, {"expected_output": "x"}],
+        )
+        for test_result in results.test_results:
+            assert not test_result.passed
+            assert test_result.output_truncated
+            assert len(test_result.actual_output) == 10_000
+
+
+class TestEarlyKill:
+    """Tests for stopping test cases whose output can no longer match."""
+
+    WRONG_LOOP = "while True:\n    print('wrong')"
+
+    @pytest.fixture(params=["subprocess", "zygote", "batch"])
+    async def executor(self, request):
+        executor = LocalExecutor(
+            timeout=5.0,
+            use_zygote=request.param == "zygote",
+            batch_tests=request.param == "batch",
+            early_kill=True,
+        )
+        yield executor
+        await executor.close()
+
+    async def test_wrong_infinite_loop_fails_fast(self, executor):
+        test_cases = [
+            {"expected_output": "right"},
+            {"expected_output": "right"},
+        ]
+        results = await executor.run_tests(self.WRONG_LOOP, test_cases)
+
+        for test_result in results.test_results:
+            assert not test_result.passed
+            assert test_result.error_message.startswith("Stopped early")
+            assert test_result.execution_time < 2.0
+
+    async def test_endless_trailing_output_is_stopped(self, executor):
+        code = "print('right')\nwhile True:\n    print()"
+        results = await executor.run_tests(
+            code, [{"expected_output": "right"}, {"expected_output": "right"}]
+        )
+        assert not results.all_passed
+        assert all(tr.error_message.startswith("Stopped early") for tr in results.test_results)
+
+    async def test_lenient_compare_modes_fail_fast(self, executor):
+        test_cases = [{"expected_output": "right", "compare": "whitespace"}]
+        results = await executor.run_tests(self.WRONG_LOOP, test_cases)
+
+        test_result = results.test_results[0]
+        assert not test_result.passed
+        assert test_result.execution_time < 2.0
+        assert test_result.difference == "Line 1: expected 'right', got 'wrong'"
+
+    async def test_batch_mode_stops_sleeping_cases_in_every_compare_mode(self):
+        executor = LocalExecutor(timeout=5.0, batch_tests=True, early_kill=True)
+        code = "import time\nprint(input(), flush=True)\ntime.sleep(10)\nprint('late')"
+        test_cases = [
+            {"stdin": "9.5", "expected_output": "1.0\nlate", "compare": "float"},
+            {"stdin": "b", "expected_output": "a\nlate", "compare": "whitespace"},
+            {"stdin": "x", "expected_output": "y\nlate"},
+        ]
+        results = await executor.run_tests(code, test_cases)
+
+        for test_result in results.test_results:
+            assert test_result.error_message.startswith("Stopped early")
+            assert test_result.wall_time < 2.0
+
+    async def test_batch_mode_keeps_expected_output_from_the_program(self):
+        # Looks through every frame of the harness for the expected output
+        code = (
+            "import sys\n"
+            "frame, found = sys._getframe(), None\n"
+            "while frame is not None:\n"
+            "    for value in list(frame.f_locals.values()):\n"
+            "        if isinstance(value, str) and value.startswith('secret'):\n"
+            "            found = value\n"
+            "    frame = frame.f_back\n"
+            "print(found)\n"
+        )
+        executor = LocalExecutor(timeout=5.0, batch_tests=True, early_kill=True)
+        results = await executor.run_tests(
+            code, [{"expected_output": "secret-1"}, {"expected_output": "secret-2"}]
+        )
+
+        assert not any(tr.passed for tr in results.test_results)
+
+    async def test_batch_fallback_keeps_compare_mode(self):
+        # Writing to fd 1 directly sends every case to a process of its own
+        executor = LocalExecutor(timeout=1.0, batch_tests=True, early_kill=True)
+        code = "import os, time\nos.write(1, input().encode() + b'\\n')\ntime.sleep(10)"
+        test_cases = [
+            {"stdin": "1.05", "expected_output": "1.0", "compare": "float", "tolerance": 0.1},
+            {"stdin": "9.5", "expected_output": "1.0", "compare": "float", "tolerance": 0.1},
+        ]
+        results = await executor.run_tests(code, test_cases)
+
+        timed_out, stopped = results.test_results
+        assert "timed out" in timed_out.error_message
+        assert stopped.error_message.startswith("Stopped early")
+        assert stopped.wall_time < 1.0
+
+    async def test_correct_output_still_passes(self, executor):
+        code = "n = int(input())\nfor i in range(n):\n    print(i)"
+        test_cases = [
+            {"stdin": "3", "expected_output": "0\n1\n2\n"},
+            {"stdin": "1", "expected_output": "0"},
+        ]
+        results = await executor.run_tests(code, test_cases)
+        assert results.all_passed
+
+    async def test_disabled_by_default(self):
+        executor = LocalExecutor(timeout=0.5)
+        results = await executor.run_tests(
+            "import time\nprint('wrong', flush=True)\ntime.sleep(10)",
+            [{"expected_output": "right"}],
+        )
+        assert "timed out" in results.test_results[0].error_message
+
+
+class TestFailFast:
+    """Tests for stopping a test run at the first failing test case."""
+
+    CODE = "x = input()\nprint('bad' if x == 'b' else x)"
+    TEST_CASES = [
+        {"stdin": "a", "expected_output": "a"},
+        {"stdin": "b", "expected_output": "b"},
+        {"stdin": "c", "expected_output": "c"},
+        {"stdin": "d", "expected_output": "d"},
+    ]
+
+    @pytest.fixture(params=["sequential", "parallel", "batch"])
+    def executor(self, request):
+        return LocalExecutor(
+            timeout=5.0,
+            batch_tests=request.param == "batch",
+            max_parallel_tests=1 if request.param == "sequential" else 4,
+            scheduler=ExecutionScheduler(max_concurrent=4),
+        )
+
+    async def test_later_cases_are_not_run(self, executor):
+        results = await executor.run_tests(self.CODE, self.TEST_CASES, fail_fast=True)
+
+        assert [tr.passed for tr in results.test_results] == [True, False, False, False]
+        assert [tr.skipped for tr in results.test_results] == [False, False, True, True]
+        assert results.skipped_count == 2
+        assert results.test_results[2].error_message.startswith("Not run")
+        assert not results.all_passed
+
+    async def test_all_cases_run_without_fail_fast(self, executor):
+        results = await executor.run_tests(self.CODE, self.TEST_CASES)
+
+        assert [tr.passed for tr in results.test_results] == [True, False, True, True]
+        assert results.skipped_count == 0
+
+    async def test_executor_default(self):
+        executor = LocalExecutor(timeout=5.0, fail_fast=True)
+        results = await executor.run_tests(self.CODE, self.TEST_CASES)
+        assert results.skipped_count == 2
+
+    async def test_passing_run_is_unaffected(self, executor):
+        results = await executor.run_tests(
+            "print(input())", self.TEST_CASES, fail_fast=True
+        )
+        assert results.all_passed
+
+
+class TestStaticChecks:
+    """Tests for the syntax pre-check in run_tests."""
+
+    TEST_CASES = [
+        {"stdin": "a", "expected_output": "a"},
+        {"stdin": "b", "expected_output": "b"},
+    ]
+
+    async def test_syntax_error_short_circuits(self, monkeypatch):
+        executor = LocalExecutor(timeout=5.0)
+
+        async def no_spawn(*args, **kwargs):
+            raise AssertionError("no process should be started")
+
+        monkeypatch.setattr(executor, "_spawn", no_spawn)
+        results = await executor.run_tests("print(input()", self.TEST_CASES)
+
+        assert results.static_error is not None
+        assert results.static_error.line == 1
+        assert results.skipped_count == 2
+        assert all(tr.skipped for tr in results.test_results)
+        assert results.test_results[0].error_message == "Not run: SyntaxError on line 1"
+        assert not results.all_passed
+
+    @pytest.mark.parametrize(
+        "code",
+        ["-" * 200000 + "1", "x = " + "+".join(["1"] * 200000)],
+        ids=["unary", "binary"],
+    )
+    async def test_too_deeply_nested_code_is_reported(self, code):
+        executor = LocalExecutor(timeout=5.0, cache=ResultCache())
+        results = await executor.run_tests(code, self.TEST_CASES)
+
+        assert results.static_error.message == "code is too deeply nested to compile"
+        assert results.skipped_count == 2
+
+    async def test_valid_code_runs(self):
+        executor = LocalExecutor(timeout=5.0)
+        results = await executor.run_tests("print(input())", self.TEST_CASES)
+        assert results.all_passed
+        assert results.static_error is None
+
+    async def test_can_be_disabled(self):
+        executor = LocalExecutor(timeout=5.0, static_checks=False)
+        results = await executor.run_tests("print(input()", self.TEST_CASES)
+        assert results.static_error is None
+        assert "SyntaxError" in results.test_results[0].error_message
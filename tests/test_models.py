@@ -37,6 +37,17 @@ class TestTestCase:
         assert data["description"] == "test"
         assert data["hidden"] is True
 
+    def test_function_call_round_trip(self):
+        tc = TestCase.from_dict({
+            "function": "add",
+            "args": [2, 3],
+            "kwargs": {"scale": 2},
+            "expected_return": 10,
+        })
+        assert tc.is_function_call
+        assert TestCase.from_dict(tc.to_dict()) == tc
+        assert "function" not in TestCase(stdin="1").to_dict()
+
 
 class TestDataFile:
     """Tests for DataFile model."""
@@ -0,0 +1,144 @@
+"""Tests for process-group kills and leaked process reaping."""
+
+import os
+import time
+
+import pytest
+
+from pyshala.services.local_executor import LocalExecutor
+from pyshala.services.reaper import ProcessReaper, session_members
+from pyshala.services.result_cache import ResultCache
+
+# Starts a grandchild that outlives the program and writes its PID to stdout
+LEAKY_SOURCE = """
+import subprocess
+child = subprocess.Popen(["sleep", "30"])
+print(child.pid)
+"""
+
+
+def is_alive(pid: int) -> bool:
+    """Check if a process exists and is not a zombie."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def wait_dead(pid: int, timeout: float = 2.0) -> bool:
+    """Wait for a process to die."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not is_alive(pid):
+            return True
+        time.sleep(0.02)
+    return False
+
+
+pytestmark = pytest.mark.skipif(
+    not os.path.isdir("/proc"), reason="Needs /proc"
+)
+
+
+def make_executor(**kwargs) -> tuple[LocalExecutor, ProcessReaper]:
+    reaper = ProcessReaper(sweep_interval=0)
+    executor = LocalExecutor(
+        timeout=2, cache=ResultCache(max_entries=0), reaper=reaper, **kwargs
+    )
+    return executor, reaper
+
+
+class TestSessionMembers:
+    """Tests for the /proc session scan."""
+
+    def test_finds_own_session(self):
+        sid = os.getsid(0)
+        assert os.getpid() in session_members({sid})[sid]
+
+    def test_unknown_session(self):
+        assert session_members({2**22 + 12345}) == {}
+
+
+class TestProcessReaper:
+    """Tests for reaping leaked processes."""
+
+    @pytest.mark.parametrize("use_zygote", [False, True])
+    async def test_leaked_grandchild_is_killed(self, use_zygote):
+        executor, reaper = make_executor(use_zygote=use_zygote)
+        try:
+            result = await executor.execute(LEAKY_SOURCE)
+        finally:
+            await executor.close()
+
+        assert result.return_code == 0
+        grandchild = int(result.stdout.strip())
+        assert wait_dead(grandchild)
+        assert reaper.stats()["leaked_processes"] == 1
+
+    async def test_leaked_grandchild_does_not_hold_output_open(self):
+        # The grandchild inherits stdout; the run must not wait for it
+        executor, _ = make_executor()
+        started = time.monotonic()
+        result = await executor.execute(LEAKY_SOURCE)
+
+        assert result.return_code == 0
+        assert not result.timed_out
+        assert time.monotonic() - started < 2
+
+    async def test_timeout_kills_process_tree(self, tmp_path):
+        executor, reaper = make_executor()
+        executor.timeout = 1
+        pid_file = tmp_path / "pid"
+        result = await executor.execute(
+            "import subprocess, time\n"
+            "child = subprocess.Popen(['sleep', '30'])\n"
+            f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+            "time.sleep(30)\n"
+        )
+
+        assert result.timed_out
+        assert wait_dead(int(pid_file.read_text()))
+        # The whole tree was killed on purpose, so nothing counts as leaked
+        assert reaper.stats()["leaked_processes"] == 0
+
+    async def test_clean_program_is_not_counted(self):
+        executor, reaper = make_executor()
+        result = await executor.execute("print('hi')")
+
+        assert result.stdout == "hi\n"
+        assert reaper.stats()["leaked_processes"] == 0
+
+    async def test_batch_harness_leaks_are_killed(self):
+        executor, reaper = make_executor(batch_tests=True)
+        results = await executor.execute_batch(LEAKY_SOURCE, ["1", "2"])
+
+        pids = [int(r.stdout.strip()) for r in results]
+        assert all(wait_dead(pid) for pid in pids)
+        assert reaper.stats()["leaked_processes"] == 2
+
+    def test_sweep_kills_processes_that_changed_group(self):
+        import subprocess
+
+        # A session leader that moves a child into another process group
+        leader = subprocess.Popen(
+            [
+                "python", "-c",
+                "import os, subprocess, sys\n"
+                "c = subprocess.Popen(['sleep', '30'], process_group=0)\n"
+                "print(c.pid, flush=True)\n",
+            ],
+            stdout=subprocess.PIPE,
+            start_new_session=True,
+        )
+        grandchild = int(leader.stdout.readline())
+        leader.wait()
+        leader.stdout.close()
+
+        reaper = ProcessReaper(sweep_interval=0)
+        reaper.track(leader.pid)
+        # The group is gone, so collect only starts watching the session
+        assert reaper.collect(leader.pid) == 0
+        assert reaper.sweep() == 1
+        assert wait_dead(grandchild)
+        assert reaper.stats()["leaked_processes"] == 1
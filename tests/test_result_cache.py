@@ -0,0 +1,124 @@
+"""Tests for the execution result cache."""
+
+import os
+
+from pyshala.services.result_cache import (
+    ResultCache,
+    is_cacheable_output,
+    is_cacheable_source,
+)
+
+
+class TestIsCacheableSource:
+    """Tests for the determinism check."""
+
+    def test_plain_code_is_cacheable(self):
+        assert is_cacheable_source("print(input().upper())")
+
+    def test_random_import_is_not_cacheable(self):
+        assert not is_cacheable_source("import random\nprint(random.random())")
+
+    def test_from_import_is_not_cacheable(self):
+        assert not is_cacheable_source("from datetime import date\nprint(date.today())")
+
+    def test_submodule_import_is_not_cacheable(self):
+        assert not is_cacheable_source("import os.path")
+
+    def test_dynamic_import_is_not_cacheable(self):
+        assert not is_cacheable_source("print(__import__('random').random())")
+        assert not is_cacheable_source("exec('import random')")
+        assert not is_cacheable_source(
+            "import importlib\nprint(importlib.import_module('time').time())"
+        )
+
+    def test_listed_submodule_reached_through_package_is_not_cacheable(self):
+        assert not is_cacheable_source("import numpy as np\nprint(np.random.rand())")
+        assert not is_cacheable_source("from numpy import random")
+        assert is_cacheable_source("import numpy as np\nprint(np.arange(3))")
+
+    def test_blocklist_is_configurable(self, monkeypatch):
+        code = "import pandas\nprint(pandas.Timestamp.now())"
+        assert is_cacheable_source(code)
+        monkeypatch.setenv("EXECUTION_CACHE_NONDETERMINISTIC", "pandas, faker")
+        assert not is_cacheable_source(code)
+
+    def test_object_identity_and_script_path_are_not_cacheable(self):
+        assert not is_cacheable_source("print(id(object()))")
+        assert not is_cacheable_source("print(__file__)")
+        assert is_cacheable_source("import json\nprint(json.__file__)")
+
+    def test_output_with_object_addresses_is_not_cacheable(self):
+        assert not is_cacheable_output("<__main__.Foo object at 0x7f3a2c1b9d90>\n")
+        assert not is_cacheable_output("", "<function f at 0x7f3a2c1b9d90>")
+        assert is_cacheable_output("at 0x10 apples\n", "")
+
+    def test_syntax_error_is_cacheable(self):
+        assert is_cacheable_source("print('hello'")
+
+    def test_too_deeply_nested_code_is_not_cacheable(self):
+        assert not is_cacheable_source("x = " + "+".join(["1"] * 200000))
+        assert not is_cacheable_source("-" * 200000 + "1")
+
+
+class TestResultCache:
+    """Tests for ResultCache."""
+
+    def test_key_depends_on_every_part(self):
+        key = ResultCache.make_key("code", "stdin")
+        assert key == ResultCache.make_key("code", "stdin")
+        assert key != ResultCache.make_key("code", "stdin2")
+        assert key != ResultCache.make_key("codes", "tdin")
+
+    async def test_hit_and_miss_counters(self):
+        cache = ResultCache()
+        assert await cache.get("k") is None
+        await cache.put("k", {"stdout": "hi"})
+        assert await cache.get("k") == {"stdout": "hi"}
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    async def test_evicts_least_recently_used(self):
+        cache = ResultCache(max_entries=2)
+        await cache.put("a", {"v": 1})
+        await cache.put("b", {"v": 2})
+        await cache.get("a")
+        await cache.put("c", {"v": 3})
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == {"v": 1}
+        assert await cache.get("c") == {"v": 3}
+
+    async def test_skips_oversized_results(self):
+        cache = ResultCache(max_entry_bytes=100)
+        await cache.put("big", {"stdout": "x" * 1000})
+        assert await cache.get("big") is None
+
+    async def test_disk_tier_survives_new_instance(self, tmp_path):
+        cache = ResultCache(cache_dir=str(tmp_path))
+        await cache.put("k" * 64, {"stdout": "hi"})
+
+        fresh = ResultCache(cache_dir=str(tmp_path))
+        assert await fresh.get("k" * 64) == {"stdout": "hi"}
+        assert fresh.stats()["entries"] == 1
+
+    async def test_disk_tier_evicts_least_recently_used(self, tmp_path):
+        cache = ResultCache(max_entries=0, cache_dir=str(tmp_path), max_disk_mb=1)
+        keys = [f"{i:02d}" * 32 for i in range(25)]
+        for index, key in enumerate(keys):
+            await cache.put(key, {"stdout": "x" * 50_000})
+            os.utime(cache._disk_path(key), (index, index))
+            if index == 5:
+                # Reading a file makes it recently used
+                assert await cache.get(keys[0]) is not None
+
+        assert await cache.get(keys[-1]) is not None
+        assert await cache.get(keys[0]) is not None
+        assert await cache.get(keys[1]) is None
+        stats = cache.stats()
+        assert stats["disk_evictions"] > 0
+        assert stats["disk_bytes"] <= 1024 * 1024
+        on_disk = sum(size for _, size, _ in cache._disk_files())
+        assert on_disk <= 1024 * 1024
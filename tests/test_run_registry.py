@@ -0,0 +1,156 @@
+"""Tests for cancelling in-flight runs."""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from pyshala.services.local_executor import LocalExecutor
+from pyshala.services.reaper import ProcessReaper
+from pyshala.services.result_cache import ResultCache
+from pyshala.services.run_registry import RunRegistry
+
+
+def wait_dead(pid: int, timeout: float = 2.0) -> bool:
+    """Wait for a process to exit (zombies count as dead)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                if f.read().rsplit(")", 1)[1].split()[0] == "Z":
+                    return True
+        except OSError:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+async def wait_for_file(path, timeout: float = 5.0) -> str:
+    """Wait until a file has content and return it."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and path.read_text():
+            return path.read_text()
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"{path} was never written")
+
+
+class TestRunRegistry:
+    """Tests for the RunRegistry class."""
+
+    async def test_start_and_finish(self):
+        registry = RunRegistry()
+        handle = registry.start("s1", asyncio.sleep(0, result="done"))
+
+        assert registry.get("s1") is handle
+        assert await handle.task == "done"
+        await asyncio.sleep(0)
+        assert registry.get("s1") is None
+        assert registry.active == 0
+
+    async def test_cancel(self):
+        registry = RunRegistry()
+        handle = registry.start("s1", asyncio.sleep(10))
+
+        assert registry.cancel("s1") is True
+        with pytest.raises(asyncio.CancelledError):
+            await handle.task
+        assert handle.cancelled
+        assert registry.cancel("s1") is False
+
+    async def test_new_run_cancels_previous(self):
+        registry = RunRegistry()
+        first = registry.start("s1", asyncio.sleep(10))
+        second = registry.start("s1", asyncio.sleep(0))
+
+        await asyncio.sleep(0)
+        assert first.cancelled
+        await second.task
+        assert registry.get("s1") is None
+
+    async def test_sessions_are_independent(self):
+        registry = RunRegistry()
+        registry.start("s1", asyncio.sleep(10))
+        other = registry.start("s2", asyncio.sleep(10))
+
+        registry.cancel("s1")
+        await asyncio.sleep(0)
+        assert not other.done
+        other.cancel()
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="Needs /proc")
+class TestCancelKillsProcesses:
+    """Cancelling a run kills every process it started."""
+
+    @pytest.mark.parametrize(
+        "options",
+        [{}, {"use_zygote": True}, {"batch_tests": True}],
+        ids=["subprocess", "zygote", "batch"],
+    )
+    async def test_cancel_kills_process_tree(self, tmp_path, options):
+        executor = LocalExecutor(
+            timeout=30,
+            cache=ResultCache(max_entries=0),
+            reaper=ProcessReaper(sweep_interval=0),
+            **options,
+        )
+        pid_file = tmp_path / "pids"
+        source = (
+            "import os, subprocess, time\n"
+            "child = subprocess.Popen(['sleep', '60'])\n"
+            f"open({str(pid_file)!r}, 'w').write(f'{{os.getpid()}} {{child.pid}}')\n"
+            "time.sleep(60)\n"
+        )
+        registry = RunRegistry()
+        try:
+            handle = registry.start(
+                "s1",
+                executor.run_tests(
+                    source, [{"stdin": "", "expected_output": ""}], session_id="s1"
+                ),
+            )
+            pids = [int(pid) for pid in (await wait_for_file(pid_file)).split()]
+
+            started = time.monotonic()
+            registry.cancel("s1")
+            with pytest.raises(asyncio.CancelledError):
+                await handle.task
+
+            assert all(wait_dead(pid) for pid in pids)
+            assert time.monotonic() - started < 5
+        finally:
+            await executor.close()
+
+
+class TestClientConnected:
+    """Tests for noticing closed tabs while a run waits."""
+
+    def test_app_is_looked_up_once(self, monkeypatch):
+        import sys
+        from types import SimpleNamespace
+
+        from reflex.utils import prerequisites
+
+        from pyshala.state import app_state
+
+        lookups = []
+        namespace = SimpleNamespace(token_to_sid={"s1": "sid"})
+
+        def get_and_validate_app():
+            lookups.append(1)
+            sys.path.insert(0, os.getcwd())
+            return SimpleNamespace(app=SimpleNamespace(event_namespace=namespace))
+
+        monkeypatch.setattr(prerequisites, "get_and_validate_app", get_and_validate_app)
+        monkeypatch.setattr(sys, "path", list(sys.path))
+        app_state._running_app.cache_clear()
+        try:
+            path_length = len(sys.path)
+            results = [app_state.client_connected(token) for token in ["s1", "s2"] * 50]
+            assert results == [True, False] * 50
+            assert lookups == [1]
+            assert len(sys.path) == path_length + 1
+        finally:
+            app_state._running_app.cache_clear()
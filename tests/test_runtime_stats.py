@@ -0,0 +1,99 @@
+"""Tests for lesson runtime statistics."""
+
+import threading
+
+from pyshala.services.local_executor import TestResult
+from pyshala.services.runtime_stats import RuntimeStats, format_report, percentile
+
+
+class TestPercentile:
+    """Tests for the percentile helper."""
+
+    def test_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 0.5) == 50.0
+        assert percentile(values, 0.95) == 95.0
+        assert percentile(values, 1.0) == 100.0
+
+    def test_empty(self):
+        assert percentile([], 0.95) == 0.0
+
+
+class TestRuntimeStats:
+    """Tests for the RuntimeStats class."""
+
+    def test_near_limit(self):
+        stats = RuntimeStats(path="")
+        for _ in range(20):
+            stats.record("a/fast", 0.5, 10.0)
+            stats.record("a/slow", 8.5, 10.0)
+            stats.record("a/tight", 1.9, 2.0)
+
+        assert [e.lesson for e in stats.near_limit(0.8)] == ["a/tight", "a/slow"]
+        assert stats.get("a/slow").runtime(0.95) == 8.5
+
+    def test_estimate(self):
+        stats = RuntimeStats(path="")
+        assert stats.estimate("a/new") is None
+
+        for runtime in (0.1, 0.2, 5.0):
+            stats.record("a/fast", runtime, 10.0)
+        for runtime in (3.0, 4.0):
+            stats.record("a/slow", runtime, 10.0)
+
+        assert stats.estimate("a/fast") == 0.2
+        assert stats.estimate("a/slow") == 3.0
+        # Unseen lessons get the median of the known lessons' estimates
+        assert stats.estimate("a/new") == 0.2
+
+    def test_counts_timeouts_and_bounds_samples(self):
+        stats = RuntimeStats(path="", max_samples=5)
+        for _ in range(8):
+            stats.record("a/loop", 2.0, 2.0)
+
+        entry = stats.get("a/loop")
+        assert entry.runs == 8
+        assert entry.timeouts == 8
+        assert len(entry.samples) == 5
+
+    async def test_record_results_skips_not_run_cases(self):
+        stats = RuntimeStats(path="")
+        await stats.record_results("a/b", [
+            TestResult(0, "ran", True, wall_time=0.2, timeout=5.0),
+            TestResult(1, "skipped", False, skipped=True),
+        ])
+
+        assert stats.get("a/b").runs == 1
+
+    async def test_record_results_writes_once_off_the_event_loop(self, tmp_path):
+        log = tmp_path / "runtimes.jsonl"
+        stats = RuntimeStats(path=str(log))
+        writes = []
+        write = stats._write
+
+        def tracked_write(samples):
+            writes.append((threading.current_thread(), len(samples)))
+            write(samples)
+
+        stats._write = tracked_write
+        await stats.record_results("a/b", [
+            TestResult(i, "ran", True, wall_time=0.2, timeout=5.0) for i in range(3)
+        ])
+
+        assert writes == [(writes[0][0], 3)]
+        assert writes[0][0] is not threading.main_thread()
+        assert len(log.read_text().splitlines()) == 3
+        assert stats.get("a/b").runs == 3
+
+    def test_log_round_trip(self, tmp_path):
+        log = tmp_path / "stats" / "runtimes.jsonl"
+        stats = RuntimeStats(path=str(log))
+        stats.record("a/b", 1.0, 2.0)
+        stats.record("a/b", 3.0, 4.0)
+        log.open("a").write("not json\n")
+
+        loaded = RuntimeStats.load(str(log))
+        entry = loaded.get("a/b")
+        assert entry.runs == 2
+        assert entry.timeout == 4.0
+        assert "a/b" in format_report(loaded.near_limit(0.5), 0.5)
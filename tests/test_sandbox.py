@@ -0,0 +1,359 @@
+"""Tests for sandbox data file templates and session working directories."""
+
+import os
+import shutil
+
+import pytest
+
+from pyshala.models.lesson import DataFile
+from pyshala.services.limits import ResourceLimits
+from pyshala.services.local_executor import LocalExecutor
+from pyshala.services import sandbox
+from pyshala.services.result_cache import ResultCache
+from pyshala.services.sandbox import (
+    SandboxTemplates,
+    SessionSandboxes,
+    resolve_scratch_dir,
+)
+from pyshala.services.scheduler import ExecutionScheduler
+
+
+@pytest.fixture
+def data_files():
+    return [
+        DataFile(name="data.csv", path="data.csv", content=b"a,b\n1,2\n"),
+        DataFile(name="nested/info.txt", path="nested/info.txt", content=b"hi"),
+        DataFile(name="missing.txt", path="missing.txt", content=None),
+    ]
+
+
+# An unprivileged user executions can run as
+NOBODY = 65534
+
+
+class TestSandboxTemplates:
+    """Tests for SandboxTemplates."""
+
+    def test_template_built_once(self, tmp_path, data_files):
+        templates = SandboxTemplates(root=str(tmp_path / "templates"))
+        first = templates.template_for(data_files)
+        second = templates.template_for(data_files)
+
+        assert first is second
+        assert (first.path / "data.csv").read_bytes() == b"a,b\n1,2\n"
+        assert set(first.snapshot) == {"data.csv", "nested/info.txt"}
+
+    def test_hardlink_mode_shares_inode(self, tmp_path, data_files):
+        # Executions run as a user that cannot write the template
+        templates = SandboxTemplates(
+            root=str(tmp_path / "templates"), link_mode="hardlink", run_as=NOBODY
+        )
+        workdir = tmp_path / "work"
+        workdir.mkdir()
+        templates.populate(str(workdir), data_files)
+
+        template = templates.template_for(data_files)
+        assert os.path.samefile(workdir / "data.csv", template.path / "data.csv")
+        assert (workdir / "nested" / "info.txt").read_bytes() == b"hi"
+        assert not (workdir / "missing.txt").exists()
+        assert templates.link_method == "hardlink"
+
+    def test_hardlink_mode_fails_when_template_is_writable(self, tmp_path, data_files):
+        # The executions' user owns the templates (or is root)
+        templates = SandboxTemplates(
+            root=str(tmp_path / "templates"), link_mode="hardlink", run_as=os.geteuid()
+        )
+        workdir = tmp_path / "work"
+        workdir.mkdir()
+        with pytest.raises(PermissionError, match="EXECUTION_USER"):
+            templates.populate(str(workdir), data_files)
+
+    def test_auto_mode_copies_when_template_is_writable(self, tmp_path, data_files):
+        templates = SandboxTemplates(root=str(tmp_path / "templates"), run_as=os.geteuid())
+        templates._reflink_ok = False
+        workdir = tmp_path / "work"
+        workdir.mkdir()
+        templates.populate(str(workdir), data_files)
+
+        template = templates.template_for(data_files)
+        assert not os.path.samefile(workdir / "data.csv", template.path / "data.csv")
+        assert templates.link_method == "copy"
+
+    def test_tampering_with_restored_mtime_is_detected(self, tmp_path, data_files):
+        templates = SandboxTemplates(root=str(tmp_path / "templates"))
+        template = templates.template_for(data_files)
+        target = template.path / "data.csv"
+        st = os.stat(target)
+        os.chmod(target, 0o644)
+        with open(target, "wb") as f:
+            f.write(b"X,Y\n9,9\n")
+        os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        workdir = tmp_path / "work"
+        workdir.mkdir()
+        templates.populate(str(workdir), data_files)
+        assert (workdir / "data.csv").read_bytes() == b"a,b\n1,2\n"
+
+    async def test_executions_cannot_change_other_runs_data(self, tmp_path, data_files):
+        # Even when an execution can write through a hardlink, the change
+        # is caught before the template is used again
+        executor = LocalExecutor(
+            timeout=5.0,
+            scheduler=ExecutionScheduler(max_concurrent=2),
+            cache=ResultCache(max_entries=0),
+            templates=SandboxTemplates(
+                root=str(tmp_path), link_mode="hardlink", run_as=NOBODY
+            ),
+        )
+        tamper = (
+            "import os\n"
+            "st = os.stat('data.csv')\n"
+            "os.chmod('data.csv', 0o644)\n"
+            "open('data.csv', 'wb').write(b'X,Y\\n9,9\\n')\n"
+            "os.utime('data.csv', ns=(st.st_atime_ns, st.st_mtime_ns))\n"
+        )
+        await executor.execute(tamper, data_files=data_files)
+        result = await executor.execute(
+            "print(open('data.csv').read(), end='')", data_files=data_files
+        )
+
+        assert result.stdout == "a,b\n1,2\n"
+
+    def test_copy_mode_gives_writable_copies(self, tmp_path, data_files):
+        templates = SandboxTemplates(root=str(tmp_path / "templates"), link_mode="copy")
+        workdir = tmp_path / "work"
+        workdir.mkdir()
+        templates.populate(str(workdir), data_files)
+
+        (workdir / "data.csv").write_bytes(b"changed")
+        template = templates.template_for(data_files)
+        assert (template.path / "data.csv").read_bytes() == b"a,b\n1,2\n"
+
+    def test_tampered_template_is_rebuilt(self, tmp_path, data_files):
+        templates = SandboxTemplates(root=str(tmp_path / "templates"))
+        template = templates.template_for(data_files)
+        target = template.path / "data.csv"
+        os.chmod(target, 0o644)
+        target.write_bytes(b"corrupted!")
+
+        rebuilt = templates.template_for(data_files)
+        assert (rebuilt.path / "data.csv").read_bytes() == b"a,b\n1,2\n"
+
+    def test_different_contents_get_different_templates(self, tmp_path):
+        templates = SandboxTemplates(root=str(tmp_path / "templates"))
+        a = templates.template_for([DataFile(name="d", path="d", content=b"1")])
+        b = templates.template_for([DataFile(name="d", path="d", content=b"2")])
+        assert a.path != b.path
+
+    def test_invalid_link_mode(self, tmp_path):
+        with pytest.raises(ValueError, match="link mode"):
+            SandboxTemplates(root=str(tmp_path), link_mode="symlink")
+
+
+@pytest.mark.skipif(
+    os.geteuid() != 0 or not shutil.which("python3", path="/usr/bin"),
+    reason="needs root and an interpreter other users can run",
+)
+class TestExecutionUser:
+    """Tests for running executions as an unprivileged user."""
+
+    @pytest.fixture(params=["subprocess", "zygote"])
+    async def executor(self, request, tmp_path):
+        executor = LocalExecutor(
+            timeout=5.0,
+            python_path="/usr/bin/python3",
+            use_zygote=request.param == "zygote",
+            cache=ResultCache(max_entries=0),
+            limits=ResourceLimits(uid=NOBODY, gid=NOBODY),
+            templates=SandboxTemplates(
+                root=str(tmp_path), link_mode="hardlink", run_as=NOBODY
+            ),
+        )
+        yield executor
+        await executor.close()
+
+    async def test_executions_run_as_the_user(self, executor, data_files):
+        code = (
+            "import os\n"
+            "print(os.getuid(), os.getgid())\n"
+            "open('out.txt', 'w').write('x')\n"
+            "print(os.stat('data.csv').st_nlink > 1)"
+        )
+        result = await executor.execute(code, data_files=data_files)
+        assert result.stdout == f"{NOBODY} {NOBODY}\nTrue\n"
+
+    async def test_hardlinked_data_files_stay_read_only(self, executor, data_files):
+        tamper = (
+            "import os\n"
+            "try:\n"
+            "    os.chmod('data.csv', 0o644)\n"
+            "except PermissionError:\n"
+            "    print('denied')\n"
+        )
+        result = await executor.execute(tamper, data_files=data_files)
+        assert result.stdout == "denied\n"
+        template = executor.templates.template_for(data_files)
+        assert (template.path / "data.csv").stat().st_mode & 0o777 == 0o444
+
+
+class TestExecutorWithTemplates:
+    """Tests for LocalExecutor using sandbox templates."""
+
+    async def test_data_files_available(self, tmp_path, data_files):
+        executor = LocalExecutor(
+            timeout=5.0,
+            templates=SandboxTemplates(root=str(tmp_path)),
+        )
+        code = "print(open('data.csv').read().splitlines()[1])\nprint(open('nested/info.txt').read())"
+        result = await executor.execute(code, data_files=data_files)
+
+        assert result.is_success
+        assert result.stdout == "1,2\nhi\n"
+
+
+class TestScratchDir:
+    """Tests for choosing where working directories are created."""
+
+    def test_unset_uses_system_temp_dir(self, monkeypatch):
+        monkeypatch.delenv("EXECUTION_SCRATCH_DIR", raising=False)
+        assert resolve_scratch_dir() is None
+
+    def test_explicit_directory_is_created(self, tmp_path):
+        scratch = tmp_path / "scratch"
+        assert resolve_scratch_dir(str(scratch)) == str(scratch)
+        assert scratch.is_dir()
+
+    def test_auto_uses_shm_when_it_has_room(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(sandbox, "SHM_DIR", str(tmp_path))
+        monkeypatch.setattr(sandbox, "SHM_MIN_FREE_MB", 0)
+        assert resolve_scratch_dir("auto") == str(tmp_path)
+
+    def test_auto_falls_back_when_shm_is_small_or_missing(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(sandbox, "SHM_DIR", str(tmp_path))
+        monkeypatch.setattr(sandbox, "SHM_MIN_FREE_MB", 2**40)
+        assert resolve_scratch_dir("auto") is None
+
+        monkeypatch.setattr(sandbox, "SHM_DIR", str(tmp_path / "missing"))
+        assert resolve_scratch_dir("auto") is None
+
+    async def test_executor_runs_in_scratch_dir(self, tmp_path):
+        executor = LocalExecutor(scratch_dir=str(tmp_path))
+        result = await executor.execute("import os\nprint(os.getcwd())")
+
+        assert result.stdout.startswith(str(tmp_path))
+        # The working directory is removed afterwards
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestSessionSandboxes:
+    """Tests for working directories reused across submissions."""
+
+    @pytest.fixture
+    def executor(self, tmp_path):
+        return LocalExecutor(
+            timeout=5.0,
+            scheduler=ExecutionScheduler(max_concurrent=2),
+            cache=ResultCache(max_entries=0),
+            session_sandboxes=SessionSandboxes(root=str(tmp_path)),
+        )
+
+    async def test_data_files_written_once(self, executor, data_files):
+        code = "print(open('data.csv').read().splitlines()[1])"
+        for _ in range(3):
+            result = await executor.execute(
+                code, data_files=data_files, session_id="s1", lesson="m/l1"
+            )
+            assert result.stdout == "1,2\n"
+
+        assert executor.session_sandboxes.populated == 1
+
+    async def test_leftovers_are_removed_and_data_files_restored(self, executor, data_files):
+        code = (
+            "import os\n"
+            "print(sorted(os.listdir('.')))\n"
+            "open('out.txt', 'w').write('x')\n"
+            "os.remove('data.csv')"
+        )
+        first = await executor.execute(code, data_files=data_files, session_id="s1", lesson="m/l1")
+        second = await executor.execute(code, data_files=data_files, session_id="s1", lesson="m/l1")
+
+        assert first.stdout == second.stdout == "['data.csv', 'nested', 'script.py']\n"
+        # Deleting a data file forces a rebuild
+        assert executor.session_sandboxes.populated == 2
+
+    async def test_lesson_change_drops_directory(self, executor, data_files, tmp_path):
+        await executor.execute("print(1)", data_files=data_files, session_id="s1", lesson="m/l1")
+        await executor.execute("print(1)", session_id="s2", lesson="m/l1")
+        await executor.execute("print(1)", session_id="s1", lesson="m/l2")
+
+        assert len(list(tmp_path.iterdir())) == 2
+        executor.session_sandboxes.release("s1")
+        assert len(list(tmp_path.iterdir())) == 1
+
+    async def test_release_session_removes_directories_at_once(
+        self, executor, data_files, tmp_path
+    ):
+        await executor.execute("print(1)", data_files=data_files, session_id="s1", lesson="m/l1")
+        await executor.execute("print(1)", session_id="s2", lesson="m/l1")
+
+        executor.release_session("s1")
+        assert len(list(tmp_path.iterdir())) == 1
+        # Without session sandboxes there is nothing to release
+        LocalExecutor().release_session("s1")
+
+    async def test_lesson_change_releases_session(self, executor, monkeypatch):
+        from types import SimpleNamespace
+
+        from pyshala.state import app_state
+        from pyshala.state.app_state import AppState
+
+        monkeypatch.setattr(app_state, "get_local_executor", lambda: executor)
+        await executor.execute("print(1)", session_id="s1", lesson="m/l1")
+        state = SimpleNamespace(
+            current_module_id="m",
+            current_lesson_id="l1",
+            router=SimpleNamespace(session=SimpleNamespace(client_token="s1")),
+            _cancel_run=lambda: None,
+        )
+        AppState._load_lesson(state, "m", "missing")
+
+        assert executor.session_sandboxes._sandboxes == {}
+
+    async def test_data_file_rewritten_with_restored_mtime_is_rebuilt(
+        self, executor, data_files
+    ):
+        tamper = (
+            "import os\n"
+            "print(open('data.csv').read(), end='')\n"
+            "st = os.stat('data.csv')\n"
+            "open('data.csv', 'wb').write(b'X,Y\\n9,9\\n')\n"
+            "os.utime('data.csv', ns=(st.st_atime_ns, st.st_mtime_ns))\n"
+        )
+        for _ in range(2):
+            result = await executor.execute(
+                tamper, data_files=data_files, session_id="s1", lesson="m/l1"
+            )
+            assert result.stdout == "a,b\n1,2\n"
+
+        assert executor.session_sandboxes.populated == 2
+
+    def test_idle_sessions_expire(self, tmp_path):
+        sandboxes = SessionSandboxes(root=str(tmp_path), ttl=0.0)
+        with sandboxes.lease("s1", "m/l1", [], lambda path, files: None):
+            pass
+        with sandboxes.lease("s2", "m/l1", [], lambda path, files: None):
+            pass
+
+        assert len(list(tmp_path.iterdir())) == 1
+
+    async def test_parallel_tests_get_separate_directories(self, executor):
+        code = "import os, time\nprint(os.getcwd())\ntime.sleep(0.2)"
+        results = await executor.run_tests(
+            code,
+            [{"expected_output": ""}, {"expected_output": ""}],
+            session_id="s1",
+            lesson="m/l1",
+        )
+
+        outputs = [tr.actual_output for tr in results.test_results]
+        assert outputs[0] != outputs[1]
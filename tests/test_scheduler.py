@@ -0,0 +1,178 @@
+"""Tests for the execution scheduler."""
+
+import asyncio
+
+import pytest
+
+from pyshala.services.scheduler import ExecutionScheduler
+
+
+async def _occupy(scheduler: ExecutionScheduler, session_id: str, log: list, release: asyncio.Event):
+    async with scheduler.slot(session_id):
+        log.append(session_id)
+        await release.wait()
+
+
+class TestExecutionScheduler:
+    """Tests for ExecutionScheduler."""
+
+    async def test_caps_concurrent_executions(self):
+        scheduler = ExecutionScheduler(max_concurrent=2)
+        release = asyncio.Event()
+        log: list[str] = []
+        tasks = [
+            asyncio.create_task(_occupy(scheduler, f"s{i}", log, release))
+            for i in range(5)
+        ]
+        await asyncio.sleep(0.01)
+
+        assert scheduler.running == 2
+        assert scheduler.queued == 3
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.running == 0
+        assert scheduler.queued == 0
+
+    async def test_round_robin_between_sessions(self):
+        scheduler = ExecutionScheduler(max_concurrent=1)
+        order: list[str] = []
+
+        async def run(session_id: str):
+            async with scheduler.slot(session_id):
+                order.append(session_id)
+                await asyncio.sleep(0)
+
+        # Session "a" queues three executions before "b" and "c" queue one each
+        await scheduler.acquire("busy")
+        tasks = [asyncio.create_task(run(s)) for s in ("a", "a", "a", "b", "c")]
+        await asyncio.sleep(0.01)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+        assert order == ["a", "b", "c", "a", "a"]
+
+    async def test_queue_position(self):
+        scheduler = ExecutionScheduler(max_concurrent=1)
+        await scheduler.acquire("busy")
+        tasks = [
+            asyncio.create_task(scheduler.acquire(s)) for s in ("a", "b", "c")
+        ]
+        await asyncio.sleep(0.01)
+
+        assert scheduler.queue_position("a") == 0
+        assert scheduler.queue_position("c") == 2
+        assert scheduler.queue_position("busy") is None
+        # A session with several queued executions still counts once
+        tasks.append(asyncio.create_task(scheduler.acquire("a")))
+        await asyncio.sleep(0.01)
+        assert scheduler.queue_position("c") == 2
+
+        for _ in tasks:
+            scheduler.release()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        scheduler = ExecutionScheduler(max_concurrent=1)
+        await scheduler.acquire("busy")
+        task = asyncio.create_task(scheduler.acquire("a"))
+        await asyncio.sleep(0.01)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert scheduler.queue_position("a") is None
+        scheduler.release()
+        assert scheduler.running == 0
+
+    async def test_shortest_expected_job_first(self):
+        scheduler = ExecutionScheduler(max_concurrent=1, policy="sjf", aging=0.0)
+        order: list[str] = []
+
+        async def run(session_id: str, expected: float):
+            async with scheduler.slot(session_id, expected):
+                order.append(session_id)
+                await asyncio.sleep(0)
+
+        await scheduler.acquire("busy")
+        tasks = [
+            asyncio.create_task(run(s, expected))
+            for s, expected in (("pandas", 5.0), ("loop", 1.0), ("print", 0.1))
+        ]
+        await asyncio.sleep(0.01)
+
+        assert scheduler.queue_position("print") == 0
+        assert scheduler.queue_position("pandas") == 2
+
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        assert order == ["print", "loop", "pandas"]
+
+    async def test_sjf_keeps_session_order(self):
+        scheduler = ExecutionScheduler(max_concurrent=1, policy="sjf", aging=0.0)
+        order: list[tuple[str, float]] = []
+
+        async def run(session_id: str, expected: float):
+            async with scheduler.slot(session_id, expected):
+                order.append((session_id, expected))
+                await asyncio.sleep(0)
+
+        await scheduler.acquire("busy")
+        tasks = [
+            asyncio.create_task(run(s, expected))
+            for s, expected in (("a", 3.0), ("a", 0.1), ("b", 1.0))
+        ]
+        await asyncio.sleep(0.01)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+        # "a"'s short job waits behind its own long one
+        assert order == [("b", 1.0), ("a", 3.0), ("a", 0.1)]
+
+    async def test_aging_prevents_starvation(self, monkeypatch):
+        from pyshala.services import scheduler as scheduler_module
+
+        clock = [100.0]
+        monkeypatch.setattr(scheduler_module.time, "monotonic", lambda: clock[0])
+        scheduler = ExecutionScheduler(max_concurrent=1, policy="sjf", aging=1.0)
+        await scheduler.acquire("busy")
+
+        long_job = asyncio.create_task(scheduler.acquire("long", 5.0))
+        await asyncio.sleep(0)
+        clock[0] += 10.0
+        short_job = asyncio.create_task(scheduler.acquire("short", 0.1))
+        await asyncio.sleep(0)
+
+        # 10 seconds of waiting outweigh 4.9 seconds of extra runtime
+        assert scheduler.queue_position("long") == 0
+        scheduler.release()
+        await long_job
+        assert not short_job.done()
+        scheduler.release()
+        await short_job
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            ExecutionScheduler(policy="lifo")
+
+
+class TestQueueStatusLabel:
+    """Tests for the label shown while a submission is queued."""
+
+    @pytest.mark.parametrize(
+        "queued_ahead, label",
+        [
+            (-1, "Running..."),
+            (0, "Queued (next)"),
+            (1, "Queued (1 session ahead)"),
+            (3, "Queued (3 sessions ahead)"),
+        ],
+    )
+    def test_label_counts_sessions(self, queued_ahead, label):
+        from types import SimpleNamespace
+
+        from pyshala.state.app_state import AppState
+
+        run_status_text = AppState.computed_vars["run_status_text"]._fget
+        assert run_status_text(SimpleNamespace(queued_ahead=queued_ahead)) == label
@@ -0,0 +1,41 @@
+"""Tests for the operators' stats endpoint."""
+
+import httpx
+
+from pyshala.services import local_executor
+from pyshala.services.local_executor import LocalExecutor
+from pyshala.services.reaper import ProcessReaper
+from pyshala.services.result_cache import ResultCache
+from pyshala.services.service_stats import STATS_PATH, stats_app
+
+
+async def backend(scope, receive, send):
+    """Stand-in for the Reflex backend behind the endpoint."""
+    await send({"type": "http.response.start", "status": 204, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+class TestStatsEndpoint:
+    """Tests for serving the execution services' counters."""
+
+    async def test_reports_cache_reaper_and_scheduler(self, monkeypatch):
+        executor = LocalExecutor(
+            timeout=5.0, cache=ResultCache(), reaper=ProcessReaper(sweep_interval=0)
+        )
+        monkeypatch.setattr(local_executor, "_executor", executor)
+        await executor.execute("print(1)")
+        await executor.execute("print(1)")
+
+        transport = httpx.ASGITransport(app=stats_app(backend))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get(STATS_PATH)
+            other = await client.get("/")
+            posted = await client.post(STATS_PATH)
+
+        stats = response.json()
+        assert stats["result_cache"]["hits"] == 1
+        assert stats["result_cache"]["misses"] == 1
+        assert stats["reaper"]["leaked_processes"] == 0
+        assert stats["scheduler"]["running"] == 0
+        assert other.status_code == 204
+        assert posted.status_code == 405
@@ -0,0 +1,66 @@
+"""Tests for static checks run before execution."""
+
+from pyshala.services.static_checks import (
+    StaticCheckStage,
+    StaticIssue,
+    check_syntax,
+    matches_host_python,
+)
+
+
+class TestCheckSyntax:
+    """Tests for check_syntax."""
+
+    def test_valid_code(self):
+        assert check_syntax("print('hello')") is None
+
+    def test_syntax_error_has_position(self):
+        issue = check_syntax("x = 1\nprint('hello'")
+        assert issue.kind == "SyntaxError"
+        assert issue.line == 2
+        assert issue.column == 6
+        assert "was never closed" in issue.message
+        assert 'File "script.py", line 2' in issue.details
+
+    def test_indentation_error(self):
+        issue = check_syntax("if True:\nprint(1)")
+        assert issue.kind == "IndentationError"
+        assert issue.line == 2
+
+    def test_null_bytes(self):
+        issue = check_syntax("print(1)\0")
+        assert issue is not None
+        assert issue.line is None
+
+
+    def test_deeply_nested_expression(self):
+        issue = check_syntax("x = " + "+".join(["1"] * 200000))
+        assert issue.kind == "RecursionError"
+        assert "too deeply nested" in issue.message
+
+    def test_deeply_nested_unary_operators(self):
+        issue = check_syntax("-" * 200000 + "1")
+        assert issue.kind == "MemoryError"
+        assert issue.details.startswith("MemoryError: ")
+
+
+class TestStaticCheckStage:
+    """Tests for StaticCheckStage."""
+
+    async def test_runs_checks_in_order(self):
+        def no_print(source):
+            if "print" in source:
+                return StaticIssue(kind="Style", message="no print")
+            return None
+
+        stage = StaticCheckStage("python3", checks=[check_syntax, no_print])
+        assert (await stage.run("print(")).kind == "SyntaxError"
+        assert (await stage.run("print(1)")).kind == "Style"
+        assert await stage.run("x = 1") is None
+
+    async def test_syntax_check_skipped_for_other_interpreter(self):
+        stage = StaticCheckStage("/nonexistent/python")
+        assert await stage.run("print(") is None
+
+    def test_matches_host_python(self):
+        assert matches_host_python("/nonexistent/python") is False